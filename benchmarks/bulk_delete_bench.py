@@ -0,0 +1,58 @@
+# Product delete throughput: DELETE /dashboard/delete_product_from_category
+# one product at a time vs POST /dashboard/bulk_delete with every id at once.
+#
+#   python -m benchmarks.bulk_delete_bench
+import asyncio
+
+from benchmarks.common import count_queries, reset_schema, seed_catalog
+
+import time
+
+import httpx
+
+import main
+from database import db_models
+from database.database import SessionLocal
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+SINGLE_ROWS = 300
+BULK_ROWS = [1_000, 10_000, 50_000]
+
+
+async def remaining(table):
+    async with SessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(table))
+
+
+async def main_():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await reset_schema()
+        async with SessionLocal() as db:
+            await seed_catalog(db, products=SINGLE_ROWS)
+        base = 10_000_000
+        with count_queries() as counter:
+            start = time.perf_counter()
+            for i in range(SINGLE_ROWS):
+                response = await client.delete("/dashboard/delete_product_from_category/1", params={"product_id": base + i})
+                assert response.status_code == 200, response.text
+            elapsed = time.perf_counter() - start
+        print(f"single | {SINGLE_ROWS:>6} products | {elapsed:7.2f} s | {SINGLE_ROWS / elapsed:9.0f} products/s | {counter['queries'] / SINGLE_ROWS:5.1f} queries/product")
+
+        for rows in BULK_ROWS:
+            await reset_schema()
+            async with SessionLocal() as db:
+                await seed_catalog(db, products=rows)
+            with count_queries() as counter:
+                start = time.perf_counter()
+                response = await client.post("/dashboard/bulk_delete", json={"product_ids": list(range(base, base + rows))})
+                elapsed = time.perf_counter() - start
+            assert response.json()["deleted"] == rows, response.text
+            left = [await remaining(table) for table in (db_models.Products, db_models.Sizes, db_models.Images, db_models.ProductItem, db_models.Colors)]
+            assert not any(left), left
+            print(f"bulk   | {rows:>6} products | {elapsed:7.2f} s | {rows / elapsed:9.0f} products/s | {counter['queries']:>4} queries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
@@ -0,0 +1,56 @@
+# Product import throughput: POST /dashboard one product at a time vs
+# POST /dashboard/bulk_import with an NDJSON body.
+#
+#   python -m benchmarks.bulk_import_bench
+import asyncio
+
+from benchmarks.common import reset_schema
+
+import json
+import time
+
+import httpx
+
+import main
+from database import db_models
+from database.database import SessionLocal
+
+SINGLE_ROWS = 300
+BULK_ROWS = 10_000
+
+
+def product(i):
+    return {
+        "category_id": 1, "name": f"product-{i}", "price": 100 + i % 900, "brand_id": 1, "model_id": 1,
+        "images": [f"https://img.example.com/{i}/0.jpg", f"https://img.example.com/{i}/1.jpg"],
+        "colors": ["red", "black", "white"], "sizes": ["S", "M", "L"], "stock_qty": 10,
+    }
+
+
+async def main_():
+    await reset_schema()
+    async with SessionLocal() as db:
+        db.add(db_models.ProductCategory(id=1, name="bench", description="bench"))
+        db.add(db_models.Brands(id=1, brand_name="brand", brand_description="bench", product_category_id=1))
+        db.add(db_models.Models(id=1, model_name="model", brand_id=1))
+        await db.commit()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for i in range(SINGLE_ROWS):
+            assert (await client.post("/dashboard", json=product(i))).status_code == 201
+        elapsed = time.perf_counter() - start
+        print(f"POST /dashboard              {SINGLE_ROWS:>6} rows  {SINGLE_ROWS / elapsed:>9,.0f} rows/s")
+
+        body = "\n".join(json.dumps(product(i)) for i in range(BULK_ROWS))
+        start = time.perf_counter()
+        response = await client.post("/dashboard/bulk_import", content=body, headers={"content-type": "application/x-ndjson"})
+        elapsed = time.perf_counter() - start
+        report = response.json()
+        assert report["imported"] == BULK_ROWS, report["errors"][:5]
+        print(f"POST /dashboard/bulk_import  {BULK_ROWS:>6} rows  {BULK_ROWS / elapsed:>9,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
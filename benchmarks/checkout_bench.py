@@ -0,0 +1,63 @@
+# Orders/sec for carts of 1, 10 and 50 lines: /checkout_Billing plus one
+# /add_order per line vs a single /checkout.
+#
+#   python -m benchmarks.checkout_bench
+import asyncio
+
+from benchmarks.common import auth_headers, reset_schema, seed_catalog
+
+import time
+
+import httpx
+from sqlalchemy import update
+
+import main
+from database import db_models
+from database.database import SessionLocal
+
+CARTS = [1, 10, 50]
+ORDERS = 30
+# The one product seed_catalog creates in category 1
+ITEM_ID = 10_000_000
+BILLING = {"country": "IN", "first_name": "Bench", "last_name": "User", "address": "1 Road", "city": "Pune", "state": "MH", "pincode": 411001, "phone_no": 9999999999}
+LINE = {"img_link": "https://img.example.com/1.jpg", "qty": 1, "name": "Helmet", "color": "red", "size": "M", "price": 2500.0, "product_item_id": ITEM_ID}
+
+
+async def legacy_order(client, lines):
+    billing = await client.post("/checkout_Billing", json=BILLING)
+    billing_address_id = billing.json()["id"]
+    for _ in range(lines):
+        response = await client.post("/add_order", json={**LINE, "billing_address_id": billing_address_id})
+        assert response.status_code == 200
+
+
+async def checkout(client, lines):
+    response = await client.post("/checkout", json={"billing": BILLING, "lines": [LINE] * lines})
+    assert response.status_code == 200 and len(response.json()["order_ids"]) == lines
+
+
+async def orders_per_second(fn, client, lines):
+    start = time.perf_counter()
+    for _ in range(ORDERS):
+        await fn(client, lines)
+    return ORDERS / (time.perf_counter() - start)
+
+
+async def main_():
+    await reset_schema()
+    async with SessionLocal() as db:
+        db.add(db_models.User(id=1, first_name="Bench", last_name="User", email="bench@example.com", hashed_password="x"))
+        await seed_catalog(db, products=1)
+        await db.execute(update(db_models.ProductItem).values(quantity=1_000_000))
+        await db.commit()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=auth_headers(1, "bench@example.com")) as client:
+        for lines in CARTS:
+            before = await orders_per_second(legacy_order, client, lines)
+            after = await orders_per_second(checkout, client, lines)
+            print(f"{lines:>3} lines | billing + add_order {before:8.1f} orders/s | checkout {after:8.1f} orders/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
@@ -0,0 +1,67 @@
+# A burst of identical requests for a cold catalog key, with and without
+# single-flight coalescing.
+#
+#   python -m benchmarks.coalescing_bench
+#
+# Every burst starts with an empty catalog cache, so without coalescing each
+# request runs the full load; with it, one request loads and the rest wait
+# for its result. Independent loads of a big burst can exhaust the connection
+# pool; those requests fail with 500 and are counted as errors.
+import asyncio
+
+from benchmarks.common import count_queries, percentile, reset_schema, seed_catalog
+
+import time
+
+import httpx
+
+import main
+from database.database import SessionLocal
+from services.cache import catalog_cache
+from services.singleflight import catalog_flights
+from services.taxonomy import taxonomy_index
+
+PRODUCTS = 2000
+BURSTS = [1, 50, 200, 500]
+ROUTES = ["/collection/1", "/collection/1/products?limit=50", "/dashboard/taxonomy"]
+
+
+async def burst(client, route, size):
+    catalog_cache.clear()
+    taxonomy_index.expire()
+
+    async def one():
+        start = time.perf_counter()
+        response = await client.get(route)
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    with count_queries() as counter:
+        results = await asyncio.gather(*[one() for _ in range(size)])
+    samples = [ms for ms, _ in results]
+    errors = sum(status != 200 for _, status in results)
+    return samples, errors, counter["queries"]
+
+
+async def main_():
+    await reset_schema()
+    async with SessionLocal() as db:
+        await seed_catalog(db, products=PRODUCTS)
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for route in ROUTES:
+            print(f"--- {route}")
+            for size in BURSTS:
+                for enabled in (False, True):
+                    catalog_flights.enabled = enabled
+                    before = sum(catalog_flights.coalesced.values())
+                    samples, errors, queries = await burst(client, route, size)
+                    coalesced = sum(catalog_flights.coalesced.values()) - before
+                    print(
+                        f"{size:>4} requests | {'single-flight' if enabled else 'independent':>13} | queries {queries:>5} | "
+                        f"coalesced {coalesced:>4} | errors {errors:>4} | p50 {percentile(samples, 50):8.2f} ms | p95 {percentile(samples, 95):8.2f} ms"
+                    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
@@ -0,0 +1,60 @@
+# Query count and latency of POST /collection/{categoryID} against category size.
+#
+#   python -m benchmarks.collection_bench
+#
+# "legacy" replays the old one-query-per-table loading pattern,
+# "engine" is services.catalog.load_category.
+import asyncio
+
+from benchmarks.common import count_queries, percentile, reset_schema, seed_catalog, timed
+
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+from services import catalog
+
+SIZES = [10, 100, 1000, 5000]
+REPEAT = 30
+
+
+async def legacy_load(db, category_id):
+    category = (await db.execute(select(db_models.ProductCategory).where(db_models.ProductCategory.id == category_id))).scalars().first()
+    brands = (await db.execute(select(db_models.Brands).where(db_models.Brands.product_category_id == category_id))).scalars().all()
+    brand_ids = [brand.id for brand in brands]
+    models = (await db.execute(select(db_models.Models).where(db_models.Models.brand_id.in_(brand_ids)))).scalars().all()
+    model_ids = [model.id for model in models]
+    products = (await db.execute(select(db_models.Products).where(db_models.Products.brand_id.in_(brand_ids), db_models.Products.model_id.in_(model_ids)))).scalars().all()
+    product_ids = [product.id for product in products]
+    sizes = (await db.execute(select(db_models.Sizes).where(db_models.Sizes.products_id.in_(product_ids)))).scalars().all()
+    img = (await db.execute(select(db_models.Images).where(db_models.Images.product_id.in_(product_ids)))).scalars().all()
+    items = (await db.execute(select(db_models.ProductItem).where(db_models.ProductItem.product_id.in_(product_ids)))).scalars().all()
+    item_ids = [item.id for item in items]
+    colors = (await db.execute(select(db_models.Colors).where(db_models.Colors.product_item_id.in_(item_ids)))).scalars().all()
+    return category, brands, models, products, sizes, img, items, colors
+
+
+async def measure(name, loader, category_id):
+    async def run():
+        # Fresh session per call so the identity map does not hide the ORM cost
+        async with SessionLocal() as db:
+            await loader(db, category_id)
+
+    with count_queries() as counter:
+        await run()
+    samples = await timed(run, REPEAT)
+    print(f"{name:>8} | queries {counter['queries']:>2} | p50 {percentile(samples, 50):8.2f} ms | p95 {percentile(samples, 95):8.2f} ms")
+
+
+async def main():
+    for size in SIZES:
+        await reset_schema()
+        async with SessionLocal() as db:
+            category_id = await seed_catalog(db, products=size)
+        print(f"--- {size} products")
+        await measure("legacy", legacy_load, category_id)
+        await measure("engine", catalog.load_category, category_id)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
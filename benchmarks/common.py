@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+# Benchmarks always run against a throwaway database, never the dev PowerSports.db.
+# This has to happen before config/database are imported anywhere.
+BENCH_DIR = tempfile.mkdtemp(prefix="powersports-bench-")
+os.environ["SQLALCHEMY_DATABASE_URL"] = os.environ.get(
+    "BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{BENCH_DIR}/bench.db"
+)
+
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from database.database import async_engine, read_engines
+from services.seed import reset_schema, seed_catalog, seed_catalogs
+from services.tokens import token_verifier
+
+# The seeding helpers live in services/seed.py, shared with the tests
+__all__ = ["BENCH_DIR", "auth_headers", "count_queries", "percentile", "reset_schema", "seed_catalog", "seed_catalogs", "timed"]
+
+
+def auth_headers(user_id, email):
+    # A signed token for a user seeded directly, without /register and /token
+    token = token_verifier.sign({"sub": email, "user_id": user_id}, timedelta(hours=1))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@contextmanager
+def count_queries():
+    counter = {"queries": 0}
+
+    def before_cursor_execute(*args, **kwargs):
+        counter["queries"] += 1
+
+    engines = [async_engine.sync_engine] + [engine.sync_engine for engine in read_engines]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
@@ -0,0 +1,82 @@
+# Mixed catalog reads and order writes against the old and the tuned engine setup.
+#
+#   python -m benchmarks.db_concurrency_bench
+#
+# "default" is the old single engine with only check_same_thread=False,
+# "tuned" is database.make_engine with pragmas and separate read/write pools.
+import asyncio
+
+from benchmarks.common import BENCH_DIR, percentile, seed_catalog
+
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import db_models
+from database.database import make_engine
+from services import catalog
+
+READERS = 8
+WRITERS = 4
+DURATION = 5.0
+
+
+def sessions(engine):
+    return sessionmaker(bind=engine, class_=AsyncSession, autocommit=False, autoflush=False)
+
+
+async def setup(write_sessions):
+    async with write_sessions() as db:
+        await db.run_sync(lambda session: db_models.Base.metadata.create_all(session.connection()))
+        category_id = await seed_catalog(db, products=200)
+        db.add(db_models.User(id=1, first_name="Bench", last_name="User", email="bench@example.com", hashed_password="x"))
+        db.add(db_models.BillingAddress(id=1, country="IN", first_name="B", last_name="U", address="a", city="c", state="s", pincode="123456", mobile_no="9999999999", user_id=1))
+        await db.commit()
+    return category_id
+
+
+async def run(name, write_engine, read_engine):
+    write_sessions, read_sessions = sessions(write_engine), sessions(read_engine)
+    category_id = await setup(write_sessions)
+    deadline = time.perf_counter() + DURATION
+    read_samples, counts = [], {"writes": 0, "errors": 0}
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with read_sessions() as db:
+                await catalog.load_category(db, category_id)
+            read_samples.append((time.perf_counter() - start) * 1000)
+
+    async def writer():
+        while time.perf_counter() < deadline:
+            try:
+                async with write_sessions() as db:
+                    db.add(db_models.OrderTable(img_link="https://img.example.com/1.jpg", qty=1, name="p", color="red", size="M", price=10.0, user_id=1, billing_address_id=1))
+                    await db.commit()
+                counts["writes"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    await asyncio.gather(*[reader() for _ in range(READERS)], *[writer() for _ in range(WRITERS)])
+    print(
+        f"{name:>8} | reads/s {len(read_samples) / DURATION:8.1f} | read p95 {percentile(read_samples, 95):8.2f} ms"
+        f" | writes/s {counts['writes'] / DURATION:8.1f} | write errors {counts['errors']}"
+    )
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+
+
+async def main():
+    url = f"sqlite+aiosqlite:///{BENCH_DIR}/default.db"
+    engine = create_async_engine(url, connect_args={"check_same_thread": False})
+    await run("default", engine, engine)
+
+    url = f"sqlite+aiosqlite:///{BENCH_DIR}/tuned.db"
+    await run("tuned", make_engine(url), make_engine(url, read_only=True))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
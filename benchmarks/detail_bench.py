@@ -0,0 +1,70 @@
+# Query count and latency of the product detail page loaders.
+#
+#   python -m benchmarks.detail_bench
+#
+# "legacy" replays the old handler's five sequential queries, "union" is
+# services.catalog.load_product_detail (one UNION ALL round trip) and
+# "summary" is the product_summary primary-key read the route tries first.
+# Also checks that a missing product is a 404 rather than a 500.
+import asyncio
+
+from benchmarks.common import count_queries, percentile, reset_schema, seed_catalog, timed
+
+import httpx
+from sqlalchemy.future import select
+
+import main
+from database import db_models
+from database.database import SessionLocal
+from services import catalog, summary
+
+PRODUCTS = 10_000
+REPEAT = 500
+
+
+async def legacy_detail(db, product_id):
+    product = (await db.execute(select(db_models.Products.id, db_models.Products.name, db_models.Products.price, db_models.Products.brand_id, db_models.Products.model_id).where(db_models.Products.id == product_id))).first()
+    size_store = [size._asdict() for size in await db.execute(select(db_models.Sizes.id, db_models.Sizes.sizes, db_models.Sizes.products_id).where(db_models.Sizes.products_id == product.id))]
+    img_store = [image._asdict() for image in await db.execute(select(db_models.Images.id, db_models.Images.image_url, db_models.Images.product_id).where(db_models.Images.product_id == product_id))]
+    product_item = (await db.execute(select(db_models.ProductItem.id, db_models.ProductItem.product_id, db_models.ProductItem.quantity).where(db_models.ProductItem.product_id == product_id))).first()
+    color_store = [color._asdict() for color in await db.execute(select(db_models.Colors.id, db_models.Colors.available_colors, db_models.Colors.product_item_id).where(db_models.Colors.product_item_id == product_item.id))]
+    return {"Product": product._asdict(), "Size": size_store, "Image": img_store, "Product_item": product_item._asdict(), "Color": color_store}
+
+
+async def measure(name, loader, product_ids):
+    ids = iter(product_ids * (REPEAT // len(product_ids) + 2))
+
+    async def run():
+        async with SessionLocal() as db:
+            await loader(db, next(ids))
+
+    with count_queries() as counter:
+        await run()
+    samples = await timed(run, REPEAT)
+    print(f"{name:>8} | queries {counter['queries']:>2} | p50 {percentile(samples, 50):6.2f} ms | p95 {percentile(samples, 95):6.2f} ms | p99 {percentile(samples, 99):6.2f} ms")
+
+
+async def main_():
+    await reset_schema()
+    async with SessionLocal() as db:
+        await seed_catalog(db, products=PRODUCTS)
+    product_ids = [10_000_000 + i * 37 % PRODUCTS for i in range(200)]
+
+    async with SessionLocal() as db:
+        for product_id in product_ids[:20]:
+            assert await legacy_detail(db, product_id) == await catalog.load_product_detail(db, product_id) == await summary.load_product(db, product_id)
+
+    await measure("legacy", legacy_detail, product_ids)
+    await measure("union", catalog.load_product_detail, product_ids)
+    await measure("summary", summary.load_product, product_ids)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(2):
+            response = await client.get("/collection/productItem/1")
+            assert response.status_code == 404, response.status_code
+    print("ok  missing product is a 404")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
@@ -0,0 +1,44 @@
+# Compares a full 200 with a 304 revalidation, with and without the
+# in-process cache and for an uncached product page. The 304 behaviour itself
+# is tested in tests/test_http_cache.py.
+#
+#   python -m benchmarks.etag_bench
+import asyncio
+
+from benchmarks.common import percentile, reset_schema, seed_catalog, timed
+
+import httpx
+
+import main
+from database.database import SessionLocal
+from services.cache import catalog_cache
+
+
+async def compare(client, label, url):
+    etag = (await client.get(url)).headers["etag"]
+    full = await timed(lambda: client.get(url), 50)
+    revalidated = await timed(lambda: client.get(url, headers={"If-None-Match": etag}), 50)
+    print(f"{label:>8}: full 200  p50 {percentile(full, 50):7.2f} ms | 304  p50 {percentile(revalidated, 50):7.2f} ms")
+
+
+async def main_():
+    await reset_schema()
+    async with SessionLocal() as db:
+        await seed_catalog(db, products=500)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # With the in-process cache a 304 skips the body; without it both
+        # reload from the database, since the ETag comes from the loaded document
+        ttl_seconds = catalog_cache.ttl_seconds
+        for label, ttl in (("cached", ttl_seconds), ("uncached", 0)):
+            catalog_cache.clear()
+            catalog_cache.ttl_seconds = ttl
+            await compare(client, label, "/collection/1")
+        catalog_cache.ttl_seconds = ttl_seconds
+        # Pages are never cached: a 304 saves only the transfer
+        await compare(client, "page", "/collection/1/products?limit=20")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
@@ -0,0 +1,75 @@
+# Catalog latency while a burst of logins is being verified.
+#
+#   python -m benchmarks.login_storm_bench
+#
+# "inline" runs bcrypt on the event loop like the old handlers did,
+# "pool" goes through services.passwords.password_hasher.
+import asyncio
+
+from benchmarks.common import percentile, reset_schema, seed_catalog
+
+import time
+
+import httpx
+
+import main
+from database.database import SessionLocal
+from services.cache import catalog_cache
+from services.passwords import password_hasher
+
+LOGINS = 64
+CATALOG_READS = 50
+USER = {"first_name": "Bench", "last_name": "User", "email": "bench@example.com", "password": "secret123"}
+
+
+async def catalog_latency(client, category_id, reads):
+    samples = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        response = await client.post(f"/collection/{category_id}")
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return samples
+
+
+async def storm(client, category_id):
+    login = {"email": USER["email"], "password": USER["password"]}
+    logins = [asyncio.create_task(client.post("/token", json=login)) for _ in range(LOGINS)]
+    samples = await catalog_latency(client, category_id, CATALOG_READS)
+    statuses = [response.status_code for response in await asyncio.gather(*logins)]
+    return samples, statuses
+
+
+def report(name, samples, statuses=None):
+    line = f"{name:>14} | p50 {percentile(samples, 50):8.2f} ms | p95 {percentile(samples, 95):8.2f} ms | max {max(samples):8.2f} ms"
+    if statuses is not None:
+        line += f" | logins ok {statuses.count(200)} / 429 {statuses.count(429)}"
+    print(line)
+
+
+async def main_():
+    await reset_schema()
+    async with SessionLocal() as db:
+        category_id = await seed_catalog(db, products=50)
+    # Every catalog read goes to the database
+    catalog_cache.ttl_seconds = 0
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        assert (await client.post("/register", json=USER)).status_code == 200
+        report("idle", await catalog_latency(client, category_id, CATALOG_READS))
+
+        pooled = password_hasher._run
+
+        async def inline(fn, *args):
+            return fn(*args)
+
+        password_hasher._run = inline
+        report("storm inline", *await storm(client, category_id))
+        password_hasher._run = pooled
+        report("storm pool", *await storm(client, category_id))
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
@@ -0,0 +1,64 @@
+# Resolving the caller on an authenticated route: the cached principal vs
+# loading the full User row by id on every request.
+#
+#   python -m benchmarks.principal_bench
+import asyncio
+
+from benchmarks.common import count_queries, percentile, reset_schema, timed
+
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+from services.principal import forget, get_principal, user_cache
+
+USERS = 1000
+REPEAT = 5000
+
+
+async def load_user(user_id):
+    async with SessionLocal() as db:
+        return (await db.execute(select(db_models.User).where(db_models.User.id == user_id))).scalars().first()
+
+
+def report(name, samples, queries):
+    print(f"{name:>22} | p50 {percentile(samples, 50) * 1000:8.1f} us | p95 {percentile(samples, 95) * 1000:8.1f} us | {queries / REPEAT:.2f} queries/request")
+
+
+async def measure(name, resolve):
+    i = 0
+
+    async def run():
+        nonlocal i
+        i += 1
+        await resolve(i % USERS + 1)
+
+    with count_queries() as counter:
+        samples = await timed(run, REPEAT)
+    report(name, samples, counter["queries"])
+
+
+async def main():
+    await reset_schema()
+    async with SessionLocal() as db:
+        await db.execute(insert(db_models.User), [
+            {"id": user_id, "first_name": "Bench", "last_name": "User", "email": f"user{user_id}@example.com", "hashed_password": "x"}
+            for user_id in range(1, USERS + 1)
+        ])
+        await db.commit()
+
+    await measure("User row per request", load_user)
+    await measure("cached principal", lambda user_id: get_principal({"user_id": user_id}))
+
+    # A profile change on every 10th request
+    async def with_changes(user_id):
+        if user_id % 10 == 0:
+            forget(user_id)
+        await get_principal({"user_id": user_id})
+    await measure("cached, 10% invalidated", with_changes)
+    print(user_cache.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+# Sales report and order history latency as the order table grows.
+#
+#   python -m benchmarks.sales_report_bench
+#
+# Orders are bulk-inserted in chunks and every chunk goes through
+# services.sales.record, the same rollup upserts /add_order and /checkout run.
+# At each size the reports are read from the rollups ("rollup") and, for
+# comparison, computed with GROUP BY over order_table ("ad hoc"). Order
+# history reads the first and a deep page of one heavy user's orders.
+import asyncio
+
+from benchmarks.common import percentile, reset_schema, seed_catalog, timed
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+from services import orders, sales
+
+ORDER_COUNTS = [10_000, 100_000, 1_000_000, 2_000_000]
+CHUNK = 20_000
+CATEGORIES = 4
+PRODUCTS = 1000
+USERS = 1000
+DAYS = 730
+# Share of all orders placed by user 1, whose history is paged through
+HEAVY_USER_SHARE = 0.01
+REPEAT = 20
+AD_HOC_REPEAT = 3
+START = datetime(2024, 1, 1)
+
+
+async def seed_users(db):
+    await db.execute(insert(db_models.User), [
+        {"id": user_id, "first_name": "Bench", "last_name": "User", "email": f"user{user_id}@example.com", "hashed_password": "x"}
+        for user_id in range(1, USERS + 1)
+    ])
+    await db.execute(insert(db_models.BillingAddress), [
+        {"id": user_id, "country": "IN", "first_name": "Bench", "last_name": "User", "address": "1 Road", "city": "Pune", "state": "MH", "pincode": "411001", "mobile_no": "9999999999", "user_id": user_id}
+        for user_id in range(1, USERS + 1)
+    ])
+    await db.commit()
+
+
+def order_chunk(rng, first, count, total):
+    rows = []
+    for n in range(first, first + count):
+        user_id = 1 if rng.random() < HEAVY_USER_SHARE else rng.randint(2, USERS)
+        product_item_id = rng.randint(1, CATEGORIES) * 10_000_000 + rng.randrange(PRODUCTS)
+        rows.append({
+            "img_link": "https://img.example.com/1.jpg", "qty": rng.randint(1, 3), "name": "Helmet", "color": "red", "size": "M",
+            "price": float(100 + product_item_id % 900), "user_id": user_id, "billing_address_id": user_id,
+            "product_item_id": product_item_id,
+            # Orders arrive in time order, spread over DAYS
+            "created_at": START + timedelta(days=DAYS * n / total, seconds=n % 86_400),
+        })
+    return rows
+
+
+async def grow(rng, current, target, total):
+    async with SessionLocal() as db:
+        while current < target:
+            rows = order_chunk(rng, current, min(CHUNK, target - current), total)
+            await db.execute(insert(db_models.OrderTable), rows)
+            await sales.record(db, [sales.sale_line(row["product_item_id"], row["qty"], row["price"], row["created_at"]) for row in rows])
+            await db.commit()
+            current += len(rows)
+    return current
+
+
+def ad_hoc_queries():
+    order = db_models.OrderTable
+    item = db_models.ProductSummary
+    revenue = func.sum(order.qty * order.price)
+    return {
+        "by product": select(item.product_id, func.sum(order.qty), revenue, func.count()).join(item, item.product_item_id == order.product_item_id)
+        .group_by(item.product_id).order_by(revenue.desc()).limit(50),
+        "by day": select(func.date(order.created_at), func.sum(order.qty), revenue, func.count()).group_by(func.date(order.created_at)),
+        "by category": select(item.category_id, func.sum(order.qty), revenue, func.count()).join(item, item.product_item_id == order.product_item_id)
+        .group_by(item.category_id),
+    }
+
+
+def report(name, samples):
+    print(f"{name:>28} | p50 {percentile(samples, 50):9.2f} ms | p95 {percentile(samples, 95):9.2f} ms")
+
+
+async def measure(count):
+    async with SessionLocal() as db:
+        last_month = (START + timedelta(days=DAYS - 30)).date()
+        rollups = {
+            "rollup by product": lambda: sales.product_report(db, 50),
+            "rollup by day": lambda: sales.day_report(db),
+            "rollup by day, last 30": lambda: sales.day_report(db, last_month),
+            "rollup by category": lambda: sales.category_report(db),
+        }
+        for name, run in rollups.items():
+            report(name, await timed(run, REPEAT))
+
+        for name, query in ad_hoc_queries().items():
+            async def run():
+                (await db.execute(query)).all()
+            report(f"ad hoc {name}", await timed(run, AD_HOC_REPEAT))
+
+        first = await orders.order_history(db, 1, 20)
+        # Roughly the middle of the heavy user's history
+        middle = await db.scalar(
+            select(db_models.OrderTable.id).where(db_models.OrderTable.user_id == 1)
+            .order_by(db_models.OrderTable.id).offset(int(count * HEAVY_USER_SHARE / 2)).limit(1)
+        )
+        report("history first page", await timed(lambda: orders.order_history(db, 1, 20), REPEAT))
+        report("history deep page", await timed(lambda: orders.order_history(db, 1, 20, cursor=middle), REPEAT))
+        assert len(first["orders"]) == 20
+
+
+async def main():
+    await reset_schema()
+    async with SessionLocal() as db:
+        for category_id in range(1, CATEGORIES + 1):
+            await seed_catalog(db, products=PRODUCTS, category_id=category_id)
+        await seed_users(db)
+
+    rng = random.Random(24)
+    total = ORDER_COUNTS[-1]
+    current = 0
+    for count in ORDER_COUNTS:
+        start = time.perf_counter()
+        current = await grow(rng, current, count, total)
+        print(f"--- {count:,} orders (inserted with rollups in {time.perf_counter() - start:.1f} s)")
+        await measure(count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+# Search latency on a 100k product catalog.
+#
+#   python -m benchmarks.search_bench
+import asyncio
+
+from benchmarks.common import percentile, reset_schema, seed_catalog, timed
+
+import time
+
+from database.database import SessionLocal, async_engine
+from services import search
+
+PRODUCTS = 100_000
+QUERIES = ["product", "product-10054321", "red", "brand", "black xl", "model 2", "nothing-matches"]
+REPEAT = 50
+
+
+async def main():
+    await reset_schema()
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        await seed_catalog(db, products=PRODUCTS, brands=20, models_per_brand=10)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(search.rebuild)
+    print(f"seeded and indexed {PRODUCTS:,} products in {time.perf_counter() - start:.1f} s")
+
+    async with SessionLocal() as db:
+        for query in QUERIES:
+            page = await search.search_products(db, query, 20, 0)
+            samples = await timed(lambda: search.search_products(db, query, 20, 0), REPEAT)
+            print(f"{query!r:>20} | {len(page['results']):>2} results | p50 {percentile(samples, 50):7.2f} ms | p95 {percentile(samples, 95):7.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
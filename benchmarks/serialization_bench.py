@@ -0,0 +1,49 @@
+# Serialization cost per 1,000 products: the old ORM-entity payload through
+# FastAPI's jsonable_encoder + json vs the row-built document through orjson.
+#
+#   python -m benchmarks.serialization_bench
+import asyncio
+
+from benchmarks.collection_bench import legacy_load
+from benchmarks.common import reset_schema, seed_catalog
+
+import json
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from database.database import SessionLocal
+from services import catalog
+
+PRODUCTS = 1000
+REPEAT = 20
+
+
+def per_call_ms(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) * 1000 / REPEAT
+
+
+async def main():
+    await reset_schema()
+    async with SessionLocal() as db:
+        category_id = await seed_catalog(db, products=PRODUCTS)
+
+    async with SessionLocal() as db:
+        category, brands, models, products, sizes, img, items, colors = await legacy_load(db, category_id)
+        legacy = {"category": category, "brands": brands, "models": models, "products": products, "sizes": sizes, "img": img, "product_items": items, "colors": colors}
+        before = per_call_ms(lambda: json.dumps(jsonable_encoder(legacy)).encode())
+
+    async with SessionLocal() as db:
+        document = await catalog.load_category(db, category_id)
+    after = per_call_ms(lambda: orjson.dumps(document))
+
+    print(f"ORM + jsonable_encoder + json  {before:8.2f} ms / {PRODUCTS} products")
+    print(f"rows + orjson                  {after:8.2f} ms / {PRODUCTS} products  ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+# Worker startup cost: import time of main, and time from process spawn to
+# the first served request with several workers booting at once.
+#
+#   python -m benchmarks.startup_bench
+#
+# "migrate on boot" sets MIGRATE_ON_STARTUP so every worker runs the schema
+# checks itself, like the old create_all-on-boot; "plain boot" is the normal
+# path, with the schema migrated once beforehand.
+import asyncio
+
+from benchmarks.common import BENCH_DIR, percentile, seed_catalogs
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from database.database import async_engine
+from database.migrations import migrate
+
+IMPORT_RUNS = 7
+BOOT_ROUNDS = 3
+# One per core, as a uvicorn --workers deployment would run
+WORKERS = os.cpu_count() or 1
+IMPORT_MAIN = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_times():
+    samples = []
+    for _ in range(IMPORT_RUNS):
+        output = subprocess.run([sys.executable, "-c", IMPORT_MAIN], capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.strip().splitlines()[-1]) * 1000)
+    return samples
+
+
+def first_request_times(env):
+    ports = [free_port() for _ in range(WORKERS)]
+    start = time.perf_counter()
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    samples = []
+    try:
+        waiting = set(ports)
+        while waiting:
+            for port in list(waiting):
+                try:
+                    response = httpx.get(f"http://127.0.0.1:{port}/dashboard/categories", timeout=1)
+                except httpx.TransportError:
+                    continue
+                if response.status_code == 200:
+                    samples.append((time.perf_counter() - start) * 1000)
+                    waiting.discard(port)
+            time.sleep(0.005)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:>30} | p50 {percentile(samples, 50):8.1f} ms | max {max(samples):8.1f} ms")
+
+
+async def prepare():
+    await migrate()
+    await seed_catalogs(1, 100)
+    await async_engine.dispose()
+
+
+def main():
+    asyncio.run(prepare())
+    print(f"database {BENCH_DIR}, {WORKERS} workers booting together")
+    report("import main", import_times())
+    for name, migrate_on_startup in (("migrate on boot", "true"), ("plain boot", "false")):
+        env = {**os.environ, "MIGRATE_ON_STARTUP": migrate_on_startup, "LOG_ENABLED": "false"}
+        report(f"first request, {name}", [ms for _ in range(BOOT_ROUNDS) for ms in first_request_times(env)])
+
+
+if __name__ == "__main__":
+    main()
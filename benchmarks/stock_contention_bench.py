@@ -0,0 +1,52 @@
+# Hundreds of simultaneous buyers on one SKU: no oversell, and throughput.
+#
+#   python -m benchmarks.stock_contention_bench
+import asyncio
+
+from benchmarks.common import auth_headers, reset_schema, seed_catalog
+
+import time
+
+import httpx
+from sqlalchemy import func, update
+from sqlalchemy.future import select
+
+import main
+from database import db_models
+from database.database import SessionLocal
+
+STOCK = 100
+BUYERS = 400
+# The one product seed_catalog creates in category 1
+ITEM_ID = 10_000_000
+BILLING = {"country": "IN", "first_name": "Bench", "last_name": "User", "address": "1 Road", "city": "Pune", "state": "MH", "pincode": 411001, "phone_no": 9999999999}
+LINE = {"img_link": "https://img.example.com/1.jpg", "qty": 1, "name": "Helmet", "color": "red", "size": "M", "price": 2500.0, "product_item_id": ITEM_ID}
+
+
+async def main_():
+    await reset_schema()
+    async with SessionLocal() as db:
+        db.add(db_models.User(id=1, first_name="Bench", last_name="User", email="bench@example.com", hashed_password="x"))
+        await seed_catalog(db, products=1)
+        await db.execute(update(db_models.ProductItem).values(quantity=STOCK))
+        await db.commit()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=auth_headers(1, "bench@example.com"), timeout=None) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[client.post("/checkout", json={"billing": BILLING, "lines": [LINE]}) for _ in range(BUYERS)])
+        elapsed = time.perf_counter() - start
+
+    statuses = [response.status_code for response in responses]
+    async with SessionLocal() as db:
+        remaining = await db.scalar(select(db_models.ProductItem.quantity).where(db_models.ProductItem.id == ITEM_ID))
+        ordered = await db.scalar(select(func.coalesce(func.sum(db_models.OrderTable.qty), 0)))
+
+    print(f"{BUYERS} buyers, stock {STOCK}: 200 x {statuses.count(200)}, 409 x {statuses.count(409)}, other x {len(statuses) - statuses.count(200) - statuses.count(409)}")
+    print(f"remaining stock {remaining}, units ordered {ordered}, {BUYERS / elapsed:.0f} checkouts/s")
+    assert statuses.count(200) == STOCK and statuses.count(409) == BUYERS - STOCK
+    assert remaining == 0 and ordered == STOCK
+
+
+if __name__ == "__main__":
+    asyncio.run(main_())
@@ -0,0 +1,205 @@
+# Load-test suite: seeds a synthetic catalog, drives the app in-process over
+# ASGI and reports throughput and p50/p95/p99 per endpoint as JSON.
+#
+#   python -m benchmarks.suite --categories 4 --products 2000 --requests 300 --concurrency 16 --output result.json
+#   python -m benchmarks.suite --baseline result.json --max-regression 0.25
+#
+# With --baseline the run exits non-zero when any scenario's p95 grew, or its
+# throughput fell, by more than --max-regression compared to the baseline
+# file, so it can gate a change in CI. --only picks scenarios by name and
+# --cold-cache empties the catalog cache before every request so reads hit
+# the database.
+import asyncio
+
+from benchmarks.common import percentile, reset_schema, seed_catalogs
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+import main
+from database.database import async_engine
+from services.cache import catalog_cache
+
+USER = {"first_name": "Bench", "last_name": "User", "email": "bench@example.com", "password": "secret123"}
+BILLING = {"country": "IN", "first_name": "Bench", "last_name": "User", "address": "1 Road", "city": "Pune", "state": "MH", "pincode": 411001, "phone_no": 9999999999}
+
+
+class Catalog:
+    # Ids of the seeded catalog, laid out as benchmarks.common.seed_catalog assigns them
+    def __init__(self, categories, products, brands, models_per_brand):
+        self.categories = categories
+        self.products = products
+        self.brands = brands
+        self.models_per_brand = models_per_brand
+
+    def category(self, i):
+        return self.categories[i % len(self.categories)]
+
+    def brand(self, i):
+        return self.category(i) * 10_000_000 + i % self.brands
+
+    def model(self, i):
+        return self.category(i) * 10_000_000 + i % self.brands * 100 + i % self.models_per_brand
+
+    def product(self, i):
+        # Walks every product of every category before repeating one
+        return self.category(i) * 10_000_000 + i // len(self.categories) % self.products
+
+
+def scenarios(catalog, session):
+    auth = {"Authorization": f"Bearer {session['token']}"}
+
+    def new_product(i):
+        return {
+            "category_id": catalog.category(i), "name": f"bench-new-{i}", "price": 100 + i % 900,
+            "brand_id": catalog.brand(i), "model_id": catalog.model(i),
+            "images": [f"https://img.example.com/new/{i}.jpg"], "colors": ["red"], "sizes": ["M"], "stock_qty": 10,
+        }
+
+    def order(i):
+        return {
+            "img_link": "https://img.example.com/1.jpg", "qty": 1, "name": "Helmet", "color": "red", "size": "M", "price": 2500.0,
+            "billing_address_id": session["billing_address_id"], "product_item_id": catalog.product(i),
+        }
+
+    # Read scenarios first: the writes at the end change the catalog
+    return {
+        "collection_category": lambda client, i: client.get(f"/collection/{catalog.category(i)}"),
+        "collection_products": lambda client, i: client.get(f"/collection/{catalog.category(i)}/products", params={"limit": 50}),
+        "collection_browse": lambda client, i: client.get(f"/collection/{catalog.category(i)}/browse", params={"size": "M", "limit": 50}),
+        "collection_product_item": lambda client, i: client.get(f"/collection/productItem/{catalog.product(i)}"),
+        "collection_search": lambda client, i: client.get("/collection/search", params={"q": f"model {i % catalog.brands}"}),
+        "dashboard_categories": lambda client, i: client.get("/dashboard/categories"),
+        "dashboard_brands": lambda client, i: client.get("/dashboard/brands", params={"category_id": catalog.category(i)}),
+        "dashboard_models": lambda client, i: client.get("/dashboard/models", params={"brand_id": catalog.brand(i)}),
+        "token": lambda client, i: client.post("/token", json={"email": USER["email"], "password": USER["password"]}),
+        "verify_token": lambda client, i: client.post("/verify-token", headers=auth),
+        "user_profile": lambda client, i: client.get("/users/me", headers=auth),
+        "dashboard_add_product": lambda client, i: client.post("/dashboard", json=new_product(i)),
+        "checkout_billing": lambda client, i: client.post("/checkout_Billing", json=BILLING, headers=auth),
+        "add_order": lambda client, i: client.post("/add_order", json=order(i), headers=auth),
+        # After add_order, so there are orders and sales to read back
+        "order_history": lambda client, i: client.get("/orders", headers=auth),
+        "sales_by_product": lambda client, i: client.get("/dashboard/reports/sales_by_product"),
+        "sales_by_day": lambda client, i: client.get("/dashboard/reports/sales_by_day"),
+        "sales_by_category": lambda client, i: client.get("/dashboard/reports/sales_by_category"),
+    }
+
+
+async def run_scenario(client, send, requests, concurrency, cold_cache):
+    samples, statuses = [], Counter()
+    next_request = 0
+
+    async def worker():
+        nonlocal next_request
+        while next_request < requests:
+            i = next_request
+            next_request += 1
+            if cold_cache:
+                catalog_cache.clear()
+            start = time.perf_counter()
+            response = await send(client, i)
+            samples.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 2),
+        "mean_ms": round(sum(samples) / len(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def start_session(client):
+    response = await client.post("/register", json=USER)
+    assert response.status_code == 200, response.text
+    response = await client.post("/token", json={"email": USER["email"], "password": USER["password"]})
+    token = response.json()["access_token"]
+    billing = await client.post("/checkout_Billing", json=BILLING, headers={"Authorization": f"Bearer {token}"})
+    return {"token": token, "billing_address_id": billing.json()["id"]}
+
+
+def regressions(result, baseline, max_regression):
+    found = []
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            found.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            found.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return found
+
+
+async def main_(args):
+    config = {
+        "backend": async_engine.dialect.name,
+        "categories": args.categories, "products": args.products, "brands": args.brands, "models_per_brand": args.models_per_brand,
+        "requests": args.requests, "concurrency": args.concurrency, "cold_cache": args.cold_cache,
+    }
+    await reset_schema()
+    start = time.perf_counter()
+    categories = await seed_catalogs(args.categories, args.products, brands=args.brands, models_per_brand=args.models_per_brand)
+    config["seed_seconds"] = round(time.perf_counter() - start, 2)
+    catalog = Catalog(categories, args.products, args.brands, args.models_per_brand)
+
+    result = {"config": config, "scenarios": {}}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            session = await start_session(client)
+            for name, send in scenarios(catalog, session).items():
+                if args.only and name not in args.only:
+                    continue
+                catalog_cache.clear()
+                result["scenarios"][name] = await run_scenario(client, send, args.requests, args.concurrency, args.cold_cache)
+                print(f"{name:>24} | {result['scenarios'][name]['throughput_rps']:>9.1f} req/s | p95 {result['scenarios'][name]['p95_ms']:>9.2f} ms", file=sys.stderr)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(result, json.load(f), args.max_regression)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", type=int, default=4)
+    parser.add_argument("--products", type=int, default=1000, help="products per category")
+    parser.add_argument("--brands", type=int, default=4, help="brands per category")
+    parser.add_argument("--models-per-brand", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cold-cache", action="store_true")
+    parser.add_argument("--only", nargs="*")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_(parse_args())))
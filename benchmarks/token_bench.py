@@ -0,0 +1,35 @@
+# Cached vs uncached JWT verification throughput.
+#
+#   python -m benchmarks.token_bench
+import time
+from datetime import timedelta
+
+from jose import jwt
+
+from config import settings
+from services.tokens import TokenVerifier
+
+ROUNDS = 20_000
+TOKENS = 100
+
+
+def throughput(fn, tokens):
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        fn(tokens[i % len(tokens)])
+    return ROUNDS / (time.perf_counter() - start)
+
+
+def main():
+    verifier = TokenVerifier("primary", {"primary": settings.SECRET_KEY, "old": "retired"}, settings.ALGORITHM, max_entries=4096)
+    tokens = [verifier.sign({"sub": f"user{i}@example.com", "user_id": i}, timedelta(minutes=30)) for i in range(TOKENS)]
+
+    def uncached(token):
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    print(f"jwt.decode        {throughput(uncached, tokens):>12,.0f} verifications/s")
+    print(f"TokenVerifier     {throughput(verifier.verify, tokens):>12,.0f} verifications/s  {verifier.stats()}")
+
+
+if __name__ == "__main__":
+    main()
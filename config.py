@@ -8,6 +8,45 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     SQLALCHEMY_DATABASE_URL: str
+    SQLALCHEMY_READ_DATABASE_URL: str = ""
+    DB_POOL_SIZE: int = 5
+    DB_READ_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_APPLICATION_NAME: str = "powersports"
+    MIGRATE_ON_STARTUP: bool = False
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE: int = 268435456
+    JWT_KEY_ID: str = "primary"
+    JWT_RETIRED_KEYS: dict[str, str] = {}
+    TOKEN_CACHE_MAX_ENTRIES: int = 4096
+    USER_CACHE_TTL_SECONDS: float = 300
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    CATALOG_CACHE_TTL_SECONDS: float = 60
+    CATALOG_CACHE_MAX_ENTRIES: int = 1024
+    SINGLE_FLIGHT_ENABLED: bool = True
+    TAXONOMY_REFRESH_SECONDS: float = 300
+    CATALOG_CACHE_CONTROL: str = "public, max-age=0, must-revalidate"
+    CATALOG_PAGE_SIZE: int = 50
+    CATALOG_MAX_PAGE_SIZE: int = 200
+    CATALOG_STREAM_BATCH_SIZE: int = 200
+    SEARCH_PAGE_SIZE: int = 20
+    ORDER_PAGE_SIZE: int = 20
+    FACET_PRICE_BUCKET: int = 100
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_HEADER: bool = True
+    LOG_ENABLED: bool = True
+    LOG_LEVEL: str = "INFO"
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_PENDING: int = 16
+    PASSWORD_HASH_USE_PROCESSES: bool = False
+    BULK_IMPORT_CHUNK_SIZE: int = 500
+    RESERVATION_TTL_SECONDS: int = 900
+    RESERVATION_SWEEP_SECONDS: float = 60
     
     class Config:
         from_attribute = False
@@ -1,4 +1,9 @@
 # from sqlalchemy import create_engine
+import itertools
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -6,9 +11,99 @@ from config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URL
 
-async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread":False})
+
+def sqlite_pragmas(read_only: bool = False):
+    pragmas = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+        # Off by default in SQLite; needed for the ON DELETE CASCADE foreign keys
+        "foreign_keys": "ON",
+    }
+    if read_only:
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def database_url(url: str):
+    # The backend comes from the URL. PostgreSQL URLs without an async driver
+    # (postgres://, postgresql://) get asyncpg.
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    url = make_url(url)
+    if url.drivername == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url
+
+
+def make_engine(url: str, read_only: bool = False):
+    url = database_url(url)
+    kwargs = {}
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread":False}
+    elif url.get_backend_name() == "postgresql":
+        # Server connections can be dropped under an idle pool (failover,
+        # pgbouncer restarts); check them before handing them out
+        kwargs["pool_pre_ping"] = True
+        if url.get_driver_name() == "asyncpg":
+            server_settings = {"application_name": settings.DB_APPLICATION_NAME}
+            if read_only:
+                server_settings["default_transaction_read_only"] = "on"
+            kwargs["connect_args"] = {"server_settings": server_settings}
+    if url.database not in (None, "", ":memory:"):
+        kwargs.update(
+            pool_size=settings.DB_READ_POOL_SIZE if read_only else settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    # JSON columns (product_summary) go through orjson rather than the json module
+    engine = create_async_engine(url, json_serializer=lambda value: orjson.dumps(value).decode(), json_deserializer=orjson.loads, **kwargs)
+
+    if url.get_backend_name() == "sqlite":
+        pragmas = sqlite_pragmas(read_only)
+
+        # Connection level settings are lost when a connection closes, so they
+        # are applied every time the pool opens a new one
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.close()
+
+    return engine
+
+
+# Writes (dashboard, billing, orders) go through async_engine. Catalog reads
+# use their own pools of read-only connections: on SQLite with WAL they never
+# queue behind a writer's connection or its commit, and on PostgreSQL
+# SQLALCHEMY_READ_DATABASE_URL can list several replicas (comma separated)
+# that read sessions are spread over in turn. Replicas lag the primary, so a
+# read that must see a write just made here goes to the primary instead: a
+# catalog key reloaded after its invalidation (services/cache.py), the
+# taxonomy after a prune, the caller's principal and order history.
+async_engine = make_engine(SQLALCHEMY_DATABASE_URL)
+read_engines = [
+    make_engine(url.strip(), read_only=True)
+    for url in (settings.SQLALCHEMY_READ_DATABASE_URL or SQLALCHEMY_DATABASE_URL).split(",")
+    if url.strip()
+]
+async_read_engine = read_engines[0]
 
 SessionLocal = sessionmaker(bind=async_engine,class_=AsyncSession,autocommit=False,autoflush=False)
+_read_sessions = itertools.cycle([
+    sessionmaker(bind=engine,class_=AsyncSession,autocommit=False,autoflush=False) for engine in read_engines
+])
+
+
+def ReadSessionLocal():
+    # Next read pool in round-robin order
+    return next(_read_sessions)()
 
 Base = declarative_base()
 
@@ -26,4 +121,11 @@ async def get_db():
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+async def get_read_db():
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, DateTime, Date, JSON
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -6,7 +6,7 @@ class ProductCategory(Base):
     __tablename__ = "product_category"
     
     id = Column(Integer,primary_key=True,index=True)
-    name = Column(String,nullable=False)
+    name = Column(String,nullable=False,index=True)
     description = Column(String,nullable=False)
     
     # Relationship to products
@@ -14,12 +14,16 @@ class ProductCategory(Base):
     
 class Products(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Category pages filter on brand and model together; also serves brand_id alone
+        Index("ix_products_brand_id_model_id","brand_id","model_id"),
+    )
     
     id = Column(Integer,primary_key=True,index=True)
     name = Column(String,nullable=False)
     price = Column(Float,nullable=False)
     brand_id = Column(Integer,ForeignKey("brand.id"))
-    model_id  = Column(Integer,ForeignKey("model.id"))
+    model_id  = Column(Integer,ForeignKey("model.id"),index=True)
     
     # Relationship to Brands
     brand = relationship("Brands",back_populates="products")
@@ -28,13 +32,13 @@ class Products(Base):
     model = relationship("Models",back_populates="products")
     
     # Relationship to Sizes
-    size = relationship("Sizes",back_populates="products",cascade="all, delete")
+    size = relationship("Sizes",back_populates="products",cascade="all, delete",passive_deletes=True)
     
     # Relationship to Images
-    images = relationship("Images",back_populates="products",cascade="all, delete")
+    images = relationship("Images",back_populates="products",cascade="all, delete",passive_deletes=True)
     
     # Relationship to ProductItem
-    productItem = relationship("ProductItem",back_populates="products",cascade="all, delete")
+    productItem = relationship("ProductItem",back_populates="products",cascade="all, delete",passive_deletes=True)
     
 class Brands(Base):
     __tablename__ = "brand"
@@ -42,7 +46,7 @@ class Brands(Base):
     id = Column(Integer,primary_key=True,index=True)
     brand_name = Column(String,nullable=False)
     brand_description: str = Column(String,nullable=False)
-    product_category_id = Column(Integer,ForeignKey("product_category.id"))
+    product_category_id = Column(Integer,ForeignKey("product_category.id"),index=True)
     
     # Relationship to Products
     products = relationship("Products",back_populates="brand")
@@ -58,7 +62,7 @@ class Models(Base):
     
     id = Column(Integer,primary_key=True,index=True)
     model_name = Column(String,nullable=False)
-    brand_id = Column(Integer,ForeignKey("brand.id"),nullable=False)
+    brand_id = Column(Integer,ForeignKey("brand.id"),nullable=False,index=True)
 
     # Relationship to Products
     products = relationship("Products",back_populates="model")
@@ -71,7 +75,7 @@ class Sizes(Base):
     
     id = Column(Integer,primary_key=True,index=True)
     sizes = Column(String,nullable=False)
-    products_id = Column(Integer,ForeignKey("products.id"))
+    products_id = Column(Integer,ForeignKey("products.id",ondelete="CASCADE"),index=True)
     
     # Relationship to Products
     products = relationship("Products",back_populates="size")
@@ -81,7 +85,7 @@ class Images(Base):
     
     id = Column(Integer,primary_key=True,index=True)
     image_url = Column(String,nullable=False)
-    product_id = Column(Integer,ForeignKey("products.id"))
+    product_id = Column(Integer,ForeignKey("products.id",ondelete="CASCADE"),index=True)
     
     # Realtionship to Products
     products = relationship("Products",back_populates="images")
@@ -90,21 +94,21 @@ class ProductItem(Base):
     __tablename__ = "product_item"
     
     id = Column(Integer,primary_key=True,index=True)
-    product_id = Column(Integer,ForeignKey("products.id"))
+    product_id = Column(Integer,ForeignKey("products.id",ondelete="CASCADE"),index=True)
     quantity = Column(Integer,nullable=False)
     
     # Relationship to Products
     products = relationship("Products",back_populates="productItem")
     
     # relationship to Colors
-    color = relationship("Colors",back_populates="product_item",cascade="all, delete")
+    color = relationship("Colors",back_populates="product_item",cascade="all, delete",passive_deletes=True)
 
 class Colors(Base):
     __tablename__ = "color"
     
     id = Column(Integer,primary_key=True,index=True)
     available_colors = Column(String,nullable=False)
-    product_item_id = Column(Integer,ForeignKey("product_item.id"))
+    product_item_id = Column(Integer,ForeignKey("product_item.id",ondelete="CASCADE"),index=True)
     
     # Relationship to ProductItem
     product_item = relationship("ProductItem",back_populates="color")
@@ -142,6 +146,10 @@ class BillingAddress(Base):
     
 class OrderTable(Base):
     __tablename__ = "order_table"
+    __table_args__ = (
+        # Order history pages walk one user's orders by id
+        Index("ix_order_table_user_id_id","user_id","id"),
+    )
     
     id = Column(Integer,primary_key=True,index=True,nullable=False)
     img_link = Column(String,nullable=False)
@@ -150,8 +158,93 @@ class OrderTable(Base):
     color = Column(String,nullable=False)
     size = Column(String,nullable=False)
     price = Column(Float,nullable=False)
-    user_id = Column(Integer,ForeignKey("user.id"),nullable=False)
+    user_id = Column(Integer,ForeignKey("user.id"),nullable=False,index=True)
     billing_address_id = Column(Integer,ForeignKey("billing_address.id"),nullable=False)
+    # Both NULL on orders placed before they were recorded; no foreign key, so
+    # order history outlives deleted products
+    product_item_id = Column(Integer)
+    created_at = Column(DateTime)
     
     user = relationship("User",back_populates="order_table")
-    billing_address = relationship("BillingAddress",back_populates="orders")
\ No newline at end of file
+    billing_address = relationship("BillingAddress",back_populates="orders")
+    
+class StockReservation(Base):
+    __tablename__ = "stock_reservation"
+    
+    id = Column(Integer,primary_key=True,index=True,nullable=False)
+    product_item_id = Column(Integer,ForeignKey("product_item.id",ondelete="CASCADE"),nullable=False,index=True)
+    user_id = Column(Integer,ForeignKey("user.id"),nullable=False)
+    qty = Column(Integer,nullable=False)
+    # Stock held for a cart goes back on sale after this (UTC)
+    expires_at = Column(DateTime,nullable=False,index=True)
+    
+class FacetCount(Base):
+    __tablename__ = "facet_count"
+    
+    # Number of products in a category per facet value, kept up to date by the
+    # product write paths (see services/facets.py)
+    category_id = Column(Integer,ForeignKey("product_category.id"),primary_key=True)
+    facet = Column(String,primary_key=True)
+    value = Column(String,primary_key=True)
+    count = Column(Integer,nullable=False,default=0)
+    
+class ProductSummary(Base):
+    __tablename__ = "product_summary"
+    __table_args__ = (
+        # Whole-category reads are one range scan in product order
+        Index("ix_product_summary_category_id_product_id","category_id","product_id"),
+    )
+    
+    # Read model: one row per product with everything a product card or the
+    # detail page shows, kept in step with the catalog tables by the write
+    # paths (see services/summary.py)
+    product_id = Column(Integer,ForeignKey("products.id",ondelete="CASCADE"),primary_key=True)
+    category_id = Column(Integer)
+    name = Column(String,nullable=False)
+    price = Column(Float,nullable=False)
+    brand_id = Column(Integer,nullable=False)
+    brand_name = Column(String,nullable=False)
+    model_id = Column(Integer,nullable=False)
+    model_name = Column(String,nullable=False)
+    primary_image = Column(String)
+    product_item_id = Column(Integer,index=True)
+    stock = Column(Integer)
+    # [{"id", "sizes"}], [{"id", "image_url"}], [{"id", "available_colors"}]
+    sizes = Column(JSON,nullable=False)
+    images = Column(JSON,nullable=False)
+    colors = Column(JSON,nullable=False)
+    
+# Sales rollups, one row per product, day and category, kept up to date by the
+# order write paths in the same transaction as the order (see services/sales.py).
+# No foreign keys: sales history stays after a product is deleted.
+
+class SalesByProduct(Base):
+    __tablename__ = "sales_by_product"
+    __table_args__ = (
+        # Top sellers report
+        Index("ix_sales_by_product_revenue","revenue"),
+    )
+    
+    product_id = Column(Integer,primary_key=True)
+    # NULL when the product's summary has no category (brand and model filed
+    # under different categories)
+    category_id = Column(Integer)
+    units = Column(Integer,nullable=False,default=0)
+    revenue = Column(Float,nullable=False,default=0)
+    lines = Column(Integer,nullable=False,default=0)
+    
+class SalesByDay(Base):
+    __tablename__ = "sales_by_day"
+    
+    day = Column(Date,primary_key=True)
+    units = Column(Integer,nullable=False,default=0)
+    revenue = Column(Float,nullable=False,default=0)
+    lines = Column(Integer,nullable=False,default=0)
+    
+class SalesByCategory(Base):
+    __tablename__ = "sales_by_category"
+    
+    category_id = Column(Integer,primary_key=True)
+    units = Column(Integer,nullable=False,default=0)
+    revenue = Column(Float,nullable=False,default=0)
+    lines = Column(Integer,nullable=False,default=0)
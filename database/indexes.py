@@ -0,0 +1,35 @@
+# Adds any index declared in db_models that an existing database is missing.
+#
+# metadata.create_all skips tables that already exist, including their
+# indexes, so a PowerSports.db created before an index was declared never
+# gets it. This only runs CREATE INDEX IF NOT EXISTS, so existing tables
+# and data are left as they are.
+#
+#   python -m database.indexes
+import asyncio
+
+from database import db_models
+from database.database import async_engine
+
+
+def create_missing_indexes(connection, tables=None):
+    # tables: names to limit it to, all of db_models when None
+    created = []
+    for table in db_models.Base.metadata.sorted_tables:
+        if tables is not None and table.name not in tables:
+            continue
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            index.create(connection, checkfirst=True)
+            created.append(index.name)
+    return created
+
+
+async def main():
+    async with async_engine.begin() as conn:
+        names = await conn.run_sync(create_missing_indexes)
+    await async_engine.dispose()
+    print(f"Checked {len(names)} indexes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,377 @@
+# Versioned schema migrations, run once per deploy rather than by every worker.
+#
+#   python -m database.migrations            apply pending migrations
+#   python -m database.migrations --status   list applied and pending ones
+#
+# schema_migrations records the version of every migration applied. Each
+# migration runs in its own transaction together with its schema_migrations
+# row, so a failed one is rolled back and retried on the next run. They are
+# written to be safe against databases that got part of the schema from the
+# old create_all-on-boot (checkfirst / IF NOT EXISTS), which is what lets an
+# existing PowerSports.db be brought under migrations by simply running them.
+#
+# Every migration spells out its tables, columns and indexes as they were at
+# that version instead of reading them from db_models, so a version means the
+# same schema on every database however far db_models has moved on. Tables
+# they point foreign keys at are reflected from the database. Version 1 is
+# the schema the old create_all-on-boot made from the original models. The
+# ON DELETE CASCADE that db_models now declares on the product child tables
+# is not added by any migration (SQLite cannot alter a foreign key in place);
+# services/product_delete.py clears child rows itself, so both behave the
+# same. Backfills call the services' rebuild helpers; if one of those
+# starts needing a later column, copy the old query into its migration.
+#
+# Add new migrations at the end of MIGRATIONS with the next version number;
+# never edit or reorder one that has shipped.
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, insert, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.database import async_engine
+from services import facets, sales, search, summary
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes concurrent runs
+LOCK_ID = 7_201_020
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def create_tables(define, referenced=()):
+    # define(metadata) declares the migration's tables and returns them
+    def step(connection):
+        metadata = MetaData()
+        if referenced:
+            metadata.reflect(connection, only=referenced)
+        for table in define(metadata):
+            table.create(connection, checkfirst=True)
+    return step
+
+
+def create_indexes(*indexes):
+    # (table, index name, column, ...) for each index
+    def step(connection):
+        metadata = MetaData()
+        metadata.reflect(connection, only={index[0] for index in indexes})
+        for table, name, *columns in indexes:
+            Index(name, *(metadata.tables[table].c[column] for column in columns)).create(connection, checkfirst=True)
+    return step
+
+
+def add_columns(table_name, *columns):
+    # ALTER TABLE ... ADD COLUMN for the columns the table lacks
+    def step(connection):
+        existing = {column["name"] for column in inspect(connection).get_columns(table_name)}
+        for column in columns:
+            if column.name not in existing:
+                column_type = column.type.compile(connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"))
+    return step
+
+
+def initial_tables(metadata):
+    return [
+        Table(
+            "product_category", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("name", String, nullable=False),
+            Column("description", String, nullable=False),
+        ),
+        Table(
+            "brand", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("brand_name", String, nullable=False),
+            Column("brand_description", String, nullable=False),
+            Column("product_category_id", Integer, ForeignKey("product_category.id")),
+        ),
+        Table(
+            "model", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("model_name", String, nullable=False),
+            Column("brand_id", Integer, ForeignKey("brand.id"), nullable=False),
+        ),
+        Table(
+            "products", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("name", String, nullable=False),
+            Column("price", Float, nullable=False),
+            Column("brand_id", Integer, ForeignKey("brand.id")),
+            Column("model_id", Integer, ForeignKey("model.id")),
+        ),
+        Table(
+            "size", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("sizes", String, nullable=False),
+            Column("products_id", Integer, ForeignKey("products.id")),
+        ),
+        Table(
+            "image", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("image_url", String, nullable=False),
+            Column("product_id", Integer, ForeignKey("products.id")),
+        ),
+        Table(
+            "product_item", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("product_id", Integer, ForeignKey("products.id")),
+            Column("quantity", Integer, nullable=False),
+        ),
+        Table(
+            "color", metadata,
+            Column("id", Integer, primary_key=True, index=True),
+            Column("available_colors", String, nullable=False),
+            Column("product_item_id", Integer, ForeignKey("product_item.id")),
+        ),
+        Table(
+            "user", metadata,
+            Column("id", Integer, primary_key=True, nullable=False, index=True),
+            Column("first_name", String, nullable=False),
+            Column("last_name", String, nullable=False),
+            Column("email", String, unique=True, nullable=False),
+            Column("hashed_password", String),
+        ),
+        Table(
+            "billing_address", metadata,
+            Column("id", Integer, primary_key=True, nullable=False, index=True),
+            Column("country", String, nullable=False),
+            Column("first_name", String, nullable=False),
+            Column("last_name", String, nullable=False),
+            Column("address", String, nullable=False),
+            Column("city", String, nullable=False),
+            Column("state", String, nullable=False),
+            Column("pincode", String, nullable=False),
+            Column("mobile_no", String, nullable=False),
+            Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+        ),
+        Table(
+            "order_table", metadata,
+            Column("id", Integer, primary_key=True, index=True, nullable=False),
+            Column("img_link", String, nullable=False),
+            Column("qty", Integer, nullable=False),
+            Column("name", String, nullable=False),
+            Column("color", String, nullable=False),
+            Column("size", String, nullable=False),
+            Column("price", Float, nullable=False),
+            Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+            Column("billing_address_id", Integer, ForeignKey("billing_address.id"), nullable=False),
+        ),
+    ]
+
+
+async def initial_schema(conn):
+    await conn.run_sync(create_tables(initial_tables))
+
+
+async def catalog_indexes(conn):
+    await conn.run_sync(create_indexes(
+        ("product_category", "ix_product_category_name", "name"),
+        ("products", "ix_products_brand_id_model_id", "brand_id", "model_id"),
+        ("products", "ix_products_model_id", "model_id"),
+        ("brand", "ix_brand_product_category_id", "product_category_id"),
+        ("model", "ix_model_brand_id", "brand_id"),
+        ("size", "ix_size_products_id", "products_id"),
+        ("image", "ix_image_product_id", "product_id"),
+        ("product_item", "ix_product_item_product_id", "product_id"),
+        ("color", "ix_color_product_item_id", "product_item_id"),
+        ("order_table", "ix_order_table_user_id", "user_id"),
+    ))
+
+
+def stock_reservation_table(metadata):
+    return [Table(
+        "stock_reservation", metadata,
+        Column("id", Integer, primary_key=True, index=True, nullable=False),
+        Column("product_item_id", Integer, ForeignKey("product_item.id", ondelete="CASCADE"), nullable=False, index=True),
+        Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+        Column("qty", Integer, nullable=False),
+        Column("expires_at", DateTime, nullable=False, index=True),
+    )]
+
+
+async def stock_reservations(conn):
+    await conn.run_sync(create_tables(stock_reservation_table, referenced=("product_item", "user")))
+
+
+def product_search_table(connection):
+    # FTS5 exists on SQLite only, see services/search.py
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'product_search'")).first()
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_search "
+        "USING fts5(name, brand, model, colors, sizes, prefix = '2 3 4', tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    if exists is None:
+        connection.execute(text("INSERT INTO product_search (product_search, rank) VALUES ('rank', 'bm25(10.0, 4.0, 4.0, 1.0, 1.0)')"))
+        connection.execute(search.REBUILD)
+
+
+async def product_search(conn):
+    await conn.run_sync(product_search_table)
+
+
+def facet_count_table(metadata):
+    return [Table(
+        "facet_count", metadata,
+        Column("category_id", Integer, ForeignKey("product_category.id"), primary_key=True),
+        Column("facet", String, primary_key=True),
+        Column("value", String, primary_key=True),
+        Column("count", Integer, nullable=False, default=0),
+    )]
+
+
+async def facet_counts(conn):
+    await conn.run_sync(create_tables(facet_count_table, referenced=("product_category",)))
+    await backfill(conn, facets.rebuild)
+
+
+def product_summary_table(metadata):
+    return [Table(
+        "product_summary", metadata,
+        Column("product_id", Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
+        Column("category_id", Integer),
+        Column("name", String, nullable=False),
+        Column("price", Float, nullable=False),
+        Column("brand_id", Integer, nullable=False),
+        Column("brand_name", String, nullable=False),
+        Column("model_id", Integer, nullable=False),
+        Column("model_name", String, nullable=False),
+        Column("primary_image", String),
+        Column("product_item_id", Integer, index=True),
+        Column("stock", Integer),
+        Column("sizes", JSON, nullable=False),
+        Column("images", JSON, nullable=False),
+        Column("colors", JSON, nullable=False),
+        Index("ix_product_summary_category_id_product_id", "category_id", "product_id"),
+    )]
+
+
+async def product_summaries(conn):
+    await conn.run_sync(create_tables(product_summary_table, referenced=("products",)))
+    await backfill(conn, summary.rebuild)
+
+
+def rollup_columns():
+    return (
+        Column("units", Integer, nullable=False, default=0),
+        Column("revenue", Float, nullable=False, default=0),
+        Column("lines", Integer, nullable=False, default=0),
+    )
+
+
+def sales_tables(metadata):
+    return [
+        Table(
+            "sales_by_product", metadata,
+            Column("product_id", Integer, primary_key=True),
+            Column("category_id", Integer, nullable=False),
+            *rollup_columns(),
+            Index("ix_sales_by_product_revenue", "revenue"),
+        ),
+        Table("sales_by_day", metadata, Column("day", Date, primary_key=True), *rollup_columns()),
+        Table("sales_by_category", metadata, Column("category_id", Integer, primary_key=True), *rollup_columns()),
+    ]
+
+
+async def sales_rollups(conn):
+    await conn.run_sync(add_columns("order_table", Column("product_item_id", Integer), Column("created_at", DateTime)))
+    await conn.run_sync(create_indexes(("order_table", "ix_order_table_user_id_id", "user_id", "id")))
+    await conn.run_sync(create_tables(sales_tables))
+    await backfill(conn, sales.rebuild)
+
+
+def sales_by_product_table(metadata):
+    return [Table(
+        "sales_by_product", metadata,
+        Column("product_id", Integer, primary_key=True),
+        Column("category_id", Integer),
+        *rollup_columns(),
+        Index("ix_sales_by_product_revenue", "revenue"),
+    )]
+
+
+async def nullable_sales_category(conn):
+    # SQLite cannot drop NOT NULL in place; the rollup is derived data, so it
+    # is recreated and recounted from order_table
+    await conn.execute(text("DROP TABLE IF EXISTS sales_by_product"))
+    await conn.run_sync(create_tables(sales_by_product_table))
+    await backfill(conn, sales.rebuild)
+
+
+async def backfill(conn, rebuild):
+    # The rebuild helpers commit; on a session joined to the migration's
+    # connection that only releases a savepoint, and the migration's own
+    # transaction still decides
+    async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint") as db:
+        await rebuild(db)
+
+
+MIGRATIONS = [
+    (1, "initial schema", initial_schema),
+    (2, "catalog and order indexes", catalog_indexes),
+    (3, "stock reservations", stock_reservations),
+    (4, "product search", product_search),
+    (5, "facet counts", facet_counts),
+    (6, "product summaries", product_summaries),
+    (7, "order history and sales rollups", sales_rollups),
+    (8, "sales by product without a category", nullable_sales_category),
+]
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def applied_versions(conn):
+    await conn.run_sync(schema_migrations.create, checkfirst=True)
+    return set(await conn.scalars(select(schema_migrations.c.version)))
+
+
+async def migrate(engine=async_engine):
+    applied = []
+    for version, name, step in MIGRATIONS:
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Another deploy running migrations waits here instead of racing
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": LOCK_ID})
+            if version in await applied_versions(conn):
+                continue
+            await step(conn)
+            await conn.execute(insert(schema_migrations).values(version=version, name=name, applied_at=utcnow()))
+        applied.append((version, name))
+    return applied
+
+
+async def pending(engine=async_engine):
+    async with engine.begin() as conn:
+        done = await applied_versions(conn)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in done]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--status", action="store_true")
+    args = parser.parse_args()
+    if args.status:
+        waiting = await pending()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'pending' if (version, name) in waiting else 'applied':<8} {name}")
+    else:
+        applied = await migrate()
+        for version, name in applied:
+            print(f"Applied {version:>4}  {name}")
+        print(f"Schema is at version {MIGRATIONS[-1][0]}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
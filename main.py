@@ -1,21 +1,38 @@
-from fastapi import FastAPI,Depends,HTTPException,status
+from fastapi import FastAPI,Depends,HTTPException,Query,status
+from fastapi.responses import PlainTextResponse
 from database import db_models
-from database.database import async_engine,AsyncSession,get_db
+from database.database import async_engine,read_engines,AsyncSession,get_db
 from fastapi.middleware.cors import CORSMiddleware
-from routers import add_product,collection
+from routers import add_product,cart,collection
 
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError,jwt
-from datetime import datetime,timedelta,timezone
-from passlib.context import CryptContext
+from datetime import timedelta
 from database.db_models import User
 import schemas
+import asyncio
 from sqlalchemy.future import select
+from sqlalchemy import exc,update
 from config import settings
+from services.inventory import InsufficientStock,release_expired_forever,take_stock,utcnow
+from services.orders import order_history,owns_billing_address,place_order
+from services import metrics,sales
+from services.logs import configure_logging
+from services.passwords import password_hasher
+from services.singleflight import catalog_flights
+from services.principal import Principal,forget,get_principal
+from services.tokens import get_token_claims,token_verifier
 
 
+configure_logging()
+
 app = FastAPI()
 
+# Per-route latency, query count and DB/bcrypt/serialization time; see services/metrics.py
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(async_engine)
+metrics.registry.collectors.append(catalog_flights.prometheus)
+for engine in read_engines:
+    metrics.instrument_engine(engine)
+
 
 # List of allowed origins (can be specific or allow all with "*")
 origins = [
@@ -33,29 +50,35 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def on_startup():
-    await create_tables()
+    # Workers do not touch the schema: run python -m database.migrations once
+    # per deploy. MIGRATE_ON_STARTUP is for a single local dev process.
+    if settings.MIGRATE_ON_STARTUP:
+        from database.migrations import migrate
+        await migrate()
+    app.state.reservation_sweeper = asyncio.create_task(release_expired_forever(settings.RESERVATION_SWEEP_SECONDS))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.reservation_sweeper.cancel()
+    password_hasher.shutdown()
     
-async def create_tables():
-    async with async_engine.begin() as conn:
-        await conn.run_sync(db_models.Base.metadata.create_all)
-        
+@app.get("/metrics",response_class=PlainTextResponse,include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(),media_type="text/plain; version=0.0.4")
+
 app.include_router(add_product.router)
 app.include_router(collection.router)
+app.include_router(cart.router)
 
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"],deprecated="auto")
-
-SECRET_KEY = settings.SECRET_KEY
-ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 async def get_user_by_email(db: AsyncSession, email: str):
-    result = await db.execute(select(db_models.User).where(db_models.User.email == email))
-    return result.scalars().first()
+    # Registration only needs to know whether the email is taken
+    return await db.scalar(select(db_models.User.id).where(db_models.User.email == email))
 
 async def create_user(db: AsyncSession,user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = db_models.User(first_name=user.first_name,last_name=user.last_name,email=user.email,hashed_password=hashed_password)
     db.add(db_user)
     await db.commit()
@@ -67,27 +90,31 @@ async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get
     
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    # Hand the connection back to the pool while bcrypt runs
+    await db.rollback()
     await create_user(db=db, user=user)  
     return {"message": "User registered successfully"}
 
 async def authenticate_user(email: str,password: str,db: AsyncSession):
-    user = await db.execute(select(db_models.User).where(db_models.User.email == email))
-    user = user.scalars().first()
+    # Just the columns login needs, as a plain row rather than a User object
+    user = await db.execute(select(db_models.User.id,db_models.User.email,db_models.User.hashed_password).where(db_models.User.email == email))
+    user = user.first()
     if not user:
         return False
-    if not pwd_context.verify(password, user.hashed_password):
+    # Hand the connection back to the pool while bcrypt runs
+    await db.close()
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # Stored hash uses outdated settings, upgrade it now that we have the password
+        await db.execute(update(db_models.User).where(db_models.User.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
+        forget(user.id)
     return user
 
 def create_access_token(data: dict,expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode,SECRET_KEY,algorithm=ALGORITHM)
-    return encoded_jwt  
+    return token_verifier.sign(data, expires_delta or timedelta(minutes=15))
 
 @app.post("/token")
 async def login_for_access_token(
@@ -107,33 +134,81 @@ async def login_for_access_token(
 
 
 @app.post("/verify-token")
-async def verify_user_token(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        if email is None or user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Token is invalid or expired"
-            )
-        return {"message": "Token is valid", "email": email, "user_id": user_id}
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token is invalid or expired"
-        )
+async def verify_user_token(payload: dict = Depends(get_token_claims)):
+    return {"message": "Token is valid", "email": payload["sub"], "user_id": payload["user_id"]}
+
+@app.get("/users/me",response_model=schemas.UserOut,status_code=status.HTTP_200_OK)
+async def read_profile(principal: Principal = Depends(get_principal)):
+    return principal
+
+@app.patch("/users/me",response_model=schemas.UserOut,status_code=status.HTTP_200_OK)
+async def update_profile(request: schemas.UserUpdate,principal: Principal = Depends(get_principal),db: AsyncSession = Depends(get_db)):
+    values = request.model_dump(exclude_none=True)
+    if values:
+        await db.execute(update(db_models.User).where(db_models.User.id == principal.id).values(**values))
+        await db.commit()
+        forget(principal.id)
+    return await get_principal({"user_id": principal.id})
+
+@app.put("/users/me/password",status_code=status.HTTP_200_OK)
+async def change_password(request: schemas.PasswordChange,principal: Principal = Depends(get_principal),db: AsyncSession = Depends(get_db)):
+    hashed_password = await db.scalar(select(db_models.User.hashed_password).where(db_models.User.id == principal.id))
+    # No connection held while bcrypt runs
+    await db.close()
+    valid, _ = await password_hasher.verify_and_update(request.current_password, hashed_password)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect password")
+    hashed_password = await password_hasher.hash(request.new_password)
+    await db.execute(update(db_models.User).where(db_models.User.id == principal.id).values(hashed_password=hashed_password))
+    await db.commit()
+    forget(principal.id)
+    return {"message": "Password changed"}
         
 @app.post("/checkout_Billing",response_model=schemas.BillingAddressId,status_code=status.HTTP_200_OK)
-async def BillingAddress(request: schemas.BillingAddress,db: AsyncSession = Depends(get_db)):
-    address = db_models.BillingAddress(country=request.country,first_name=request.first_name,last_name=request.last_name,address=request.address,city=request.city,state=request.state,pincode=request.pincode,mobile_no=request.phone_no,user_id=request.user_id)
+async def BillingAddress(request: schemas.BillingAddress,principal: Principal = Depends(get_principal),db: AsyncSession = Depends(get_db)):
+    address = db_models.BillingAddress(country=request.country,first_name=request.first_name,last_name=request.last_name,address=request.address,city=request.city,state=request.state,pincode=request.pincode,mobile_no=request.phone_no,user_id=principal.id)
     db.add(address)
     await db.commit()
     await db.refresh(address)
     return address
 
 @app.post("/add_order",status_code=status.HTTP_200_OK)
-async def OrderTable(request: schemas.FinalOrder,db: AsyncSession = Depends(get_db)):
-    finalOrder = db_models.OrderTable(img_link=str(request.img_link),qty=request.qty,name=request.name,color=request.color,size=request.size,price=request.price,user_id=request.user_id,billing_address_id=request.billing_address_id)
+async def OrderTable(request: schemas.FinalOrder,principal: Principal = Depends(get_principal),db: AsyncSession = Depends(get_db)):
+    if not await take_stock(db, request.product_item_id, request.qty):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{InsufficientStock([request.product_item_id])}")
+    finalOrder = db_models.OrderTable(img_link=str(request.img_link),qty=request.qty,name=request.name,color=request.color,size=request.size,price=request.price,user_id=principal.id,billing_address_id=request.billing_address_id,product_item_id=request.product_item_id,created_at=utcnow())
     db.add(finalOrder)
+    try:
+        await db.flush()
+    except exc.IntegrityError:
+        # No such billing address
+        owned = False
+    else:
+        # Checked after the first write, see services/sales.py record()
+        owned = await owns_billing_address(db, principal.id, request.billing_address_id)
+    if not owned:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Billing address not found")
+    await sales.record(db, [sales.sale_line(finalOrder.product_item_id, finalOrder.qty, finalOrder.price, finalOrder.created_at)])
     await db.commit()
     await db.refresh(finalOrder)
-    return "Done"
\ No newline at end of file
+    return "Done"
+
+@app.post("/checkout",response_model=schemas.CheckoutResult,status_code=status.HTTP_200_OK)
+async def checkout(request: schemas.Checkout,principal: Principal = Depends(get_principal),db: AsyncSession = Depends(get_db)):
+    # Billing address, all cart lines and their stock in one transaction
+    try:
+        return await place_order(db, request, principal.id)
+    except InsufficientStock as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{e}")
+
+@app.get("/orders",response_model=schemas.OrderHistoryOut,status_code=status.HTTP_200_OK)
+async def get_order_history(
+    cursor: int | None = None,
+    limit: int = Query(settings.ORDER_PAGE_SIZE, ge=1, le=settings.CATALOG_MAX_PAGE_SIZE),
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    # The signed-in user's orders, newest first; pass next_cursor back for the
+    # next page. Read from the primary so an order shows up right after checkout.
+    return await order_history(db, principal.id, limit, cursor=cursor)
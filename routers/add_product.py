@@ -1,23 +1,35 @@
-from fastapi import APIRouter,Depends,HTTPException,status
+from fastapi import APIRouter,Depends,HTTPException,Query,Request,status
 from database import db_models
-from database.database import get_db
-from schemas import Product_form,Category,CategoryCreate,BrandSchema,ModelSchema,BrandCreateSchema,ModelCreateSchema
+from database.database import get_db,get_read_db
+from schemas import Product_form,Category,CategoryCreate,BrandSchema,ModelSchema,BrandCreateSchema,ModelCreateSchema,ProductDelete,ProductDeleteResult,TaxonomyOut,SalesByProductOut,SalesByDayOut,SalesByCategoryOut
 from sqlalchemy import exc
 import json
+import logging
 from typing import List
+from datetime import date
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from config import settings
+from services import facets,sales,search,summary
+from services.bulk_import import check_references,import_products
+from services.product_delete import delete_products
+from services.http_cache import catalog_response
+from services.responses import CatalogJSONResponse
+from services.taxonomy import taxonomy_index
+from services.cache import catalog_cache,category_key,product_key
 
 router = APIRouter(
     prefix = "/dashboard",
     tags = ["Form"]
 )
 
+logger = logging.getLogger(__name__)
+
 
 @router.post("",status_code=status.HTTP_201_CREATED)
 async def product_form(request: Product_form, db: AsyncSession = Depends(get_db)):
     data = json.loads(request.model_dump_json())
-    print(data)
+    logger.debug("Adding product", extra={"payload": request})
     
     # return
         
@@ -44,6 +56,14 @@ async def product_form(request: Product_form, db: AsyncSession = Depends(get_db)
         db.add(product)
         await db.flush()  # Ensures `product.id` is available
 
+        # Reads and deletes place a product by its brand's category, so the
+        # category, brand and model must agree; checked after the first write,
+        # see services/sales.py record()
+        _, errors = await check_references(db, [(1, request)])
+        if errors:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=errors[0]["error"])
+        category_id = data["category_id"]
+
         # Step 5 : Sizes
         for specific_size in data["sizes"]:
             size = db_models.Sizes(sizes=specific_size, products_id=product.id)
@@ -64,85 +84,117 @@ async def product_form(request: Product_form, db: AsyncSession = Depends(get_db)
             color = db_models.Colors(available_colors=specific_color, product_item_id=productItem.id)
             db.add(color)
 
+        # Step 9 : Search index
+        await search.index_products(db, [search.search_row(product.id, data["name"], data["brand_id"], data["model_id"], data["colors"], data["sizes"])])
+
+        # Step 10 : Facet counts
+        await facets.add_products(db, [(category_id, facets.product_facets(data["brand_id"], data["model_id"], data["price"], data["sizes"], data["colors"]))])
+
+        # Step 11 : Product summary, built from the rows written above
+        await db.flush()
+        await summary.refresh(db, [product.id])
+
         await db.commit()
+        # The category that lists the product, its brand's (checked above)
+        catalog_cache.invalidate(category_key(category_id))
     
         return {"message": "Product and associated data stored successfully"}
         
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback() 
-        print(f"Error occurred: {e}")
+        logger.exception("Adding product failed", extra={"payload": request})
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{e}")
     
-@router.get("/categories",response_model=List[Category],status_code=status.HTTP_200_OK)
-async def get_categories(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(db_models.ProductCategory))
-    category = result.scalars().all()
-    return category
+@router.post("/bulk_import",status_code=status.HTTP_200_OK)
+async def bulk_import(request: Request, db: AsyncSession = Depends(get_db)):
+    # NDJSON by default, CSV when the body is sent as text/csv
+    fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    report = await import_products(db, request.stream(), fmt, settings.BULK_IMPORT_CHUNK_SIZE)
+    for category_id in report["categories"]:
+        catalog_cache.invalidate(category_key(category_id))
+    return {"imported": report["imported"], "failed": len(report["errors"]), "errors": report["errors"]}
+    
+# The taxonomy reads below are answered from the in-process index
+# (services/taxonomy.py); a fresh index costs no query. Their encoded bodies
+# and ETags are kept in the index until its next change.
+
+@router.get("/taxonomy",response_model=TaxonomyOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def get_taxonomy(request: Request, db: AsyncSession = Depends(get_read_db)):
+    index = await taxonomy_index.ensure(db)
+    return catalog_response(request, index.tree())
+
+@router.get("/categories",response_model=List[Category],response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def get_categories(request: Request, db: AsyncSession = Depends(get_read_db)):
+    index = await taxonomy_index.ensure(db)
+    return catalog_response(request, index.document(("categories",), lambda: [{"id": category["id"], "name": category["name"]} for category in index.categories.values()]))
 
 @router.post("/categories", response_model=Category,status_code=status.HTTP_201_CREATED)
 async def add_category(category: CategoryCreate, db: AsyncSession = Depends(get_db)):
-    print(category)
+    logger.debug("Adding category", extra={"payload": category})
     new_category = db_models.ProductCategory(name=category.new_category,description=category.category_description)
     db.add(new_category)
     await db.commit()
     await db.refresh(new_category)
+    taxonomy_index.add_category(new_category)
+    catalog_cache.invalidate(category_key(new_category.id))
     return new_category
 
 @router.post("/category/{category}", response_model=Category,status_code=status.HTTP_200_OK)
-async def for_category_id(category: str,db: AsyncSession = Depends(get_db)):
-    # print(category)
-    result = await db.execute(select(db_models.ProductCategory).where(db_models.ProductCategory.name == category))
-    category_id = result.scalars().first()
+async def for_category_id(category: str,db: AsyncSession = Depends(get_read_db)):
+    index = await taxonomy_index.ensure(db)
+    category_id = index.category_by_name(category)
+    if category_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
     return category_id
 
 
-@router.get("/brands", response_model=list[BrandSchema],status_code=status.HTTP_200_OK)
-async def get_brands_by_category(category_id: int, db: AsyncSession = Depends(get_db)):
-    # Fetch brands associated with the category
-    result = await db.execute(select(db_models.Brands).where(db_models.Brands.product_category_id == category_id))
-    brands = result.scalars().all()
+@router.get("/brands", response_model=list[BrandSchema],response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def get_brands_by_category(category_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    index = await taxonomy_index.ensure(db)
+    brands = index.brands_of(category_id)
     
     if not brands:
         raise HTTPException(status_code=404, detail="No brands found for the given category ID")
 
-    return brands
+    return catalog_response(request, index.document(("brands", category_id), lambda: brands))
 
 @router.post("/brands",response_model=BrandSchema,status_code=status.HTTP_201_CREATED)
 async def add_brand_by_category(request: BrandCreateSchema,db: AsyncSession = Depends(get_db)):
-    print(request)
+    logger.debug("Adding brand", extra={"payload": request})
     brand = db_models.Brands(brand_name=request.new_brand,brand_description=request.brand_description,product_category_id=request.category_id)
     db.add(brand)
     await db.commit()
     await db.refresh(brand)
+    taxonomy_index.add_brand(brand)
+    catalog_cache.invalidate(category_key(brand.product_category_id))
     
     return brand
 
-@router.get("/models",response_model=List[ModelSchema],status_code=status.HTTP_200_OK)
-async def get_model_by_brand(brand_id: int,db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(db_models.Models).where(db_models.Models.brand_id == brand_id))
-    models = result.scalars().all()
+@router.get("/models",response_model=List[ModelSchema],response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def get_model_by_brand(brand_id: int,request: Request,db: AsyncSession = Depends(get_read_db)):
+    index = await taxonomy_index.ensure(db)
+    serialized_models = [{"id": model["id"], "model": model["model_name"], "brand_id": model["brand_id"]} for model in index.models_of(brand_id)]
     
-    if not models:
+    if not serialized_models:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No models found for the given brand ID")
     
-     # Convert ORM objects to Pydantic-compatible dictionaries
-    serialized_models = [
-        ModelSchema(
-            id=model.id,
-            model=model.model_name,
-            brand_id=model.brand_id
-        )
-        for model in models
-    ]
-    return serialized_models
+    return catalog_response(request, index.document(("models", brand_id), lambda: serialized_models))
 
 @router.post("/models",response_model=List[ModelSchema],status_code=status.HTTP_200_OK)
 async def add_model_by_brandId(request:ModelCreateSchema,db: AsyncSession = Depends(get_db)):
-    print(request)
+    logger.debug("Adding model", extra={"payload": request})
     model = db_models.Models(model_name=request.new_model,brand_id=request.brand_id)
     db.add(model)
     await db.commit()
     await db.refresh(model)
+    taxonomy_index.add_model(model)
+    
+    # The category page lists models too, so drop the brand's category as well
+    category_id = await db.scalar(select(db_models.Brands.product_category_id).where(db_models.Brands.id == model.brand_id))
+    catalog_cache.invalidate(category_key(category_id))
     
     model_dict = {
         "id": model.id,
@@ -152,81 +204,45 @@ async def add_model_by_brandId(request:ModelCreateSchema,db: AsyncSession = Depe
     
     return [ModelSchema(**model_dict)]
 
-@router.delete("/delete_product_from_category/{category_id}",status_code=status.HTTP_200_OK)
-async def destroy_product(category_id: int,product_id: int,db: AsyncSession = Depends(get_db)):
-    # Step 1: Check if the category exists
-    # category = db.query(db_models.ProductCategory).filter(db_models.ProductCategory.id == category_id).first()
-    category = await db.execute(select(db_models.ProductCategory).where(db_models.ProductCategory.id == category_id))
-    category = category.scalars().first()
-    if not category:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-    
-    # brand_in_use = db.query(db_models.Products).filter(db_models.Products.brand_id == product.brand_id).count()
-    brand = await db.execute(select(db_models.Brands).where(db_models.Brands.product_category_id == category))
-    brand = brand.scalars().first()
-    brand_in_use = await db.execute(select(db_models.Products).where(db_models.Products.brand_id == brand))
-    brand_in_use = brand_in_use.scalars().count()
-    if brand_in_use == 1:
-        db.delete(brand)
-    else:
-        pass
-    
-    if brand_in_use == 1:  # No other products using this brand
-        # brand = db.query(db_models.Brands).filter(db_models.Brands.id == product.brand_id).first()
-        if brand:
-            db.delete(brand)
-    
-    # Step 2: Find the product in the given category by product_id
-    # product = db.query(db_models.Products).filter(db_models.Products.id == product_id, db_models.Products.product_category_id == category.id).first()
-    product = db.execute(select(db_models.Products).where(db_models.Products.id == product_id))
-    if not product:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found in the given category")
-    
-    try:
-        # Step 3: Delete associated ProductItems (which are connected to Size, Color, etc.)
-        product_items = db.query(db_models.ProductItem).filter(db_models.ProductItem.product_id == product_id).all()
-        for item in product_items:
-            # Delete related Colors
-            colors = db.query(db_models.Colors).filter(db_models.Colors.product_item_id == item.id).all()
-            for color in colors:
-                db.delete(color)
-                
-            # Delete related Size
-            size = db.query(db_models.Sizes).filter(db_models.Sizes.products_id == product_id).first()
-            if size:
-                db.delete(size)
-                
-            # Delete the ProductItem itself
-            db.delete(item)
-            
-        # Step 4: Delete associated Images
-        images = db.query(db_models.Images).filter(db_models.Images.product_id == product_id).all()
-        for image in images:
-            db.delete(image)
-            
-        # Step 5: Optionally delete associated Brand and Model if no other product uses them
-        # Check if the Brand is used by any other product
-        
+# Sales reports, read from the rollups the order write paths maintain (services/sales.py)
 
-        # Check if the Model is used by any other product
-        model_in_use = db.query(db_models.Products).filter(db_models.Products.model_id == product.model_id).count()
-        if model_in_use == 1:  # No other products using this model
-            model = db.query(db_models.Models).filter(db_models.Models.id == product.model_id).first()
-            if model:
-                db.delete(model)
-        
-        # Step 6: Optionally delete the ProductCategory if no other product is associated with it
-        category_in_use = db.query(db_models.Products).filter(db_models.Products.product_category_id == product.product_category_id).count()
-        if category_in_use == 1:  # No other products using this category
-            db.delete(category)
+@router.get("/reports/sales_by_product",response_model=List[SalesByProductOut],status_code=status.HTTP_200_OK)
+async def sales_by_product(limit: int = Query(settings.CATALOG_PAGE_SIZE, ge=1, le=settings.CATALOG_MAX_PAGE_SIZE),db: AsyncSession = Depends(get_read_db)):
+    return await sales.product_report(db, limit)
+
+@router.get("/reports/sales_by_day",response_model=List[SalesByDayOut],status_code=status.HTTP_200_OK)
+async def sales_by_day(start: date | None = None,end: date | None = None,db: AsyncSession = Depends(get_read_db)):
+    return await sales.day_report(db, start, end)
 
-        # Step 7: Delete the Product itself
-        db.delete(product)
+@router.get("/reports/sales_by_category",response_model=List[SalesByCategoryOut],status_code=status.HTTP_200_OK)
+async def sales_by_category(db: AsyncSession = Depends(get_read_db)):
+    return await sales.category_report(db)
 
-        # Step 8: Commit the transaction to delete the product and all related records
-        db.commit()  # Commit the deletion process
+@router.get("/cache_stats",status_code=status.HTTP_200_OK)
+async def cache_stats():
+    return {**catalog_cache.stats(), "taxonomy": taxonomy_index.stats()}
+
+@router.delete("/delete_product_from_category/{category_id}",response_model=ProductDeleteResult,status_code=status.HTTP_200_OK)
+async def destroy_product(category_id: int,product_id: int,prune: bool = False,db: AsyncSession = Depends(get_db)):
+    report = await remove_products(db, [product_id], category_id=category_id, prune=prune)
+    if not report["product_ids"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found in the given category")
+    return report
 
-        return {"message": "Product and its details deleted successfully"}
-    except exc.SQLAlchemyError as e:
-        db.rollback()  # Rollback in case of error
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error deleting product details")
\ No newline at end of file
+@router.post("/bulk_delete",response_model=ProductDeleteResult,status_code=status.HTTP_200_OK)
+async def bulk_delete(request: ProductDelete,db: AsyncSession = Depends(get_db)):
+    return await remove_products(db, request.product_ids, prune=request.prune)
+
+async def remove_products(db: AsyncSession, product_ids, category_id: int | None = None, prune: bool = False):
+    try:
+        report = await delete_products(db, product_ids, category_id=category_id, prune=prune)
+    except exc.SQLAlchemyError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error deleting product details")
+    
+    keys = [product_key(product_id) for product_id in report["deleted"]]
+    keys += [category_key(category) for category in report["categories"]]
+    if prune:
+        taxonomy_index.expire()
+    catalog_cache.invalidate(*keys)
+    return {"deleted": len(report["deleted"]), "product_ids": report["deleted"]}
@@ -0,0 +1,28 @@
+from fastapi import APIRouter,Depends,HTTPException,status
+from database.database import get_db
+from schemas import ReservationCreate,Reservation
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import timedelta
+from config import settings
+from services import inventory
+from services.principal import Principal,get_principal
+
+router = APIRouter(
+    prefix = "/cart",
+    tags = ["Cart"]
+)
+
+
+@router.post("/reservations",response_model=Reservation,status_code=status.HTTP_201_CREATED)
+async def reserve_stock(request: ReservationCreate,principal: Principal = Depends(get_principal),db: AsyncSession = Depends(get_db)):
+    # Holds stock for a cart line until checkout or RESERVATION_TTL_SECONDS
+    try:
+        return await inventory.hold(db, principal.id, request.product_item_id, request.qty, timedelta(seconds=settings.RESERVATION_TTL_SECONDS))
+    except inventory.InsufficientStock as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{e}")
+
+@router.delete("/reservations/{reservation_id}",status_code=status.HTTP_200_OK)
+async def release_stock(reservation_id: int,principal: Principal = Depends(get_principal),db: AsyncSession = Depends(get_db)):
+    if not await inventory.release(db, principal.id, reservation_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found")
+    return {"message": "Reservation released"}
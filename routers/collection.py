@@ -1,12 +1,15 @@
-from fastapi import APIRouter,Depends,HTTPException,status
-from database import db_models
-from database.database import get_db
-from schemas import Product_form,Category,CategoryCreate,BrandSchema,ModelSchema,BrandCreateSchema
-from sqlalchemy import exc
-import json
-from typing import List
+from fastapi import APIRouter,Depends,HTTPException,Query,Request,status
+from fastapi.responses import StreamingResponse
+from database.database import ReadSessionLocal,SessionLocal,get_read_db
+from schemas import CollectionOut,ProductPageOut,BrowseOut,ProductDetailOut,SearchResultsOut
+import orjson
+from config import settings
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from services import catalog,facets,metrics,search,summary
+from services.cache import catalog_cache,category_key,product_key
+from services.singleflight import catalog_flights
+from services.http_cache import catalog_response,tagged
+from services.responses import CatalogJSONResponse
 
 router = APIRouter(
     prefix = "/collection",
@@ -15,64 +18,109 @@ router = APIRouter(
 
 
 
-@router.post("/{categoryID}",status_code=status.HTTP_200_OK)
-async def all_stuff(categoryID: int,db: AsyncSession = Depends(get_db)):
-    
-    category = await db.execute(select(db_models.ProductCategory).where(db_models.ProductCategory.id == categoryID))
-    category = category.scalars().first()
-    
-    brands = await db.execute(select(db_models.Brands).where(db_models.Brands.product_category_id == categoryID))
-    brands = brands.scalars().all()
-    
-    brand_ids = [brand.id for brand in brands]
-    # .in_() => SQLAlchemy function to check if the column value exists in the given list
-    models = await db.execute(select(db_models.Models).where(db_models.Models.brand_id.in_(brand_ids)))
-    models = models.scalars().all()
-    
-    model_ids = [model.id for model in models]
-    products = await db.execute(select(db_models.Products).where(db_models.Products.brand_id.in_(brand_ids),db_models.Products.model_id.in_(model_ids)))
-    products = products.scalars().all()
+@router.get("/search",response_model=SearchResultsOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.CATALOG_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Registered before /{categoryID} so "search" is not taken for a category id
+    return CatalogJSONResponse(await search.search_products(db, q, limit, offset))
 
-    
-    product_ids = [product.id for product in products]
-    sizes = await db.execute(select(db_models.Sizes).where(db_models.Sizes.products_id.in_(product_ids)))
-    sizes = sizes.scalars().all()
-    img = await db.execute(select(db_models.Images).where(db_models.Images.product_id.in_(product_ids)))
-    img  = img.scalars().all()
-    product_items = await db.execute(select(db_models.ProductItem).where(db_models.ProductItem.product_id.in_(product_ids)))
-    product_items = product_items.scalars().all()
-    
-    product_item_ids = [product_item.id for product_item in product_items]
-    colors = await db.execute(select(db_models.Colors.product_item_id.in_(product_item_ids)))
-    colors = colors.scalars().all()
-    
-    return {"category": category,"brands" : brands,"models" : models,"products" :products,"sizes":sizes,"img":img,"product_items":product_items,"colors":colors}
+# Catalog reads answer both POST (what the frontend has always sent) and GET,
+# which browsers and CDNs can cache and revalidate with If-None-Match
+@router.get("/{categoryID}",response_model=CollectionOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+@router.post("/{categoryID}",response_model=CollectionOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def all_stuff(categoryID: int,request: Request,db: AsyncSession = Depends(get_read_db)):
+    # Taxonomy plus one range scan of the product summaries, cached already encoded
+    key = category_key(categoryID)
+    document = await catalog_cache.get_or_load(key, lambda: load_cached(key, db, lambda session: summary.load_category(session, categoryID)))
+    return catalog_response(request, document)
 
-@router.post("/productItem/{productItemID}",status_code=status.HTTP_200_OK)
-async def productItemDetail(productItemID: int,db: AsyncSession = Depends(get_db)):
-    product = await db.execute(select(db_models.Products).where(db_models.Products.id == productItemID))
-    product = product.scalars().first()
-    # print(product.__dict__)
-    
-    size_store = []
-    sizes = await db.execute(select(db_models.Sizes).where(db_models.Sizes.products_id == product.id))
-    sizes= sizes.scalars().all()
-    for size in sizes:
-        size_store.append(size)
-    
-    img_store = []
-    img = await db.execute(select(db_models.Images).where(db_models.Images.product_id == productItemID))
-    img = img.scalars().all()
-    for image in img:
-        img_store.append(image)
-        
-    product_item = await db.execute(select(db_models.ProductItem).where(db_models.ProductItem.product_id == productItemID))
-    product_item = product_item.scalars().first()
-    
-    color_store = []
-    color = await db.execute(select(db_models.Colors).where(db_models.Colors.product_item_id == product_item.id))
-    color = color.scalars().all()
-    for col in color:
-        color_store.append(col)
-    
-    return {"Product": product,"Size":size_store,"Image":img_store,"Product_item":product_item,"Color": color_store}
\ No newline at end of file
+async def load_cached(key, db: AsyncSession, load):
+    # A key a dashboard write invalidated is loaded from the primary: a
+    # replica may not have the write yet (services/cache.py)
+    if not catalog_cache.written(key):
+        return await encode(load(db))
+    async with SessionLocal() as primary:
+        return await encode(load(primary))
+
+async def encode(document):
+    # Encoded body and its ETag (services/http_cache.py), computed once per load
+    document = await document
+    with metrics.timer("serialize_seconds"):
+        return tagged(orjson.dumps(document))
+
+@router.get("/{categoryID}/products",response_model=ProductPageOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def list_products(
+    categoryID: int,
+    request: Request,
+    cursor: int | None = None,
+    limit: int = Query(settings.CATALOG_PAGE_SIZE, ge=1, le=settings.CATALOG_MAX_PAGE_SIZE),
+    brand_id: int | None = None,
+    model_id: int | None = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    if stream:
+        # NDJSON export of everything after the cursor, one product per line
+        return StreamingResponse(export_products(categoryID, cursor, brand_id, model_id), media_type="application/x-ndjson")
+    # Pages are not cached, but identical concurrent requests share one load.
+    # They carry stock, so a 304 still loads and hashes the page
+    # (services/http_cache.py); only the transfer is saved.
+    document = await catalog_flights.do(
+        ("products", catalog_cache.version, categoryID, cursor, limit, brand_id, model_id),
+        lambda: encode(catalog.load_product_page(db, categoryID, limit, cursor=cursor, brand_id=brand_id, model_id=model_id)),
+    )
+    return catalog_response(request, document)
+
+@router.get("/{categoryID}/browse",response_model=BrowseOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def browse_products(
+    categoryID: int,
+    request: Request,
+    cursor: int | None = None,
+    limit: int = Query(settings.CATALOG_PAGE_SIZE, ge=1, le=settings.CATALOG_MAX_PAGE_SIZE),
+    brand_id: int | None = None,
+    model_id: int | None = None,
+    size: str | None = None,
+    color: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Not cached either: a 304 saves the transfer, not the load
+    document = await catalog_flights.do(
+        ("browse", catalog_cache.version, categoryID, cursor, limit, brand_id, model_id, size, color, min_price, max_price),
+        lambda: encode(load_browse_page(db, categoryID, limit, cursor, brand_id=brand_id, model_id=model_id, size=size, color=color, min_price=min_price, max_price=max_price)),
+    )
+    return catalog_response(request, document)
+
+async def load_browse_page(db: AsyncSession, categoryID: int, limit: int, cursor: int | None, **filters):
+    page = await catalog.load_product_page(db, categoryID, limit, cursor=cursor, **filters)
+    # Counts are category-wide and read from the facet_count aggregate, not recomputed per filter
+    page["facets"] = await facets.load_facets(db, categoryID)
+    return page
+
+async def export_products(categoryID: int, cursor: int | None, brand_id: int | None, model_id: int | None):
+    # Own session: the request's dependencies may be closed before the body finishes streaming
+    async with ReadSessionLocal() as db:
+        async for product in catalog.stream_products(db, categoryID, settings.CATALOG_STREAM_BATCH_SIZE, cursor=cursor, brand_id=brand_id, model_id=model_id):
+            yield orjson.dumps(product) + b"\n"
+
+@router.get("/productItem/{productItemID}",response_model=ProductDetailOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+@router.post("/productItem/{productItemID}",response_model=ProductDetailOut,response_class=CatalogJSONResponse,status_code=status.HTTP_200_OK)
+async def productItemDetail(productItemID: int,request: Request,db: AsyncSession = Depends(get_read_db)):
+    key = product_key(productItemID)
+    document = await catalog_cache.get_or_load(key, lambda: load_cached(key, db, lambda session: load_detail(productItemID, session)))
+    return catalog_response(request, document)
+
+async def load_detail(productItemID: int,db: AsyncSession):
+    # One primary-key read of the summary; the catalog tables (in one UNION
+    # query) only for a product whose summary has not been built yet
+    document = await summary.load_product(db, productItemID)
+    if document is None:
+        document = await catalog.load_product_detail(db, productItemID)
+    if document is None or document["Product_item"] is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    return document
@@ -1,5 +1,6 @@
 from pydantic import BaseModel,HttpUrl,validator,EmailStr,constr,Field,StringConstraints
 from typing import List,Optional,Annotated
+from datetime import date,datetime
 
 
 PasswordStr = constr(min_length=6, max_length=128)
@@ -102,21 +103,247 @@ class BillingAddress(BaseModel):
     state: str
     pincode: int = Field(..., ge=100000, le=999999)
     phone_no: int = Field(..., ge=1000000000, le=9999999999)
-    user_id: int
     
     @validator('country', 'first_name', 'last_name', 'address', 'city', 'state')
     def strip_whitespace(cls, v):
         return v.strip()
     
+class UserUpdate(BaseModel):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: Annotated[str, StringConstraints(min_length=6, max_length=128)]
+
+class UserOut(BaseModel):
+    id: int
+    email: str
+    first_name: str
+    last_name: str
+
+    class Config:
+        from_attributes = True
+
 class BillingAddressId(BaseModel):
     id: int
     
 class FinalOrder(BaseModel):
     img_link: HttpUrl
+    qty: int = Field(..., ge=1)
+    name: str
+    color: str
+    size: str
+    price: float = Field(..., gt=0)
+    billing_address_id: int
+    # The ordered qty is taken from this item's stock; an order without one
+    # would skip the stock check
+    product_item_id: int
+
+# Compact collection payloads. The catalog loaders build these shapes straight
+# from row tuples and the routes send them pre-encoded, so these classes
+# document the responses rather than validate them on the way out.
+
+class CategoryOut(BaseModel):
+    id: int
+    name: str
+    description: str
+
+class BrandOut(BaseModel):
+    id: int
+    brand_name: str
+    brand_description: str
+    product_category_id: int
+
+class ModelOut(BaseModel):
+    id: int
+    model_name: str
+    brand_id: int
+
+class SizeOut(BaseModel):
+    id: int
+    sizes: str
+
+class ImageOut(BaseModel):
+    id: int
+    image_url: str
+
+class ColorOut(BaseModel):
+    id: int
+    available_colors: str
+
+class ProductItemOut(BaseModel):
+    id: int
+    quantity: int
+    colors: List[ColorOut]
+
+class ProductOut(BaseModel):
+    id: int
+    name: str
+    price: float
+    brand_id: int
+    model_id: int
+    sizes: List[SizeOut]
+    images: List[ImageOut]
+    product_items: List[ProductItemOut]
+
+class CollectionOut(BaseModel):
+    category: Optional[CategoryOut]
+    brands: List[BrandOut]
+    models: List[ModelOut]
+    products: List[ProductOut]
+
+class ProductPageOut(BaseModel):
+    products: List[ProductOut]
+    next_cursor: Optional[int]
+
+class FacetIdOut(BaseModel):
+    id: int
+    count: int
+
+class FacetValueOut(BaseModel):
+    value: str
+    count: int
+
+class FacetPriceOut(BaseModel):
+    min: int
+    max: int
+    count: int
+
+class FacetsOut(BaseModel):
+    brand: List[FacetIdOut]
+    model: List[FacetIdOut]
+    size: List[FacetValueOut]
+    color: List[FacetValueOut]
+    price: List[FacetPriceOut]
+
+class BrowseOut(BaseModel):
+    products: List[ProductOut]
+    next_cursor: Optional[int]
+    facets: FacetsOut
+
+class TaxonomyBrandOut(BrandOut):
+    models: List[ModelOut]
+
+class TaxonomyCategoryOut(CategoryOut):
+    brands: List[TaxonomyBrandOut]
+
+class TaxonomyOut(BaseModel):
+    categories: List[TaxonomyCategoryOut]
+
+class SearchResultOut(BaseModel):
+    id: int
+    name: str
+    price: float
+    brand_id: int
+    model_id: int
+    brand_name: str
+    model_name: str
+    score: float
+
+class SearchResultsOut(BaseModel):
+    results: List[SearchResultOut]
+    next_offset: Optional[int]
+
+class ProductDetailSize(SizeOut):
+    products_id: int
+
+class ProductDetailImage(ImageOut):
+    product_id: int
+
+class ProductDetailItem(BaseModel):
+    id: int
+    product_id: int
+    quantity: int
+
+class ProductDetailColor(ColorOut):
+    product_item_id: int
+
+class ProductDetailProduct(BaseModel):
+    id: int
+    name: str
+    price: float
+    brand_id: int
+    model_id: int
+
+class ProductDetailOut(BaseModel):
+    Product: ProductDetailProduct
+    Size: List[ProductDetailSize]
+    Image: List[ProductDetailImage]
+    Product_item: Optional[ProductDetailItem]
+    Color: List[ProductDetailColor]
+
+
+class CheckoutLine(BaseModel):
+    img_link: HttpUrl
+    qty: int = Field(..., ge=1)
+    name: str
+    color: str
+    size: str
+    price: float = Field(..., gt=0)
+    product_item_id: int
+    # Stock held earlier through /cart/reservations, if any
+    reservation_id: Optional[int] = None
+
+class Checkout(BaseModel):
+    billing: BillingAddress
+    lines: Annotated[List[CheckoutLine], Field(min_length=1)]
+
+class CheckoutResult(BaseModel):
+    billing_address_id: int
+    order_ids: List[int]
+
+class OrderOut(BaseModel):
+    id: int
+    img_link: str
     qty: int
     name: str
     color: str
     size: str
     price: float
-    user_id: int
-    billing_address_id: int
\ No newline at end of file
+    product_item_id: Optional[int]
+    billing_address_id: int
+    created_at: Optional[datetime]
+
+class OrderHistoryOut(BaseModel):
+    orders: List[OrderOut]
+    next_cursor: Optional[int]
+
+class SalesByProductOut(BaseModel):
+    product_id: int
+    name: Optional[str]
+    category_id: Optional[int]
+    units: int
+    revenue: float
+    lines: int
+
+class SalesByDayOut(BaseModel):
+    day: date
+    units: int
+    revenue: float
+    lines: int
+
+class SalesByCategoryOut(BaseModel):
+    category_id: int
+    name: Optional[str]
+    units: int
+    revenue: float
+    lines: int
+
+class ReservationCreate(BaseModel):
+    product_item_id: int
+    qty: int = Field(..., ge=1)
+
+class Reservation(BaseModel):
+    id: int
+    product_item_id: int
+    qty: int
+    expires_at: datetime
+
+class ProductDelete(BaseModel):
+    product_ids: Annotated[List[int], Field(min_length=1)]
+    prune: bool = False
+
+class ProductDeleteResult(BaseModel):
+    deleted: int
+    product_ids: List[int]
@@ -0,0 +1,239 @@
+import csv
+import json
+import logging
+
+from pydantic import ValidationError
+from sqlalchemy import exc,insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import db_models
+from schemas import Product_form
+from services import facets,search,summary
+
+
+# Bulk product import.
+#
+# The body is read as a stream, either NDJSON (one Product_form object per
+# line) or CSV with a header row and "|"-separated images, colors and sizes;
+# quoted CSV fields may contain newlines. Records are validated and written
+# in chunks: each chunk is one transaction with one executemany INSERT per
+# table, and a bad record is reported by its line number without failing the
+# rest of the import.
+
+CSV_LIST_FIELDS = ("images", "colors", "sizes")
+WRITE_FAILED = "Could not store the product"
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_lines(stream):
+    # Lines keep their "\n", which csv.reader needs inside quoted fields
+    buffer = b""
+    async for piece in stream:
+        buffer += piece
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8") + "\n"
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+class LineFeed:
+    # The lines csv.reader reads from, handed over a row at a time. Unlike a
+    # generator it can run dry and be refilled.
+    def __init__(self):
+        self.lines = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.pop(0)
+
+
+async def iter_csv_rows(stream):
+    # Yields (line_number, values or None, error or None), numbered by each
+    # row's first line. One csv.reader reads the whole body; it is only asked
+    # for a row once the quotes of the lines fed to it balance, so a quoted
+    # field can span lines without the reader running out of input.
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    line_number = first = quotes = 0
+    async for line in iter_lines(stream):
+        line_number += 1
+        if not feed.lines and not line.strip():
+            continue
+        if not feed.lines:
+            first = line_number
+        feed.lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        try:
+            values = next(reader)
+        except (csv.Error, StopIteration) as e:
+            # A stray quote can leave the reader wanting more lines than were fed
+            feed.lines.clear()
+            yield first, None, f"Malformed line: {e or 'unterminated quoted field'}"
+            continue
+        yield first, values, None
+    if feed.lines:
+        yield first, None, "Malformed line: unterminated quoted field"
+
+
+async def iter_records(stream, fmt: str):
+    # Yields (line_number, record or None, error or None)
+    if fmt == "csv":
+        header = None
+        async for line_number, values, error in iter_csv_rows(stream):
+            if error is not None:
+                yield line_number, None, error
+                continue
+            if header is None:
+                header = values
+                continue
+            record = dict(zip(header, values))
+            for field in CSV_LIST_FIELDS:
+                record[field] = [value for value in record.get(field, "").split("|") if value]
+            yield line_number, record, None
+        return
+
+    line_number = 0
+    async for line in iter_lines(stream):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Malformed line: {e}"
+            continue
+        yield line_number, record, None
+
+
+def format_validation_error(error: ValidationError):
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors())
+
+
+async def check_references(db: AsyncSession, products):
+    # One lookup per chunk instead of one per product
+    model_ids = {product.model_id for _, product in products}
+    brand_ids = {product.brand_id for _, product in products}
+    models = await db.execute(select(db_models.Models.id, db_models.Models.brand_id).where(db_models.Models.id.in_(model_ids)))
+    brands = await db.execute(select(db_models.Brands.id, db_models.Brands.product_category_id).where(db_models.Brands.id.in_(brand_ids)))
+    model_brand = dict(models.all())
+    brand_category = dict(brands.all())
+
+    valid, errors = [], []
+    for line_number, product in products:
+        if brand_category.get(product.brand_id) != product.category_id:
+            errors.append({"line": line_number, "error": f"Brand {product.brand_id} not found in category {product.category_id}"})
+        elif model_brand.get(product.model_id) != product.brand_id:
+            errors.append({"line": line_number, "error": f"Model {product.model_id} not found for brand {product.brand_id}"})
+        else:
+            valid.append((line_number, product))
+    return valid, errors
+
+
+async def write_chunk(db: AsyncSession, products):
+    product_ids = await db.scalars(
+        insert(db_models.Products).returning(db_models.Products.id, sort_by_parameter_order=True),
+        [{"name": p.name, "price": p.price, "brand_id": p.brand_id, "model_id": p.model_id} for p in products],
+    )
+    product_ids = product_ids.all()
+    item_ids = await db.scalars(
+        insert(db_models.ProductItem).returning(db_models.ProductItem.id, sort_by_parameter_order=True),
+        [{"product_id": product_id, "quantity": p.stock_qty} for product_id, p in zip(product_ids, products)],
+    )
+    item_ids = item_ids.all()
+
+    sizes, images, colors = [], [], []
+    for product_id, item_id, p in zip(product_ids, item_ids, products):
+        sizes.extend({"sizes": size, "products_id": product_id} for size in p.sizes)
+        images.extend({"image_url": str(image), "product_id": product_id} for image in p.images)
+        colors.extend({"available_colors": color, "product_item_id": item_id} for color in p.colors)
+    for model, rows in ((db_models.Sizes, sizes), (db_models.Images, images), (db_models.Colors, colors)):
+        if rows:
+            await db.execute(insert(model), rows)
+    await search.index_products(db, [
+        search.search_row(product_id, p.name, p.brand_id, p.model_id, p.colors, p.sizes) for product_id, p in zip(product_ids, products)
+    ])
+    await facets.add_products(db, [
+        (p.category_id, facets.product_facets(p.brand_id, p.model_id, p.price, p.sizes, p.colors)) for p in products
+    ])
+    await summary.refresh(db, product_ids)
+    return product_ids
+
+
+async def import_chunk(db: AsyncSession, chunk, report):
+    # The chunk is written before its references are read, as in
+    # product_form: on SQLite a transaction that reads first and writes
+    # later fails outright if another writer committed in between (see
+    # services/sales.py record()).
+    try:
+        await write_chunk(db, [product for _, product in chunk])
+        valid, errors = await check_references(db, chunk)
+        if not errors:
+            await db.commit()
+            imported(report, chunk)
+            return
+        await db.rollback()
+    except exc.IntegrityError:
+        # A brand or model that does not exist at all; find the lines in a
+        # read-only transaction of their own
+        await db.rollback()
+        valid, errors = await check_references(db, chunk)
+        await db.rollback()
+    except Exception:
+        await db.rollback()
+        failed(report, chunk)
+        return
+
+    report["errors"].extend(errors)
+    if not valid:
+        return
+    try:
+        await write_chunk(db, [product for _, product in valid])
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        failed(report, valid)
+        return
+    imported(report, valid)
+
+
+def imported(report, products):
+    report["imported"] += len(products)
+    report["categories"].update(product.category_id for _, product in products)
+
+
+def failed(report, products):
+    # The database's own message can carry SQL and values; it goes to the log
+    logger.exception("Importing %d products failed", len(products))
+    report["errors"].extend({"line": line_number, "error": WRITE_FAILED} for line_number, _ in products)
+
+
+async def import_products(db: AsyncSession, stream, fmt: str, chunk_size: int):
+    report = {"imported": 0, "errors": [], "categories": set()}
+    chunk = []
+    async for line_number, record, error in iter_records(stream, fmt):
+        if error is not None:
+            report["errors"].append({"line": line_number, "error": error})
+            continue
+        try:
+            chunk.append((line_number, Product_form.model_validate(record)))
+        except ValidationError as e:
+            report["errors"].append({"line": line_number, "error": format_validation_error(e)})
+            continue
+        if len(chunk) >= chunk_size:
+            await import_chunk(db, chunk, report)
+            chunk = []
+    if chunk:
+        await import_chunk(db, chunk, report)
+
+    report["errors"].sort(key=lambda error: error["line"])
+    return report
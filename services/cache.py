@@ -0,0 +1,132 @@
+import time
+from collections import OrderedDict
+
+from config import settings
+from services.singleflight import catalog_flights
+
+
+# In-process catalog cache.
+#
+# Entries are keyed by tuples such as ("category", 3) or ("product", 7) and are
+# bounded both by age (TTL) and by count (LRU). Every key also carries a
+# generation number that the dashboard write paths bump through invalidate();
+# a load that started before an invalidation is not stored, so a slow reader
+# can never put a pre-write snapshot back into the cache. A key stays
+# written() from its invalidation until a load is stored again; the loaders
+# read such keys from the primary, since a replica that has not caught up
+# would hand back the pre-write document under the new generation. Concurrent
+# misses on the same key and generation share one load
+# (services/singleflight.py).
+
+_MISSING = object()
+
+
+class CatalogCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, clock=time.monotonic, flights=None):
+        self.max_entries = max_entries
+        self.flights = flights
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.version = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._written = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self, key):
+        return self._generations.get(key, 0)
+
+    def written(self, key):
+        return key in self._written
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, generation=None):
+        if generation is not None and generation != self.generation(key):
+            # Invalidated while the value was being loaded
+            return
+        self._entries[key] = (value, self.clock() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        self._written.discard(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+        generation = self.generation(key)
+
+        async def load():
+            value = await loader()
+            self.set(key, value, generation)
+            return value
+
+        if self.flights is None:
+            return await load()
+        # Keyed by generation too: requests arriving after an invalidation
+        # must not join a load that started before it
+        return await self.flights.do((*key, generation), load)
+
+    def invalidate(self, *keys):
+        self.version += 1
+        for key in keys:
+            self._generations[key] = self.generation(key) + 1
+            self._written.add(key)
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self.version += 1
+        for key in list(self._entries):
+            self._generations[key] = self.generation(key) + 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "single_flight": self.flights.stats() if self.flights is not None else None,
+        }
+
+
+catalog_cache = CatalogCache(
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS,
+    flights=catalog_flights,
+)
+
+
+def category_key(category_id: int):
+    return ("category", category_id)
+
+
+def product_key(product_id: int):
+    return ("product", product_id)
+
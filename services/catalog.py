@@ -0,0 +1,294 @@
+from database import db_models
+from sqlalchemy import Float, Integer, String, cast, literal, null, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+
+# Catalog read engine for a whole category.
+#
+# The old /collection/{categoryID} handler ran one query per table and rebuilt
+# the IN-lists in Python between them. Here the category tree is loaded in two
+# round trips:
+#   1. category -> brands -> models as one outer join
+#   2. products plus their sizes, images, items and colors as one UNION ALL
+#      over a CTE of the category's product ids
+# and the rows are folded into a pre-nested document.
+
+
+def _null(type_):
+    # Typed NULL so every branch of the UNION has matching column types
+    return cast(null(), type_)
+
+
+def category_products(
+    category_id: int,
+    brand_id: int | None = None,
+    model_id: int | None = None,
+    after_id: int | None = None,
+    size: str | None = None,
+    color: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+):
+    # A product belongs to the category when both its brand and the brand of
+    # its model are filed under it (same rule the old handler applied).
+    product_brand = aliased(db_models.Brands)
+    model_brand = aliased(db_models.Brands)
+    query = (
+        select(
+            db_models.Products.id,
+            db_models.Products.name,
+            db_models.Products.price,
+            db_models.Products.brand_id,
+            db_models.Products.model_id,
+        )
+        .join(product_brand, db_models.Products.brand_id == product_brand.id)
+        .join(db_models.Models, db_models.Products.model_id == db_models.Models.id)
+        .join(model_brand, db_models.Models.brand_id == model_brand.id)
+        .where(
+            product_brand.product_category_id == category_id,
+            model_brand.product_category_id == category_id,
+        )
+        .order_by(db_models.Products.id)
+    )
+    if brand_id is not None:
+        query = query.where(db_models.Products.brand_id == brand_id)
+    if model_id is not None:
+        query = query.where(db_models.Products.model_id == model_id)
+    if after_id is not None:
+        query = query.where(db_models.Products.id > after_id)
+    if size is not None:
+        query = query.where(
+            select(db_models.Sizes.id)
+            .where(db_models.Sizes.products_id == db_models.Products.id, db_models.Sizes.sizes == size)
+            .exists()
+        )
+    if color is not None:
+        query = query.where(
+            select(db_models.Colors.id)
+            .join(db_models.ProductItem, db_models.ProductItem.id == db_models.Colors.product_item_id)
+            .where(db_models.ProductItem.product_id == db_models.Products.id, db_models.Colors.available_colors == color)
+            .exists()
+        )
+    if min_price is not None:
+        query = query.where(db_models.Products.price >= min_price)
+    if max_price is not None:
+        query = query.where(db_models.Products.price < max_price)
+    return query
+
+
+def taxonomy_query(category_id: int):
+    return (
+        select(
+            db_models.ProductCategory.id,
+            db_models.ProductCategory.name,
+            db_models.ProductCategory.description,
+            db_models.Brands.id.label("brand_id"),
+            db_models.Brands.brand_name,
+            db_models.Brands.brand_description,
+            db_models.Models.id.label("model_id"),
+            db_models.Models.model_name,
+        )
+        .select_from(db_models.ProductCategory)
+        .outerjoin(db_models.Brands, db_models.Brands.product_category_id == db_models.ProductCategory.id)
+        .outerjoin(db_models.Models, db_models.Models.brand_id == db_models.Brands.id)
+        .where(db_models.ProductCategory.id == category_id)
+        .order_by(db_models.Brands.id, db_models.Models.id)
+    )
+
+
+def _child_rows(product_ids):
+    # Every branch returns (kind, id, product_id, ref_a, ref_b, label, amount).
+    # Children are filtered with IN (...) rather than joined to the products
+    # so the planner probes their product_id indexes instead of scanning.
+    size_rows = select(
+        literal("size", String).label("kind"),
+        db_models.Sizes.id,
+        db_models.Sizes.products_id.label("product_id"),
+        _null(Integer).label("ref_a"),
+        _null(Integer).label("ref_b"),
+        db_models.Sizes.sizes.label("label"),
+        _null(Float).label("amount"),
+    ).where(db_models.Sizes.products_id.in_(product_ids))
+    image_rows = select(
+        literal("image", String),
+        db_models.Images.id,
+        db_models.Images.product_id,
+        _null(Integer),
+        _null(Integer),
+        db_models.Images.image_url,
+        _null(Float),
+    ).where(db_models.Images.product_id.in_(product_ids))
+    item_rows = select(
+        literal("item", String),
+        db_models.ProductItem.id,
+        db_models.ProductItem.product_id,
+        _null(Integer),
+        _null(Integer),
+        _null(String),
+        cast(db_models.ProductItem.quantity, Float),
+    ).where(db_models.ProductItem.product_id.in_(product_ids))
+    color_rows = (
+        select(
+            literal("color", String),
+            db_models.Colors.id,
+            db_models.ProductItem.product_id,
+            db_models.Colors.product_item_id,
+            _null(Integer),
+            db_models.Colors.available_colors,
+            _null(Float),
+        )
+        .join(db_models.ProductItem, db_models.ProductItem.id == db_models.Colors.product_item_id)
+        .where(db_models.ProductItem.product_id.in_(product_ids))
+    )
+    return [size_rows, image_rows, item_rows, color_rows]
+
+
+def products_query(category_id: int, limit: int | None = None, **filters):
+    products = category_products(category_id, **filters).limit(limit).cte("category_products")
+    product_rows = select(
+        literal("product", String).label("kind"),
+        products.c.id,
+        products.c.id.label("product_id"),
+        products.c.brand_id.label("ref_a"),
+        products.c.model_id.label("ref_b"),
+        products.c.name.label("label"),
+        cast(products.c.price, Float).label("amount"),
+    )
+    query = union_all(product_rows, *_child_rows(select(products.c.id).scalar_subquery()))
+    return query.order_by(query.selected_columns.id)
+
+
+def children_query(product_ids):
+    query = union_all(*_child_rows(product_ids))
+    return query.order_by(query.selected_columns.id)
+
+
+def detail_query(product_id: int):
+    # The product and all of its children in one round trip
+    product_row = select(
+        literal("product", String).label("kind"),
+        db_models.Products.id,
+        db_models.Products.id.label("product_id"),
+        db_models.Products.brand_id.label("ref_a"),
+        db_models.Products.model_id.label("ref_b"),
+        db_models.Products.name.label("label"),
+        cast(db_models.Products.price, Float).label("amount"),
+    ).where(db_models.Products.id == product_id)
+    query = union_all(product_row, *_child_rows([product_id]))
+    return query.order_by(query.selected_columns.id)
+
+
+def build_taxonomy(rows):
+    category = None
+    brands = {}
+    models = []
+    for row in rows:
+        if category is None:
+            category = {"id": row.id, "name": row.name, "description": row.description}
+        if row.brand_id is not None and row.brand_id not in brands:
+            brands[row.brand_id] = {
+                "id": row.brand_id,
+                "brand_name": row.brand_name,
+                "brand_description": row.brand_description,
+                "product_category_id": row.id,
+            }
+        if row.model_id is not None:
+            models.append({"id": row.model_id, "model_name": row.model_name, "brand_id": row.brand_id})
+    return category, list(brands.values()), models
+
+
+def new_product(id, name, price, brand_id, model_id):
+    return {
+        "id": id,
+        "name": name,
+        "price": price,
+        "brand_id": brand_id,
+        "model_id": model_id,
+        "sizes": [],
+        "images": [],
+        "product_items": [],
+    }
+
+
+def build_products(rows):
+    by_kind = {"product": [], "size": [], "image": [], "item": [], "color": []}
+    for row in rows:
+        by_kind[row.kind].append(row)
+
+    products = {}
+    for row in by_kind["product"]:
+        products[row.id] = new_product(row.id, row.label, row.amount, row.ref_a, row.ref_b)
+    attach_children(products, by_kind)
+    return list(products.values())
+
+
+def attach_children(products, by_kind):
+    for row in by_kind["size"]:
+        products[row.product_id]["sizes"].append({"id": row.id, "sizes": row.label})
+    for row in by_kind["image"]:
+        products[row.product_id]["images"].append({"id": row.id, "image_url": row.label})
+
+    items = {}
+    for row in by_kind["item"]:
+        item = {"id": row.id, "quantity": int(row.amount), "colors": []}
+        items[row.id] = item
+        products[row.product_id]["product_items"].append(item)
+    for row in by_kind["color"]:
+        items[row.ref_a]["colors"].append({"id": row.id, "available_colors": row.label})
+
+
+async def load_category(db: AsyncSession, category_id: int):
+    taxonomy = await db.execute(taxonomy_query(category_id))
+    category, brands, models = build_taxonomy(taxonomy.all())
+    if category is None:
+        return {"category": None, "brands": [], "models": [], "products": []}
+
+    rows = await db.execute(products_query(category_id))
+    return {"category": category, "brands": brands, "models": models, "products": build_products(rows.all())}
+
+
+async def load_product_detail(db: AsyncSession, product_id: int):
+    # Detail page document straight from the catalog tables, or None when the
+    # product does not exist. Only the first item and its colors are shown.
+    rows = (await db.execute(detail_query(product_id))).all()
+    product = next((row for row in rows if row.kind == "product"), None)
+    if product is None:
+        return None
+    item = next((row for row in rows if row.kind == "item"), None)
+    return {
+        "Product": {"id": product.id, "name": product.label, "price": product.amount, "brand_id": product.ref_a, "model_id": product.ref_b},
+        "Size": [{"id": row.id, "sizes": row.label, "products_id": product_id} for row in rows if row.kind == "size"],
+        "Image": [{"id": row.id, "image_url": row.label, "product_id": product_id} for row in rows if row.kind == "image"],
+        "Product_item": {"id": item.id, "product_id": product_id, "quantity": int(item.amount)} if item is not None else None,
+        "Color": [
+            {"id": row.id, "available_colors": row.label, "product_item_id": row.ref_a}
+            for row in rows if row.kind == "color" and item is not None and row.ref_a == item.id
+        ],
+    }
+
+
+async def load_product_page(db: AsyncSession, category_id: int, limit: int, cursor: int | None = None, **filters):
+    # Keyset pagination on Products.id: one extra row tells whether there is a next page
+    rows = await db.execute(products_query(category_id, limit=limit + 1, after_id=cursor, **filters))
+    products = build_products(rows.all())
+    if len(products) > limit:
+        products = products[:limit]
+        return {"products": products, "next_cursor": products[-1]["id"]}
+    return {"products": products, "next_cursor": None}
+
+
+async def stream_products(db: AsyncSession, category_id: int, batch_size: int, cursor: int | None = None, brand_id: int | None = None, model_id: int | None = None):
+    # Products come off a server-side cursor and their children are loaded one
+    # batch at a time, so memory stays bounded by batch_size however big the
+    # category is
+    result = await db.stream(category_products(category_id, brand_id=brand_id, model_id=model_id, after_id=cursor))
+    async for batch in result.partitions(batch_size):
+        products = {row.id: new_product(row.id, row.name, row.price, row.brand_id, row.model_id) for row in batch}
+        by_kind = {"size": [], "image": [], "item": [], "color": []}
+        for row in (await db.execute(children_query(list(products)))).all():
+            by_kind[row.kind].append(row)
+        attach_children(products, by_kind)
+        for product in products.values():
+            yield product
@@ -0,0 +1,135 @@
+import asyncio
+from collections import Counter
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from database import db_models
+from database.database import SessionLocal
+
+
+# Facet counts for category browsing.
+#
+# facet_count holds, per category, how many products carry each brand,
+# model, size, color and price bucket. The product write paths add each new
+# product's facet values with an upsert (count = count + n) in the same
+# transaction, so a browse request reads its counts with a single primary-key
+# range scan instead of aggregating the catalog.
+#
+#   python -m services.facets     recomputes every count from the catalog
+
+FACETS = ("brand", "model", "size", "color", "price")
+
+
+def price_bucket(price: float):
+    width = settings.FACET_PRICE_BUCKET
+    return str(int(price // width * width))
+
+
+def product_facets(brand_id: int, model_id: int, price: float, sizes, colors):
+    # A product counts once per distinct value
+    values = {("brand", str(brand_id)), ("model", str(model_id)), ("price", price_bucket(price))}
+    values.update(("size", size) for size in sizes)
+    values.update(("color", color) for color in colors)
+    return values
+
+
+def _upsert(dialect_name: str):
+    # Dialect modules imported on first use: sqlalchemy.dialects.postgresql
+    # alone adds tens of milliseconds to every worker's import of main
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(db_models.FacetCount)
+    return statement.on_conflict_do_update(
+        index_elements=["category_id", "facet", "value"],
+        set_={"count": db_models.FacetCount.count + statement.excluded.count},
+    )
+
+
+async def add_products(db: AsyncSession, products, sign: int = 1):
+    # products: (category_id, facet values) pairs; sign=-1 takes them back out
+    counts = Counter()
+    for category_id, values in products:
+        for facet, value in values:
+            counts[(category_id, facet, value)] += sign
+    if not counts:
+        return
+    await db.execute(
+        _upsert(db.bind.dialect.name),
+        [{"category_id": category_id, "facet": facet, "value": value, "count": count} for (category_id, facet, value), count in counts.items()],
+    )
+    if sign < 0:
+        # Only the categories just counted down, so the unique index is used
+        categories = {category_id for category_id, _, _ in counts}
+        await db.execute(delete(db_models.FacetCount).where(db_models.FacetCount.category_id.in_(categories), db_models.FacetCount.count <= 0))
+
+
+async def load_facets(db: AsyncSession, category_id: int):
+    rows = await db.execute(
+        select(db_models.FacetCount.facet, db_models.FacetCount.value, db_models.FacetCount.count)
+        .where(db_models.FacetCount.category_id == category_id, db_models.FacetCount.count > 0)
+    )
+    facets = {facet: [] for facet in FACETS}
+    width = settings.FACET_PRICE_BUCKET
+    for row in rows:
+        if row.facet in ("brand", "model"):
+            facets[row.facet].append({"id": int(row.value), "count": row.count})
+        elif row.facet == "price":
+            facets["price"].append({"min": int(row.value), "max": int(row.value) + width, "count": row.count})
+        else:
+            facets[row.facet].append({"value": row.value, "count": row.count})
+    for facet in ("brand", "model"):
+        facets[facet].sort(key=lambda option: option["id"])
+    facets["price"].sort(key=lambda option: option["min"])
+    for facet in ("size", "color"):
+        facets[facet].sort(key=lambda option: option["value"])
+    return facets
+
+
+async def stored_facets(db: AsyncSession, product_ids=None):
+    # (category_id, facet values) of products already in the database, all of
+    # them when product_ids is None
+    products = select(db_models.Products.id, db_models.Products.brand_id, db_models.Products.model_id, db_models.Products.price, db_models.Brands.product_category_id).join(
+        db_models.Brands, db_models.Brands.id == db_models.Products.brand_id
+    )
+    sizes = select(db_models.Sizes.products_id, db_models.Sizes.sizes)
+    colors = select(db_models.ProductItem.product_id, db_models.Colors.available_colors).join(
+        db_models.ProductItem, db_models.ProductItem.id == db_models.Colors.product_item_id
+    )
+    if product_ids is not None:
+        products = products.where(db_models.Products.id.in_(product_ids))
+        sizes = sizes.where(db_models.Sizes.products_id.in_(product_ids))
+        colors = colors.where(db_models.ProductItem.product_id.in_(product_ids))
+
+    products = (await db.execute(products)).all()
+    sizes_by_product, colors_by_product = {}, {}
+    for product_id, size in await db.execute(sizes):
+        sizes_by_product.setdefault(product_id, []).append(size)
+    for product_id, color in await db.execute(colors):
+        colors_by_product.setdefault(product_id, []).append(color)
+    return [
+        (row.product_category_id, product_facets(row.brand_id, row.model_id, row.price, sizes_by_product.get(row.id, []), colors_by_product.get(row.id, [])))
+        for row in products
+    ]
+
+
+async def rebuild(db: AsyncSession):
+    # Full recount, for backfilling an existing database
+    products = await stored_facets(db)
+    await db.execute(delete(db_models.FacetCount))
+    await add_products(db, products)
+    await db.commit()
+    return len(products)
+
+
+async def main():
+    async with SessionLocal() as db:
+        print(f"Recounted facets for {await rebuild(db)} products")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import hashlib
+
+from fastapi import Request, Response, status
+
+from config import settings
+from services.responses import CatalogJSONResponse
+
+
+# HTTP validators for catalog reads.
+#
+# An ETag is a hash of the encoded document it goes out with, so it changes
+# whenever the body does, whoever made the change (an order taking stock, a
+# dashboard write on another worker, a reload after the cache TTL). Cached
+# documents are stored as (body, etag) pairs built once per load, so a
+# revalidation that hits the in-process cache still costs no database work
+# and no hashing. Product and browse pages are not cached: they carry stock,
+# which orders change without touching the cache generation, so their 304s
+# load and hash the page first and only the transfer is saved. Equal bodies
+# get equal tags on every worker.
+#
+# If-None-Match uses the weak comparison (RFC 9110 13.1.2): proxies and gzip
+# often turn "x" into W/"x", and that must still revalidate.
+
+
+def body_etag(body: bytes):
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def tagged(body: bytes):
+    return body, body_etag(body)
+
+
+def cache_headers(etag: str):
+    return {"ETag": etag, "Cache-Control": settings.CATALOG_CACHE_CONTROL}
+
+
+def opaque_tag(tag: str):
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Request, etag: str):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    tags = {opaque_tag(tag.strip()) for tag in if_none_match.split(",")}
+    if opaque_tag(etag) in tags or "*" in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+    return None
+
+
+def catalog_response(request: Request, document):
+    # document: a (body, etag) pair from tagged()
+    body, etag = document
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    return CatalogJSONResponse(body, headers=cache_headers(etag))
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import db_models
+from database.database import SessionLocal
+from services.summary import sync_stock
+
+
+# Stock reservation.
+#
+# Stock only ever moves through single conditional UPDATEs
+# (quantity = quantity - n WHERE quantity >= n), so concurrent buyers cannot
+# oversell and no transaction reads the quantity and writes it back later.
+# Carts can hold stock ahead of checkout with a StockReservation row; holds
+# that are not checked out before expires_at are put back by
+# release_expired().
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_item_ids):
+        super().__init__(f"Insufficient stock for product items {sorted(product_item_ids)}")
+        self.product_item_ids = sorted(product_item_ids)
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def take_stock(db: AsyncSession, product_item_id: int, qty: int):
+    # A negative qty would pass the quantity >= qty guard and add stock
+    if qty <= 0:
+        raise ValueError(f"qty must be positive, got {qty}")
+    result = await db.execute(
+        update(db_models.ProductItem)
+        .where(db_models.ProductItem.id == product_item_id, db_models.ProductItem.quantity >= qty)
+        .values(quantity=db_models.ProductItem.quantity - qty)
+    )
+    if result.rowcount != 1:
+        return False
+    await sync_stock(db, [product_item_id])
+    return True
+
+
+async def return_stock(db: AsyncSession, product_item_id: int, qty: int):
+    await db.execute(
+        update(db_models.ProductItem)
+        .where(db_models.ProductItem.id == product_item_id)
+        .values(quantity=db_models.ProductItem.quantity + qty)
+    )
+    await sync_stock(db, [product_item_id])
+
+
+async def apply_stock_changes(db: AsyncSession, needed: dict):
+    # Sorted so concurrent multi-line carts always lock items in the same order
+    short = []
+    for product_item_id in sorted(needed):
+        qty = needed[product_item_id]
+        if qty > 0 and not await take_stock(db, product_item_id, qty):
+            short.append(product_item_id)
+        elif qty < 0:
+            await return_stock(db, product_item_id, -qty)
+    if short:
+        raise InsufficientStock(short)
+
+
+async def claim_reservations(db: AsyncSession, user_id: int, reservation_ids):
+    # Deleting the live holds turns them into part of the order; the stock was
+    # already taken when they were made
+    if not reservation_ids:
+        return {}
+    result = await db.execute(
+        delete(db_models.StockReservation)
+        .where(
+            db_models.StockReservation.id.in_(reservation_ids),
+            db_models.StockReservation.user_id == user_id,
+            db_models.StockReservation.expires_at > utcnow(),
+        )
+        .returning(db_models.StockReservation.id, db_models.StockReservation.product_item_id, db_models.StockReservation.qty)
+    )
+    return {row.id: row for row in result.all()}
+
+
+async def reserve_lines(db: AsyncSession, user_id: int, lines):
+    # Takes stock for every cart line inside the caller's transaction, using a
+    # line's reservation where it has one. Raises InsufficientStock.
+    held = await claim_reservations(db, user_id, {line.reservation_id for line in lines if line.reservation_id})
+    needed = defaultdict(int)
+    for line in lines:
+        needed[line.product_item_id] += line.qty
+        reservation = held.pop(line.reservation_id, None)
+        if reservation is not None and reservation.product_item_id == line.product_item_id:
+            needed[line.product_item_id] -= reservation.qty
+    # Claimed holds that did not match their line go back on sale
+    for reservation in held.values():
+        needed[reservation.product_item_id] -= reservation.qty
+    await apply_stock_changes(db, needed)
+
+
+async def hold(db: AsyncSession, user_id: int, product_item_id: int, qty: int, ttl: timedelta):
+    if not await take_stock(db, product_item_id, qty):
+        await db.rollback()
+        raise InsufficientStock([product_item_id])
+    reservation = await db.execute(
+        insert(db_models.StockReservation)
+        .values(product_item_id=product_item_id, user_id=user_id, qty=qty, expires_at=utcnow() + ttl)
+        .returning(db_models.StockReservation.id, db_models.StockReservation.expires_at)
+    )
+    reservation = reservation.first()
+    await db.commit()
+    return {"id": reservation.id, "product_item_id": product_item_id, "qty": qty, "expires_at": reservation.expires_at}
+
+
+async def release(db: AsyncSession, user_id: int, reservation_id: int):
+    result = await db.execute(
+        delete(db_models.StockReservation)
+        .where(db_models.StockReservation.id == reservation_id, db_models.StockReservation.user_id == user_id)
+        .returning(db_models.StockReservation.product_item_id, db_models.StockReservation.qty)
+    )
+    reservation = result.first()
+    if reservation is None:
+        return False
+    await return_stock(db, reservation.product_item_id, reservation.qty)
+    await db.commit()
+    return True
+
+
+async def release_expired(db: AsyncSession, now: datetime | None = None):
+    # The DELETE comes first and only the rows it returns go back to stock, so
+    # a hold is put back at most once: a second sweeper (every worker runs
+    # one) or a checkout claiming the hold at the same moment gets no row
+    # for it instead of returning it again.
+    result = await db.execute(
+        delete(db_models.StockReservation)
+        .where(db_models.StockReservation.expires_at <= (now or utcnow()))
+        .returning(db_models.StockReservation.product_item_id, db_models.StockReservation.qty)
+    )
+    returned = defaultdict(int)
+    released = 0
+    for row in result:
+        returned[row.product_item_id] += row.qty
+        released += 1
+    if returned:
+        # One executemany UPDATE, sorted so concurrent writers lock items in the same order
+        conn = await db.connection()
+        await conn.execute(
+            update(db_models.ProductItem)
+            .where(db_models.ProductItem.id == bindparam("item_id"))
+            .values(quantity=db_models.ProductItem.quantity + bindparam("qty")),
+            [{"item_id": item_id, "qty": returned[item_id]} for item_id in sorted(returned)],
+        )
+        await sync_stock(db, sorted(returned))
+    await db.commit()
+    return released
+
+
+async def release_expired_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                released = await release_expired(db)
+            if released:
+                logger.info("Released %d expired stock reservations", released)
+        except Exception:
+            logger.exception("Releasing expired stock reservations failed")
@@ -0,0 +1,54 @@
+import logging
+
+import orjson
+
+from config import settings
+
+
+# Structured logging: one JSON object per line with the time, level, logger
+# and message, plus whatever was passed in extra={...}. LOG_LEVEL sets how
+# much comes out (request payloads are logged at DEBUG) and LOG_ENABLED=false
+# turns the application's logging off entirely.
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=_jsonable).decode()
+
+
+def _jsonable(value):
+    # Request models are passed to the logger as they are and only dumped
+    # when the record is actually written
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def configure_logging():
+    # Handlers go on the loggers of this application's packages so uvicorn's
+    # own logging is left alone
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+    for name in ("routers", "services", "main"):
+        logger = logging.getLogger(name)
+        logger.propagate = False
+        if settings.LOG_ENABLED:
+            logger.handlers = [handler]
+            logger.setLevel(settings.LOG_LEVEL.upper())
+        else:
+            # Logger.disabled does not carry over to child loggers such as
+            # routers.add_product; an effective level above CRITICAL does
+            logger.handlers = [logging.NullHandler()]
+            logger.setLevel(logging.CRITICAL + 1)
@@ -0,0 +1,214 @@
+import contextvars
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from config import settings
+
+
+# Per-route performance metrics.
+#
+# MetricsMiddleware opens a RequestTimings for every HTTP request and keeps it
+# in a context variable. The SQLAlchemy cursor hooks, the password hasher and
+# the JSON responses add their share to whichever request is current, so one
+# request's numbers break down into:
+#   db         queries run and time spent in them
+#   bcrypt     time waiting on password hashing / verification
+#   serialize  time encoding response bodies
+# and go out as a Server-Timing header on the response. After the response
+# has been sent they are folded into per-route totals and histograms that
+# GET /metrics renders in the Prometheus text format.
+#
+# Numbers are per process: with several workers each one reports its own.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestTimings:
+    __slots__ = ("db_queries", "db_seconds", "bcrypt_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+    def server_timing(self, total_seconds: float):
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_queries} queries", '
+            f"bcrypt;dur={self.bcrypt_seconds * 1000:.2f}, "
+            f"serialize;dur={self.serialize_seconds * 1000:.2f}, "
+            f"total;dur={total_seconds * 1000:.2f}"
+        )
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timer(field: str):
+    # Adds the block's wall time to field ("bcrypt_seconds", ...) of the current request
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, field, getattr(timings, field) + time.perf_counter() - start)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries", "db_seconds", "bcrypt_seconds", "serialize_seconds", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes = {}
+        # Callables returning more exposition lines, for metrics kept elsewhere
+        self.collectors = []
+
+    def record(self, method: str, route: str, status_code: int, seconds: float, timings: RequestTimings):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.latency.observe(seconds)
+        metrics.queries.observe(timings.db_queries)
+        metrics.db_seconds += timings.db_seconds
+        metrics.bcrypt_seconds += timings.bcrypt_seconds
+        metrics.serialize_seconds += timings.serialize_seconds
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+
+    def render(self):
+        lines = []
+
+        def histogram(name, help, get):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), metrics in sorted(self.routes.items()):
+                h = get(metrics)
+                labels = f'method="{method}",route="{route}"'
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        def counter(name, help, get):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} counter")
+            for (method, route), metrics in sorted(self.routes.items()):
+                lines.append(f'{name}{{method="{method}",route="{route}"}} {get(metrics)}')
+
+        histogram("http_request_duration_seconds", "Time from request received to response sent.", lambda m: m.latency)
+        histogram("http_request_db_queries", "Database queries run per request.", lambda m: m.queries)
+        counter("http_request_db_seconds_total", "Time spent in database queries.", lambda m: m.db_seconds)
+        counter("http_request_bcrypt_seconds_total", "Time spent hashing and verifying passwords.", lambda m: m.bcrypt_seconds)
+        counter("http_request_serialize_seconds_total", "Time spent encoding response bodies.", lambda m: m.serialize_seconds)
+
+        lines.append("# HELP http_responses_total Responses sent, by status code.")
+        lines.append("# TYPE http_responses_total counter")
+        for (method, route), metrics in sorted(self.routes.items()):
+            for status_code, count in sorted(metrics.statuses.items()):
+                lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def route_label(scope):
+    # The route template ("/collection/{categoryID}"), not the raw path, so
+    # ids do not each get their own series
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task per request and
+    # streamed bodies pass straight through
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_HEADER:
+                    header = timings.server_timing(time.perf_counter() - start).encode()
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            registry.record(scope["method"], route_label(scope), status_code, time.perf_counter() - start, timings)
+
+
+def instrument_engine(engine):
+    # Query count and time for the current request, from the cursor events of
+    # an AsyncEngine's underlying sync engine
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        timings = _current.get()
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db_seconds += time.perf_counter() - start
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
@@ -0,0 +1,100 @@
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import db_models
+from services import sales
+from services.inventory import InsufficientStock,reserve_lines,utcnow
+import schemas
+
+
+# Checkout writes the billing address and every cart line in one transaction:
+# one INSERT for the address and one multi-row INSERT for the lines, both with
+# RETURNING, so there is a single commit and no per-row refresh. Stock for
+# the lines is taken in the same transaction (see services/inventory.py), and
+# so are the sales rollups (services/sales.py).
+
+def billing_row(billing: schemas.BillingAddress, user_id: int):
+    return {
+        "country": billing.country,
+        "first_name": billing.first_name,
+        "last_name": billing.last_name,
+        "address": billing.address,
+        "city": billing.city,
+        "state": billing.state,
+        "pincode": billing.pincode,
+        "mobile_no": billing.phone_no,
+        "user_id": user_id,
+    }
+
+
+def order_rows(lines, user_id: int, billing_address_id: int, created_at):
+    return [
+        {
+            "img_link": str(line.img_link),
+            "qty": line.qty,
+            "name": line.name,
+            "color": line.color,
+            "size": line.size,
+            "price": line.price,
+            "user_id": user_id,
+            "billing_address_id": billing_address_id,
+            "product_item_id": line.product_item_id,
+            "created_at": created_at,
+        }
+        for line in lines
+    ]
+
+
+async def place_order(db: AsyncSession, checkout: schemas.Checkout, user_id: int):
+    # Stock first: if any line cannot be filled nothing else is written
+    try:
+        await reserve_lines(db, user_id, checkout.lines)
+    except InsufficientStock:
+        await db.rollback()
+        raise
+    created_at = utcnow()
+    billing_address_id = await db.scalar(
+        insert(db_models.BillingAddress).returning(db_models.BillingAddress.id),
+        [billing_row(checkout.billing, user_id)],
+    )
+    order_ids = await db.scalars(
+        insert(db_models.OrderTable).returning(db_models.OrderTable.id, sort_by_parameter_order=True),
+        order_rows(checkout.lines, user_id, billing_address_id, created_at),
+    )
+    order_ids = order_ids.all()
+    await sales.record(db, [sales.sale_line(line.product_item_id, line.qty, line.price, created_at) for line in checkout.lines])
+    await db.commit()
+    return {"billing_address_id": billing_address_id, "order_ids": order_ids}
+
+
+async def owns_billing_address(db: AsyncSession, user_id: int, billing_address_id: int):
+    return await db.scalar(
+        select(db_models.BillingAddress.id).where(db_models.BillingAddress.id == billing_address_id, db_models.BillingAddress.user_id == user_id)
+    ) is not None
+
+
+ORDER_COLUMNS = (
+    db_models.OrderTable.id,
+    db_models.OrderTable.img_link,
+    db_models.OrderTable.qty,
+    db_models.OrderTable.name,
+    db_models.OrderTable.color,
+    db_models.OrderTable.size,
+    db_models.OrderTable.price,
+    db_models.OrderTable.product_item_id,
+    db_models.OrderTable.billing_address_id,
+    db_models.OrderTable.created_at,
+)
+
+
+async def order_history(db: AsyncSession, user_id: int, limit: int, cursor: int | None = None):
+    # Newest first, keyset pagination on (user_id, id): a page is one range
+    # scan of ix_order_table_user_id_id however many orders the user has.
+    # One extra row tells whether there is a next page.
+    query = select(*ORDER_COLUMNS).where(db_models.OrderTable.user_id == user_id)
+    if cursor is not None:
+        query = query.where(db_models.OrderTable.id < cursor)
+    rows = (await db.execute(query.order_by(db_models.OrderTable.id.desc()).limit(limit + 1))).all()
+    orders = [dict(row._mapping) for row in rows[:limit]]
+    return {"orders": orders, "next_cursor": orders[-1]["id"] if len(rows) > limit else None}
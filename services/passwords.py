@@ -0,0 +1,79 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from config import settings
+from services import metrics
+
+
+# bcrypt is deliberately slow (tens of ms per call), so hashing and verifying
+# run on a worker pool instead of the event loop. At most
+# PASSWORD_HASH_MAX_PENDING calls may be queued or running; past that the
+# request is rejected straight away with 429 rather than piling up behind a
+# login burst. PASSWORD_HASH_WORKERS=0 sizes the pool from the CPU count.
+
+pwd_context = CryptContext(schemes=["bcrypt"],deprecated="auto")
+
+
+def _hash(password: str):
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int, use_processes: bool = False):
+        # Leave a core for the event loop unless told otherwise
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            pool = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts in progress, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            with metrics.timer("bcrypt_seconds"):
+                return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str):
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str):
+        # Returns (valid, new_hash); new_hash is set when the stored hash uses
+        # deprecated settings and should be replaced
+        return await self._run(_verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES,
+)
@@ -0,0 +1,60 @@
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.future import select
+
+from config import settings
+from database import db_models
+from database.database import SessionLocal
+from services.cache import CatalogCache
+from services.tokens import INVALID_TOKEN, get_token_claims
+
+
+# The authenticated caller.
+#
+# get_principal turns verified JWT claims into a Principal, the few user
+# columns routes need. Principals are cached by user_id (bounded, with a TTL),
+# so an authenticated request only touches the user table on a miss; routes
+# that change a user's profile or password call forget() after the commit.
+# Routes take the caller's id from here, never from the request body.
+
+
+class Principal:
+    __slots__ = ("id", "email", "first_name", "last_name")
+
+    def __init__(self, id: int, email: str, first_name: str, last_name: str):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+
+
+# Same LRU + TTL + generation cache as the catalog: a load that started
+# before forget() is not stored, so a stale principal cannot come back
+user_cache = CatalogCache(max_entries=settings.USER_CACHE_MAX_ENTRIES, ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
+
+
+def user_key(user_id: int):
+    return ("user", user_id)
+
+
+async def load_principal(user_id: int):
+    # Own session on the primary, opened only on a cache miss; a replica
+    # could hand back the row as it was before a profile change
+    async with SessionLocal() as db:
+        row = (await db.execute(
+            select(db_models.User.id, db_models.User.email, db_models.User.first_name, db_models.User.last_name)
+            .where(db_models.User.id == user_id)
+        )).first()
+    # A deleted user is cached as None too
+    return Principal(row.id, row.email, row.first_name, row.last_name) if row is not None else None
+
+
+def forget(user_id: int):
+    user_cache.invalidate(user_key(user_id))
+
+
+async def get_principal(claims: dict = Depends(get_token_claims)):
+    # Dependency for routes that act as the signed-in user
+    principal = await user_cache.get_or_load(user_key(claims["user_id"]), lambda: load_principal(claims["user_id"]))
+    if principal is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=INVALID_TOKEN)
+    return principal
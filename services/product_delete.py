@@ -0,0 +1,94 @@
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import db_models
+from services import facets, search
+
+# Ids per IN (...) list, well under SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+# Product deletion.
+#
+# A product and everything hanging off it (sizes, images, items, their
+# colors and stock reservations, its summary, search row and facet counts) go in a
+# handful of set-based DELETEs per chunk of ids, all in one transaction. The
+# child foreign keys are declared ON DELETE CASCADE, but the child tables are
+# still cleared explicitly first so databases created before the cascades
+# were added behave the same.
+
+
+async def delete_products(db: AsyncSession, product_ids, category_id: int | None = None, prune: bool = False):
+    # Only products in category_id are deleted when it is given. With prune,
+    # models, brands and categories left without products are deleted too.
+    report = {"deleted": [], "categories": set(), "brands": set(), "models": set()}
+    product_ids = sorted(set(product_ids))
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        await delete_chunk(db, product_ids[start:start + CHUNK_SIZE], category_id, report)
+    if prune and report["deleted"]:
+        await prune_taxonomy(db, report)
+    await db.commit()
+    return report
+
+
+async def delete_chunk(db: AsyncSession, product_ids, category_id, report):
+    targets = (
+        select(db_models.Products.id, db_models.Products.brand_id, db_models.Products.model_id, db_models.Brands.product_category_id)
+        .join(db_models.Brands, db_models.Brands.id == db_models.Products.brand_id)
+        .where(db_models.Products.id.in_(product_ids))
+    )
+    if category_id is not None:
+        targets = targets.where(db_models.Brands.product_category_id == category_id)
+    targets = (await db.execute(targets)).all()
+    if not targets:
+        return
+    ids = [row.id for row in targets]
+
+    await facets.add_products(db, await facets.stored_facets(db, ids), sign=-1)
+    await search.unindex_products(db, ids)
+
+    item_ids = select(db_models.ProductItem.id).where(db_models.ProductItem.product_id.in_(ids)).scalar_subquery()
+    await db.execute(delete(db_models.Colors).where(db_models.Colors.product_item_id.in_(item_ids)))
+    await db.execute(delete(db_models.StockReservation).where(db_models.StockReservation.product_item_id.in_(item_ids)))
+    await db.execute(delete(db_models.ProductItem).where(db_models.ProductItem.product_id.in_(ids)))
+    await db.execute(delete(db_models.Sizes).where(db_models.Sizes.products_id.in_(ids)))
+    await db.execute(delete(db_models.Images).where(db_models.Images.product_id.in_(ids)))
+    await db.execute(delete(db_models.ProductSummary).where(db_models.ProductSummary.product_id.in_(ids)))
+    await db.execute(delete(db_models.Products).where(db_models.Products.id.in_(ids)))
+
+    report["deleted"].extend(ids)
+    report["categories"].update(row.product_category_id for row in targets)
+    report["brands"].update(row.brand_id for row in targets)
+    report["models"].update(row.model_id for row in targets)
+
+
+async def prune_taxonomy(db: AsyncSession, report):
+    # Each level only looks at the parents of what was just deleted, and is
+    # one DELETE ... WHERE NOT EXISTS rather than a count per row
+    models = await db.scalars(
+        delete(db_models.Models)
+        .where(
+            db_models.Models.id.in_(report["models"]),
+            ~select(db_models.Products.id).where(db_models.Products.model_id == db_models.Models.id).exists(),
+        )
+        .returning(db_models.Models.brand_id)
+    )
+    report["brands"].update(models.all())
+    await db.execute(
+        delete(db_models.Brands).where(
+            db_models.Brands.id.in_(report["brands"]),
+            ~select(db_models.Products.id).where(db_models.Products.brand_id == db_models.Brands.id).exists(),
+            ~select(db_models.Models.id).where(db_models.Models.brand_id == db_models.Brands.id).exists(),
+        )
+    )
+    empty_categories = (
+        select(db_models.ProductCategory.id)
+        .where(
+            db_models.ProductCategory.id.in_(report["categories"]),
+            ~select(db_models.Brands.id).where(db_models.Brands.product_category_id == db_models.ProductCategory.id).exists(),
+        )
+        .scalar_subquery()
+    )
+    await db.execute(delete(db_models.FacetCount).where(db_models.FacetCount.category_id.in_(empty_categories)))
+    await db.execute(delete(db_models.ProductCategory).where(db_models.ProductCategory.id.in_(empty_categories)))
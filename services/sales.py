@@ -0,0 +1,174 @@
+import asyncio
+from datetime import date
+from functools import cache
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+
+
+# Sales reports.
+#
+# sales_by_product, sales_by_day and sales_by_category hold units, revenue
+# (qty * unit price) and order line counts. The order write paths add each
+# order's lines with an upsert (units = units + n, ...) in the same
+# transaction as the order, so a report reads one small table whose size
+# depends on the catalog and the calendar, never on the number of orders.
+# Lines are attributed to a product and category through the product summary
+# of their product_item_id; lines without one only count towards the day, and
+# a summary without a category (brand and model filed under different
+# categories) leaves the category rollup out.
+#
+#   python -m services.sales     recomputes every rollup from order_table
+
+ROLLUPS = (
+    (db_models.SalesByProduct, "product_id"),
+    (db_models.SalesByDay, "day"),
+    (db_models.SalesByCategory, "category_id"),
+)
+
+
+def sale_line(product_item_id: int | None, qty: int, price: float, created_at):
+    return {"product_item_id": product_item_id, "qty": qty, "price": price, "created_at": created_at}
+
+
+@cache
+def _upsert(dialect_name: str, model, key: str):
+    # Dialect modules imported on first use, as in services/facets.py; built
+    # once per rollup, since /add_order runs these on every order
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: getattr(model, column) + statement.excluded[column] for column in ("units", "revenue", "lines")},
+    )
+
+
+def _add(totals, key, line, **extra):
+    row = totals.setdefault(key, {**extra, "units": 0, "revenue": 0.0, "lines": 0})
+    row["units"] += line["qty"]
+    row["revenue"] += line["qty"] * line["price"]
+    row["lines"] += 1
+
+
+async def record(db: AsyncSession, lines):
+    # lines: sale_line() dicts of orders written in this transaction. Called
+    # after the order's own writes: on SQLite a transaction that reads first
+    # and writes later fails outright if another writer committed in between.
+    item_ids = {line["product_item_id"] for line in lines if line["product_item_id"] is not None}
+    products = {}
+    if item_ids:
+        rows = await db.execute(
+            select(db_models.ProductSummary.product_item_id, db_models.ProductSummary.product_id, db_models.ProductSummary.category_id)
+            .where(db_models.ProductSummary.product_item_id.in_(item_ids))
+        )
+        products = {row.product_item_id: row for row in rows}
+
+    by_product, by_day, by_category = {}, {}, {}
+    for line in lines:
+        day = line["created_at"].date()
+        _add(by_day, day, line, day=day)
+        product = products.get(line["product_item_id"])
+        if product is not None:
+            _add(by_product, product.product_id, line, product_id=product.product_id, category_id=product.category_id)
+            if product.category_id is not None:
+                _add(by_category, product.category_id, line, category_id=product.category_id)
+
+    # On the session's connection: a Core execute skips the ORM bulk insert
+    # path, which costs about as much again per statement
+    conn = await db.connection()
+    for (model, key), totals in zip(ROLLUPS, (by_product, by_day, by_category)):
+        if totals:
+            # Sorted so concurrent orders lock rollup rows in the same order
+            await conn.execute(_upsert(conn.dialect.name, model, key), [totals[k] for k in sorted(totals)])
+
+
+async def product_report(db: AsyncSession, limit: int):
+    # Top sellers by revenue; the name comes from the product summary and is
+    # None once the product is deleted
+    rows = await db.execute(
+        select(
+            db_models.SalesByProduct.product_id,
+            db_models.ProductSummary.name,
+            db_models.SalesByProduct.category_id,
+            db_models.SalesByProduct.units,
+            db_models.SalesByProduct.revenue,
+            db_models.SalesByProduct.lines,
+        )
+        .outerjoin(db_models.ProductSummary, db_models.ProductSummary.product_id == db_models.SalesByProduct.product_id)
+        .order_by(db_models.SalesByProduct.revenue.desc(), db_models.SalesByProduct.product_id)
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in rows]
+
+
+async def day_report(db: AsyncSession, start: date | None = None, end: date | None = None):
+    query = select(db_models.SalesByDay.day, db_models.SalesByDay.units, db_models.SalesByDay.revenue, db_models.SalesByDay.lines)
+    if start is not None:
+        query = query.where(db_models.SalesByDay.day >= start)
+    if end is not None:
+        query = query.where(db_models.SalesByDay.day <= end)
+    rows = await db.execute(query.order_by(db_models.SalesByDay.day))
+    return [dict(row._mapping) for row in rows]
+
+
+async def category_report(db: AsyncSession):
+    rows = await db.execute(
+        select(
+            db_models.SalesByCategory.category_id,
+            db_models.ProductCategory.name,
+            db_models.SalesByCategory.units,
+            db_models.SalesByCategory.revenue,
+            db_models.SalesByCategory.lines,
+        )
+        .outerjoin(db_models.ProductCategory, db_models.ProductCategory.id == db_models.SalesByCategory.category_id)
+        .order_by(db_models.SalesByCategory.revenue.desc(), db_models.SalesByCategory.category_id)
+    )
+    return [dict(row._mapping) for row in rows]
+
+
+def _totals(qty, price):
+    return func.sum(qty), func.sum(qty * price), func.count()
+
+
+async def rebuild(db: AsyncSession):
+    # Full recount with one INSERT ... SELECT ... GROUP BY per rollup, for
+    # backfilling an existing database
+    orders = db_models.OrderTable
+    attributed = select(orders.qty, orders.price, db_models.ProductSummary.product_id, db_models.ProductSummary.category_id).join(
+        db_models.ProductSummary, db_models.ProductSummary.product_item_id == orders.product_item_id
+    ).subquery()
+    day = func.date(orders.created_at)
+
+    for model, _ in ROLLUPS:
+        await db.execute(delete(model))
+    await db.execute(insert(db_models.SalesByProduct).from_select(
+        ["product_id", "category_id", "units", "revenue", "lines"],
+        select(attributed.c.product_id, attributed.c.category_id, *_totals(attributed.c.qty, attributed.c.price)).group_by(attributed.c.product_id, attributed.c.category_id),
+    ))
+    await db.execute(insert(db_models.SalesByDay).from_select(
+        ["day", "units", "revenue", "lines"],
+        select(day, *_totals(orders.qty, orders.price)).where(orders.created_at.is_not(None)).group_by(day),
+    ))
+    await db.execute(insert(db_models.SalesByCategory).from_select(
+        ["category_id", "units", "revenue", "lines"],
+        select(attributed.c.category_id, *_totals(attributed.c.qty, attributed.c.price))
+        .where(attributed.c.category_id.is_not(None)).group_by(attributed.c.category_id),
+    ))
+    await db.commit()
+
+
+async def main():
+    async with SessionLocal() as db:
+        await rebuild(db)
+        print("Recomputed sales rollups")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+import asyncio
+import re
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import async_engine
+
+
+# Full-text product search on an SQLite FTS5 table.
+#
+# product_search has one row per product, keyed by rowid = products.id, with
+# the product, brand and model names plus space-joined colors and sizes. The
+# product write paths call index_products() in their own transaction. Other
+# databases have no FTS5, so there search is switched off and the write paths
+# skip the index.
+#
+#   python -m services.search     rebuilds the index from the catalog tables
+
+CREATE_TABLE = text(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_search "
+    "USING fts5(name, brand, model, colors, sizes, prefix = '2 3 4', tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+INDEX_PRODUCT = text(
+    "INSERT INTO product_search (rowid, name, brand, model, colors, sizes) "
+    "SELECT :id, :name, brand.brand_name, model.model_name, :colors, :sizes "
+    "FROM brand, model WHERE brand.id = :brand_id AND model.id = :model_id"
+)
+
+REBUILD = text(
+    "INSERT INTO product_search (rowid, name, brand, model, colors, sizes) "
+    "SELECT products.id, products.name, brand.brand_name, model.model_name, "
+    "(SELECT group_concat(color.available_colors, ' ') FROM color JOIN product_item ON product_item.id = color.product_item_id "
+    "WHERE product_item.product_id = products.id), "
+    "(SELECT group_concat(size.sizes, ' ') FROM size WHERE size.products_id = products.id) "
+    "FROM products JOIN brand ON brand.id = products.brand_id JOIN model ON model.id = products.model_id"
+)
+
+# Ranked inside FTS5 first so only the page being returned is joined to
+# products; the weights (name, then brand and model, then colors and sizes)
+# are set once as the table's rank function.
+SET_RANK = text("INSERT INTO product_search (product_search, rank) VALUES ('rank', 'bm25(10.0, 4.0, 4.0, 1.0, 1.0)')")
+
+SEARCH = text(
+    "SELECT products.id, products.name, products.price, products.brand_id, products.model_id, "
+    "hits.brand AS brand_name, hits.model AS model_name, hits.score "
+    "FROM (SELECT rowid, brand, model, rank AS score FROM product_search "
+    "WHERE product_search MATCH :query ORDER BY rank LIMIT :limit OFFSET :offset) AS hits "
+    "JOIN products ON products.id = hits.rowid ORDER BY hits.score"
+)
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def enabled(connection):
+    return connection.dialect.name == "sqlite"
+
+
+def search_row(id, name, brand_id, model_id, colors, sizes):
+    return {"id": id, "name": name, "brand_id": brand_id, "model_id": model_id, "colors": " ".join(colors), "sizes": " ".join(sizes)}
+
+
+def match_expression(query: str):
+    # Every word of the user's input must match, each as a prefix. Quoting
+    # the terms keeps FTS5 operators in user input from being interpreted.
+    terms = TOKEN.findall(query)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def ensure_search_table(connection):
+    # Sync, for run_sync on startup. A freshly created table is filled from
+    # the existing catalog.
+    if not enabled(connection):
+        return
+    exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'product_search'")).first()
+    connection.execute(CREATE_TABLE)
+    if exists is None:
+        connection.execute(SET_RANK)
+        connection.execute(REBUILD)
+
+
+async def index_products(db: AsyncSession, rows):
+    if rows and enabled(db.bind):
+        await db.execute(INDEX_PRODUCT, rows)
+
+
+async def unindex_products(db: AsyncSession, product_ids):
+    if product_ids and enabled(db.bind):
+        await db.execute(text("DELETE FROM product_search WHERE rowid = :id"), [{"id": product_id} for product_id in product_ids])
+
+
+async def indexed_ids(db: AsyncSession, product_ids):
+    # Which of the given products have a row in the index; none where search is off
+    if not product_ids or not enabled(db.bind):
+        return set()
+    rows = await db.execute(
+        text("SELECT rowid FROM product_search WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(product_ids)},
+    )
+    return set(rows.scalars())
+
+
+async def search_products(db: AsyncSession, query: str, limit: int, offset: int):
+    expression = match_expression(query)
+    if not expression or not enabled(db.bind):
+        return {"results": [], "next_offset": None}
+    rows = await db.execute(SEARCH, {"query": expression, "limit": limit + 1, "offset": offset})
+    results = [row._asdict() for row in rows]
+    if len(results) > limit:
+        return {"results": results[:limit], "next_offset": offset + limit}
+    return {"results": results, "next_offset": None}
+
+
+def rebuild(connection):
+    if not enabled(connection):
+        return
+    connection.execute(CREATE_TABLE)
+    connection.execute(SET_RANK)
+    connection.execute(text("DELETE FROM product_search"))
+    connection.execute(REBUILD)
+
+
+async def main():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(rebuild)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
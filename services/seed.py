@@ -0,0 +1,114 @@
+from sqlalchemy import insert, text
+
+from database import db_models
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database.database import SessionLocal, async_engine, database_url
+from database.migrations import migrate
+from services import facets, search, summary
+from services.principal import user_cache
+from services.search import ensure_search_table
+from services.taxonomy import taxonomy_index
+
+
+# Generated catalogs for the benchmarks and tests.
+#
+# reset_schema() drops and recreates every table of the database the
+# application is configured with, so callers point SQLALCHEMY_DATABASE_URL at
+# a throwaway database before anything imports config (benchmarks/common.py,
+# tests/conftest.py). On PostgreSQL that is a database of its own, made with
+# create_database() next to any database on a server the user may create
+# databases on, and dropped afterwards.
+
+
+async def reset_schema(migrated: bool = False):
+    # migrated: built by database/migrations.py, as on a deployed database,
+    # rather than with create_all from db_models
+    async with async_engine.begin() as conn:
+        await conn.execute(text("DROP TABLE IF EXISTS product_search"))
+        await conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        await conn.run_sync(db_models.Base.metadata.drop_all)
+        if not migrated:
+            await conn.run_sync(db_models.Base.metadata.create_all)
+            await conn.run_sync(ensure_search_table)
+    if migrated:
+        await migrate()
+    taxonomy_index.expire()
+    user_cache.clear()
+
+
+async def seed_catalog(db, products, brands=4, models_per_brand=3, sizes=3, images=2, colors=3, category_id=1):
+    # Ids are assigned here so the whole catalog goes in with executemany inserts
+    brand_rows, model_rows = [], []
+    product_rows, size_rows, image_rows, item_rows, color_rows = [], [], [], [], []
+    base = category_id * 10_000_000
+
+    await db.execute(insert(db_models.ProductCategory), [{"id": category_id, "name": f"category-{category_id}", "description": "bench"}])
+    for b in range(brands):
+        brand_id = base + b
+        brand_rows.append({"id": brand_id, "brand_name": f"brand-{brand_id}", "brand_description": "bench", "product_category_id": category_id})
+        for m in range(models_per_brand):
+            model_rows.append({"id": base + b * 100 + m, "model_name": f"model-{b}-{m}", "brand_id": brand_id})
+
+    for p in range(products):
+        product_id = base + p
+        model = model_rows[p % len(model_rows)]
+        product_rows.append({"id": product_id, "name": f"product-{product_id}", "price": 100.0 + p % 900, "brand_id": model["brand_id"], "model_id": model["id"]})
+        for s in range(sizes):
+            size_rows.append({"sizes": ["S", "M", "L", "XL", "XXL"][s % 5], "products_id": product_id})
+        for i in range(images):
+            image_rows.append({"image_url": f"https://img.example.com/{product_id}/{i}.jpg", "product_id": product_id})
+        item_rows.append({"id": product_id, "product_id": product_id, "quantity": 10})
+        for c in range(colors):
+            color_rows.append({"available_colors": ["red", "black", "white", "blue"][c % 4], "product_item_id": product_id})
+
+    for model, rows in (
+        (db_models.Brands, brand_rows),
+        (db_models.Models, model_rows),
+        (db_models.Products, product_rows),
+        (db_models.Sizes, size_rows),
+        (db_models.Images, image_rows),
+        (db_models.ProductItem, item_rows),
+        (db_models.Colors, color_rows),
+    ):
+        if rows:
+            await db.execute(insert(model), rows)
+    if db.bind.dialect.name == "postgresql":
+        # Explicit ids leave the serial sequences behind; move them past the seeded rows
+        for model in (db_models.ProductCategory, db_models.Brands, db_models.Models, db_models.Products, db_models.ProductItem):
+            table = model.__tablename__
+            await db.execute(text(f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), (SELECT max(id) FROM \"{table}\"))"))
+    await summary.refresh(db, [row["id"] for row in product_rows])
+    await db.commit()
+    return category_id
+
+
+async def seed_catalogs(categories, products, **shape):
+    # Several categories of the same shape (see seed_catalog), then the search
+    # index and facet counts the bulk inserts bypassed. Same arguments, same
+    # catalog: every id and value is derived from its position.
+    async with SessionLocal() as db:
+        for category_id in range(1, categories + 1):
+            await seed_catalog(db, products, category_id=category_id, **shape)
+        await facets.rebuild(db)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(search.rebuild)
+    return list(range(1, categories + 1))
+
+
+async def _admin(server_url: str, statement: str):
+    # CREATE/DROP DATABASE cannot run inside a transaction
+    engine = create_async_engine(database_url(server_url), isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(statement))
+    finally:
+        await engine.dispose()
+
+
+async def create_database(server_url: str, name: str):
+    await _admin(server_url, f'CREATE DATABASE "{name}"')
+
+
+async def drop_database(server_url: str, name: str):
+    await _admin(server_url, f'DROP DATABASE IF EXISTS "{name}"')
@@ -0,0 +1,83 @@
+import asyncio
+
+from config import settings
+
+
+# Request coalescing ("single flight").
+#
+# Concurrent calls of do() with the same key share one run of the loader: the
+# first caller runs it and every caller that arrives while it is in flight
+# awaits the same result (or exception) instead of repeating the work. Keys
+# are tuples like the cache keys, ("category", 3), so the first element names
+# the kind of load in the stats. Nothing is kept once the load finishes;
+# caching is CatalogCache's job.
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights = {}
+        self.loads = {}
+        self.coalesced = {}
+
+    async def do(self, key, loader):
+        if not self.enabled:
+            return await loader()
+        kind = key[0]
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            self.coalesced[kind] = self.coalesced.get(kind, 0) + 1
+            try:
+                # shield: a waiter that is cancelled must not cancel the shared load
+                return await asyncio.shield(flight)
+            except _LeaderCancelled:
+                # The request running the load went away; try again, likely as the new leader
+                continue
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self.loads[kind] = self.loads.get(kind, 0) + 1
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            flight.set_exception(_LeaderCancelled())
+            flight.exception()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Marks it retrieved, so a load nobody waited on does not log a warning
+            flight.exception()
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "loads": dict(self.loads),
+            "coalesced": dict(self.coalesced),
+        }
+
+    def prometheus(self):
+        lines = [
+            "# HELP singleflight_loads_total Loads run, by kind of key.",
+            "# TYPE singleflight_loads_total counter",
+            *(f'singleflight_loads_total{{kind="{kind}"}} {count}' for kind, count in sorted(self.loads.items())),
+            "# HELP singleflight_coalesced_total Requests that shared another request's in-flight load, by kind of key.",
+            "# TYPE singleflight_coalesced_total counter",
+            *(f'singleflight_coalesced_total{{kind="{kind}"}} {count}' for kind, count in sorted(self.coalesced.items())),
+        ]
+        return lines
+
+
+catalog_flights = SingleFlight(enabled=settings.SINGLE_FLIGHT_ENABLED)
@@ -0,0 +1,196 @@
+import asyncio
+
+from sqlalchemy import case, delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from database import db_models
+from database.database import SessionLocal
+from services import catalog
+
+# Products per refresh statement batch
+CHUNK_SIZE = 500
+
+
+# Product summary read model.
+#
+# product_summary keeps one row per product with its brand and model names,
+# price, first image, stock and its sizes, images and colors as JSON, so a
+# product card or detail page is one indexed row instead of a join over seven
+# tables. The write paths refresh the rows of the products they touch inside
+# their own transaction; stock changes only update the stock column.
+#
+#   python -m services.summary     rebuilds every row from the catalog tables
+
+
+def _products(product_ids):
+    # Same category rule as services.catalog: the product's brand and its
+    # model's brand must both be filed under the category
+    product_brand = aliased(db_models.Brands)
+    model_brand = aliased(db_models.Brands)
+    return (
+        select(
+            db_models.Products.id,
+            db_models.Products.name,
+            db_models.Products.price,
+            db_models.Products.brand_id,
+            db_models.Products.model_id,
+            product_brand.brand_name,
+            db_models.Models.model_name,
+            case(
+                (product_brand.product_category_id == model_brand.product_category_id, product_brand.product_category_id),
+            ).label("category_id"),
+        )
+        .join(product_brand, db_models.Products.brand_id == product_brand.id)
+        .join(db_models.Models, db_models.Products.model_id == db_models.Models.id)
+        .join(model_brand, db_models.Models.brand_id == model_brand.id)
+        .where(db_models.Products.id.in_(product_ids))
+    )
+
+
+async def summary_rows(db: AsyncSession, product_ids):
+    rows = {}
+    for product in await db.execute(_products(product_ids)):
+        rows[product.id] = {
+            "product_id": product.id,
+            "category_id": product.category_id,
+            "name": product.name,
+            "price": product.price,
+            "brand_id": product.brand_id,
+            "brand_name": product.brand_name,
+            "model_id": product.model_id,
+            "model_name": product.model_name,
+            "primary_image": None,
+            "product_item_id": None,
+            "stock": None,
+            "sizes": [],
+            "images": [],
+            "colors": [],
+        }
+    # Children come back ordered by id, so the first image and item are the
+    # oldest. Products are written with a single item; only its colors are kept.
+    colors = {}
+    for child in (await db.execute(catalog.children_query(list(rows)))).all():
+        row = rows[child.product_id]
+        if child.kind == "size":
+            row["sizes"].append({"id": child.id, "sizes": child.label})
+        elif child.kind == "image":
+            row["images"].append({"id": child.id, "image_url": child.label})
+            row["primary_image"] = row["primary_image"] or child.label
+        elif child.kind == "item" and row["product_item_id"] is None:
+            row["product_item_id"] = child.id
+            row["stock"] = int(child.amount)
+        elif child.kind == "color":
+            colors.setdefault(child.ref_a, []).append({"id": child.id, "available_colors": child.label})
+    for row in rows.values():
+        row["colors"] = colors.get(row["product_item_id"], [])
+    return list(rows.values())
+
+
+async def refresh(db: AsyncSession, product_ids):
+    # Rewrites the rows of product_ids in the caller's transaction; products
+    # that no longer exist just lose their row
+    product_ids = sorted(set(product_ids))
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        chunk = product_ids[start:start + CHUNK_SIZE]
+        await db.execute(delete(db_models.ProductSummary).where(db_models.ProductSummary.product_id.in_(chunk)))
+        rows = await summary_rows(db, chunk)
+        if rows:
+            await db.execute(insert(db_models.ProductSummary), rows)
+
+
+async def sync_stock(db: AsyncSession, product_item_ids):
+    # product_item_ids: a list, or a select of ids
+    await db.execute(
+        update(db_models.ProductSummary)
+        .where(db_models.ProductSummary.product_item_id.in_(product_item_ids))
+        .values(
+            stock=select(db_models.ProductItem.quantity)
+            .where(db_models.ProductItem.id == db_models.ProductSummary.product_item_id)
+            .scalar_subquery()
+        )
+    )
+
+
+SUMMARY_COLUMNS = (
+    db_models.ProductSummary.product_id,
+    db_models.ProductSummary.name,
+    db_models.ProductSummary.price,
+    db_models.ProductSummary.brand_id,
+    db_models.ProductSummary.model_id,
+    db_models.ProductSummary.product_item_id,
+    db_models.ProductSummary.stock,
+    db_models.ProductSummary.sizes,
+    db_models.ProductSummary.images,
+    db_models.ProductSummary.colors,
+)
+
+
+def product_card(row):
+    # Same shape services.catalog builds from the catalog tables
+    items = [{"id": row.product_item_id, "quantity": row.stock, "colors": row.colors}] if row.product_item_id is not None else []
+    return {
+        "id": row.product_id,
+        "name": row.name,
+        "price": row.price,
+        "brand_id": row.brand_id,
+        "model_id": row.model_id,
+        "sizes": row.sizes,
+        "images": row.images,
+        "product_items": items,
+    }
+
+
+def product_detail(row):
+    item = None
+    if row.product_item_id is not None:
+        item = {"id": row.product_item_id, "product_id": row.product_id, "quantity": row.stock}
+    return {
+        "Product": {"id": row.product_id, "name": row.name, "price": row.price, "brand_id": row.brand_id, "model_id": row.model_id},
+        "Size": [{**size, "products_id": row.product_id} for size in row.sizes],
+        "Image": [{**image, "product_id": row.product_id} for image in row.images],
+        "Product_item": item,
+        "Color": [{**color, "product_item_id": row.product_item_id} for color in row.colors],
+    }
+
+
+async def load_category(db: AsyncSession, category_id: int):
+    # Taxonomy as in services.catalog, then the category's products in one
+    # range scan of the summary index
+    taxonomy = await db.execute(catalog.taxonomy_query(category_id))
+    category, brands, models = catalog.build_taxonomy(taxonomy.all())
+    if category is None:
+        return {"category": None, "brands": [], "models": [], "products": []}
+    rows = await db.execute(
+        select(*SUMMARY_COLUMNS)
+        .where(db_models.ProductSummary.category_id == category_id)
+        .order_by(db_models.ProductSummary.product_id)
+    )
+    return {"category": category, "brands": brands, "models": models, "products": [product_card(row) for row in rows]}
+
+
+async def load_product(db: AsyncSession, product_id: int):
+    row = await db.execute(select(*SUMMARY_COLUMNS).where(db_models.ProductSummary.product_id == product_id))
+    row = row.first()
+    return product_detail(row) if row is not None else None
+
+
+async def rebuild(db: AsyncSession):
+    await db.execute(delete(db_models.ProductSummary))
+    product_ids = (await db.scalars(select(db_models.Products.id).order_by(db_models.Products.id))).all()
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        rows = await summary_rows(db, product_ids[start:start + CHUNK_SIZE])
+        if rows:
+            await db.execute(insert(db_models.ProductSummary), rows)
+    await db.commit()
+    return len(product_ids)
+
+
+async def main():
+    async with SessionLocal() as db:
+        print(f"Rebuilt summaries for {await rebuild(db)} products")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+import time
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from database import db_models
+from database.database import SessionLocal
+from services.http_cache import tagged
+from services.singleflight import catalog_flights
+
+
+# In-process category -> brand -> model index.
+#
+# The whole taxonomy is small, so each worker loads it once (three queries)
+# and answers the dashboard's per-level lookups from dicts: by id, by category
+# name, by brand name within a category and by model name within a brand. The
+# dashboard write paths add their new row with add_category/add_brand/add_model
+# after the commit, so this worker sees it at once; rows written by other
+# workers show up at the next full reload, TAXONOMY_REFRESH_SECONDS later.
+# Deletions (taxonomy pruning) call expire() and the next read reloads, from
+# the primary, since a replica may still have the deleted rows.
+#
+# Entries are the compact dicts the collection loaders use (CategoryOut,
+# BrandOut, ModelOut in schemas.py).
+
+
+class TaxonomyIndex:
+    def __init__(self, refresh_seconds: float, clock=time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.loads = 0
+        self.loaded_at = None
+        self._written = False
+        # Rows added while reloads are running, one list per load (several
+        # can overlap when single flight is off or the index is shared), each
+        # replayed on top of that load's snapshot
+        self._replays = {}
+        self._reset()
+
+    def _reset(self):
+        self.categories = {}
+        self.brands = {}
+        self.models = {}
+        self._category_by_name = {}
+        self._brand_by_name = {}
+        self._model_by_name = {}
+        self._brands_by_category = {}
+        self._models_by_brand = {}
+        self._documents = {}
+
+    def fresh(self):
+        return self.loaded_at is not None and self.clock() - self.loaded_at < self.refresh_seconds
+
+    def expire(self):
+        self.loaded_at = None
+        self._written = True
+
+    async def ensure(self, db: AsyncSession):
+        if not self.fresh():
+            await catalog_flights.do(("taxonomy",), lambda: self._reload(db))
+        return self
+
+    async def _reload(self, db: AsyncSession):
+        if not self._written:
+            return await self.load(db)
+        # Cleared first, so an expire() during this load stays set
+        self._written = False
+        try:
+            async with SessionLocal() as primary:
+                await self.load(primary)
+        except BaseException:
+            self._written = True
+            raise
+
+    async def load(self, db: AsyncSession):
+        replay = []
+        self._replays[id(replay)] = replay
+        try:
+            categories = (await db.execute(select(
+                db_models.ProductCategory.id, db_models.ProductCategory.name, db_models.ProductCategory.description,
+            ).order_by(db_models.ProductCategory.id))).all()
+            brands = (await db.execute(select(
+                db_models.Brands.id, db_models.Brands.brand_name, db_models.Brands.brand_description, db_models.Brands.product_category_id,
+            ).order_by(db_models.Brands.id))).all()
+            models = (await db.execute(select(
+                db_models.Models.id, db_models.Models.model_name, db_models.Models.brand_id,
+            ).order_by(db_models.Models.id))).all()
+        finally:
+            del self._replays[id(replay)]
+
+        self._reset()
+        for row in categories:
+            self._put_category({"id": row.id, "name": row.name, "description": row.description})
+        for row in brands:
+            self._put_brand({"id": row.id, "brand_name": row.brand_name, "brand_description": row.brand_description, "product_category_id": row.product_category_id})
+        for row in models:
+            self._put_model({"id": row.id, "model_name": row.model_name, "brand_id": row.brand_id})
+        for put, entry in replay:
+            put(entry)
+        self.loaded_at = self.clock()
+        self.loads += 1
+
+    def _put_category(self, category):
+        self.categories[category["id"]] = category
+        # Names are not unique; like the old name query, the lowest id wins
+        self._category_by_name.setdefault(category["name"], category)
+        self._brands_by_category.setdefault(category["id"], {})
+        self._documents = {}
+
+    def _put_brand(self, brand):
+        self.brands[brand["id"]] = brand
+        self._brands_by_category.setdefault(brand["product_category_id"], {})[brand["id"]] = brand
+        self._brand_by_name.setdefault((brand["product_category_id"], brand["brand_name"]), brand)
+        self._models_by_brand.setdefault(brand["id"], {})
+        self._documents = {}
+
+    def _put_model(self, model):
+        self.models[model["id"]] = model
+        self._models_by_brand.setdefault(model["brand_id"], {})[model["id"]] = model
+        self._model_by_name.setdefault((model["brand_id"], model["model_name"]), model)
+        self._documents = {}
+
+    def _add(self, put, entry):
+        for replay in self._replays.values():
+            replay.append((put, entry))
+        if self.loaded_at is not None:
+            put(entry)
+
+    # Incremental updates, called with the committed ORM row
+
+    def add_category(self, row: db_models.ProductCategory):
+        self._add(self._put_category, {"id": row.id, "name": row.name, "description": row.description})
+
+    def add_brand(self, row: db_models.Brands):
+        self._add(self._put_brand, {"id": row.id, "brand_name": row.brand_name, "brand_description": row.brand_description, "product_category_id": row.product_category_id})
+
+    def add_model(self, row: db_models.Models):
+        self._add(self._put_model, {"id": row.id, "model_name": row.model_name, "brand_id": row.brand_id})
+
+    # Lookups
+
+    def category(self, category_id: int):
+        return self.categories.get(category_id)
+
+    def category_by_name(self, name: str):
+        return self._category_by_name.get(name)
+
+    def brand(self, brand_id: int):
+        return self.brands.get(brand_id)
+
+    def brand_by_name(self, category_id: int, name: str):
+        return self._brand_by_name.get((category_id, name))
+
+    def model(self, model_id: int):
+        return self.models.get(model_id)
+
+    def model_by_name(self, brand_id: int, name: str):
+        return self._model_by_name.get((brand_id, name))
+
+    def brands_of(self, category_id: int):
+        return list(self._brands_by_category.get(category_id, {}).values())
+
+    def models_of(self, brand_id: int):
+        return list(self._models_by_brand.get(brand_id, {}).values())
+
+    def document(self, key, build):
+        # Encoded (body, etag) pairs for the dashboard reads, built once per change
+        if key not in self._documents:
+            self._documents[key] = tagged(orjson.dumps(build()))
+        return self._documents[key]
+
+    def tree(self):
+        # The full tree (TaxonomyOut in schemas.py)
+        return self.document(("tree",), lambda: {"categories": [
+            {**category, "brands": [
+                {**brand, "models": self.models_of(brand["id"])}
+                for brand in self.brands_of(category["id"])
+            ]}
+            for category in self.categories.values()
+        ]})
+
+    def stats(self):
+        return {
+            "loaded": self.loaded_at is not None,
+            "loads": self.loads,
+            "categories": len(self.categories),
+            "brands": len(self.brands),
+            "models": len(self.models),
+        }
+
+
+taxonomy_index = TaxonomyIndex(refresh_seconds=settings.TAXONOMY_REFRESH_SECONDS)
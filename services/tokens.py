@@ -0,0 +1,96 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+from config import settings
+
+
+# JWT signing and verification.
+#
+# Tokens are signed with the active key and carry its id in the `kid` header.
+# Older keys listed in JWT_RETIRED_KEYS still verify, so SECRET_KEY can be
+# rotated without logging everyone out; tokens issued before kids were added
+# have no header and are checked against the active key.
+#
+# Verified tokens are remembered by SHA-256 digest until their own `exp`, so
+# repeat calls from the frontend skip the HMAC and JSON decode entirely.
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+INVALID_TOKEN = "Token is invalid or expired"
+
+
+class TokenVerifier:
+    def __init__(self, active_kid: str, keys: dict, algorithm: str, max_entries: int, clock=time.time):
+        self.active_kid = active_kid
+        self.keys = dict(keys)
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self.clock = clock
+        self._verified = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def sign(self, claims: dict, expires_delta: timedelta):
+        to_encode = claims.copy()
+        to_encode.update({"exp": datetime.now(timezone.utc) + expires_delta})
+        return jwt.encode(to_encode, self.keys[self.active_kid], algorithm=self.algorithm, headers={"kid": self.active_kid})
+
+    def rotate(self, kid: str, secret: str):
+        # New tokens use the new key, tokens signed with the old one stay valid
+        self.keys[kid] = secret
+        self.active_kid = kid
+
+    def retire(self, kid: str):
+        self.keys.pop(kid, None)
+
+    def verify(self, token: str):
+        digest = hashlib.sha256(token.encode()).digest()
+        entry = self._verified.get(digest)
+        if entry is not None:
+            claims, kid, expires_at = entry
+            if expires_at > self.clock() and kid in self.keys:
+                self._verified.move_to_end(digest)
+                self.hits += 1
+                return claims
+            del self._verified[digest]
+
+        self.misses += 1
+        try:
+            kid = jwt.get_unverified_header(token).get("kid") or self.active_kid
+            key = self.keys.get(kid)
+            if key is None:
+                raise JWTError("Unknown signing key")
+            claims = jwt.decode(token, key, algorithms=[self.algorithm])
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=INVALID_TOKEN)
+
+        if claims.get("sub") is None or claims.get("user_id") is None:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=INVALID_TOKEN)
+
+        if claims.get("exp") is not None:
+            self._verified[digest] = (claims, kid, claims["exp"])
+            if len(self._verified) > self.max_entries:
+                self._verified.popitem(last=False)
+        return claims
+
+    def stats(self):
+        return {"size": len(self._verified), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+token_verifier = TokenVerifier(
+    active_kid=settings.JWT_KEY_ID,
+    keys={**settings.JWT_RETIRED_KEYS, settings.JWT_KEY_ID: settings.SECRET_KEY},
+    algorithm=settings.ALGORITHM,
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+)
+
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)):
+    # Reusable dependency for routes that need an authenticated caller
+    return token_verifier.verify(token)
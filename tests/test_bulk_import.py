@@ -0,0 +1,65 @@
+import orjson
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+from services import bulk_import
+
+pytestmark = pytest.mark.anyio
+
+BRAND = 10_000_000
+MODEL = 10_000_000
+PRODUCT = {
+    "category_id": 1, "price": 150, "brand_id": BRAND, "model_id": MODEL,
+    "images": ["https://img.example.com/new.jpg"], "colors": ["red"], "sizes": ["M"], "stock_qty": 5,
+}
+
+
+async def names(like):
+    async with SessionLocal() as db:
+        return set(await db.scalars(select(db_models.Products.name).where(db_models.Products.name.like(like))))
+
+
+def ndjson(*products):
+    return b"".join(orjson.dumps(product) + b"\n" for product in products)
+
+
+async def test_csv_quoted_fields_may_span_lines(client):
+    body = (
+        b"category_id,name,price,brand_id,model_id,images,colors,sizes,stock_qty\n"
+        b'1,"new ""quoted""\nhelmet",150,10000000,10000000,https://img.example.com/a.jpg,red|black,M|L,3\n'
+        b"1,new plain,120,10000000,10000000,https://img.example.com/b.jpg,red,M,2\n"
+    )
+    response = await client.post("/dashboard/bulk_import", content=body, headers={"content-type": "text/csv"})
+
+    assert response.json() == {"imported": 2, "failed": 0, "errors": []}
+    assert await names("new %") == {'new "quoted"\nhelmet', "new plain"}
+
+
+async def test_bad_references_fail_only_their_lines(client):
+    body = ndjson(
+        {**PRODUCT, "name": "new 1"},
+        {**PRODUCT, "name": "new 2", "model_id": 99},
+        {**PRODUCT, "name": "new 3", "brand_id": 20_000_000, "model_id": 20_000_000},
+        {**PRODUCT, "name": "new 4"},
+    )
+    response = await client.post("/dashboard/bulk_import", content=body)
+
+    assert response.json() == {"imported": 2, "failed": 2, "errors": [
+        {"line": 2, "error": "Model 99 not found for brand 10000000"},
+        {"line": 3, "error": "Brand 20000000 not found in category 1"},
+    ]}
+    assert await names("new %") == {"new 1", "new 4"}
+
+
+async def test_database_errors_are_not_sent_back(client, monkeypatch):
+    async def refresh(db, product_ids):
+        raise exc.OperationalError("UPDATE product_summary SET secret", {}, Exception("disk I/O error"))
+    monkeypatch.setattr(bulk_import.summary, "refresh", refresh)
+
+    response = await client.post("/dashboard/bulk_import", content=ndjson({**PRODUCT, "name": "new 1"}))
+
+    assert response.json() == {"imported": 0, "failed": 1, "errors": [{"line": 1, "error": bulk_import.WRITE_FAILED}]}
+    assert await names("new %") == set()
@@ -0,0 +1,43 @@
+import pytest
+
+from database.database import async_engine, read_engines
+from services import summary
+from services.cache import catalog_cache, category_key
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_reload_after_an_invalidation_reads_the_primary(client, monkeypatch):
+    engines = []
+    load_category = summary.load_category
+
+    async def recorded(db, category_id):
+        engines.append("primary" if db.bind is async_engine else "replica" if db.bind in read_engines else db.bind)
+        return await load_category(db, category_id)
+    monkeypatch.setattr(summary, "load_category", recorded)
+
+    await client.get("/collection/1")
+    catalog_cache.clear()
+    await client.get("/collection/1")
+    catalog_cache.invalidate(category_key(1))
+    await client.get("/collection/1")
+    await client.get("/collection/1")
+
+    # Whichever loaded first: a cold load, the reload after the write, then a hit
+    assert engines[1:] == ["replica", "primary"]
+    assert not catalog_cache.written(category_key(1))
+
+
+async def test_written_until_a_load_is_stored(client):
+    key = category_key(1)
+    catalog_cache.invalidate(key)
+    assert catalog_cache.written(key)
+
+    # A load that started before another invalidation is not stored
+    generation = catalog_cache.generation(key)
+    catalog_cache.invalidate(key)
+    catalog_cache.set(key, (b"{}", '"stale"'), generation)
+    assert catalog_cache.written(key)
+
+    catalog_cache.set(key, (b"{}", '"fresh"'), catalog_cache.generation(key))
+    assert not catalog_cache.written(key)
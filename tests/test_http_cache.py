@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from database.database import SessionLocal, async_engine, read_engines
+from services.cache import catalog_cache
+from services.inventory import take_stock
+
+pytestmark = pytest.mark.anyio
+
+ITEM = 10_000_000
+# Served from the in-process cache: a 304 costs no query
+CACHED = [
+    ("GET", "/collection/1"),
+    ("POST", "/collection/1"),
+    ("GET", f"/collection/productItem/{ITEM}"),
+    ("GET", "/dashboard/categories"),
+    ("GET", "/dashboard/brands?category_id=1"),
+    ("GET", f"/dashboard/models?brand_id={ITEM}"),
+]
+# Loaded and hashed on every request: a 304 saves only the transfer
+UNCACHED = [
+    ("GET", "/collection/1/products?limit=5"),
+    ("GET", "/collection/1/browse?limit=5"),
+]
+
+
+@contextmanager
+def count_queries():
+    counter = {"queries": 0}
+
+    def before_cursor_execute(*args, **kwargs):
+        counter["queries"] += 1
+
+    engines = [async_engine.sync_engine] + [engine.sync_engine for engine in read_engines]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def revalidate(client, method, url, if_none_match):
+    with count_queries() as counter:
+        response = await client.request(method, url, headers={"If-None-Match": if_none_match})
+    return response, counter["queries"]
+
+
+@pytest.mark.parametrize("method, url", CACHED)
+async def test_cached_routes_answer_304_without_a_query(client, method, url):
+    first = await client.request(method, url)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"]
+
+    response, queries = await revalidate(client, method, url, etag)
+
+    assert (response.status_code, response.content, response.headers["etag"]) == (304, b"", etag)
+    assert queries == 0
+
+
+@pytest.mark.parametrize("method, url", UNCACHED)
+async def test_page_routes_load_the_page_to_answer_304(client, method, url):
+    etag = (await client.request(method, url)).headers["etag"]
+
+    response, queries = await revalidate(client, method, url, etag)
+
+    assert (response.status_code, response.content) == (304, b"")
+    assert queries > 0
+
+
+async def test_weak_validators_match(client):
+    etag = (await client.get("/collection/1")).headers["etag"]
+
+    for if_none_match in (f"W/{etag}", f'"other", W/{etag}'):
+        response, _ = await revalidate(client, "GET", "/collection/1", if_none_match)
+        assert response.status_code == 304
+    response, _ = await revalidate(client, "GET", "/collection/1", 'W/"other"')
+    assert response.status_code == 200
+
+
+async def test_stock_change_changes_the_etag(client):
+    url = f"/collection/productItem/{ITEM}"
+    etag = (await client.get(url)).headers["etag"]
+    page_etag = (await client.get("/collection/1/products?limit=5")).headers["etag"]
+    async with SessionLocal() as db:
+        assert await take_stock(db, ITEM, 1)
+        await db.commit()
+
+    # Pages show it at once; orders do not invalidate the cache, so the
+    # cached detail shows it once its entry is reloaded
+    response, _ = await revalidate(client, "GET", "/collection/1/products?limit=5", page_etag)
+    assert response.status_code == 200 and response.headers["etag"] != page_etag
+    catalog_cache.clear()
+    response, _ = await revalidate(client, "GET", url, etag)
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+async def test_dashboard_write_changes_the_etag(client):
+    etag = (await client.get("/collection/1")).headers["etag"]
+    created = await client.post("/dashboard/brands", json={"new_brand": "new", "brand_description": "d", "category_id": 1})
+    assert created.status_code == 201
+
+    response, _ = await revalidate(client, "GET", "/collection/1", etag)
+    assert response.status_code == 200 and response.headers["etag"] != etag
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+from services import inventory
+
+pytestmark = pytest.mark.anyio
+
+ITEM = 10_000_000
+
+
+async def add_user(user_id=1):
+    async with SessionLocal() as db:
+        await db.execute(insert(db_models.User), [{"id": user_id, "first_name": "T", "last_name": "U", "email": f"u{user_id}@example.com", "hashed_password": "x"}])
+        await db.commit()
+
+
+async def stock(product_item_id):
+    async with SessionLocal() as db:
+        item = await db.scalar(select(db_models.ProductItem.quantity).where(db_models.ProductItem.id == product_item_id))
+        summary = await db.scalar(select(db_models.ProductSummary.stock).where(db_models.ProductSummary.product_item_id == product_item_id))
+        return item, summary
+
+
+async def sweep(now):
+    async with SessionLocal() as db:
+        return await inventory.release_expired(db, now)
+
+
+async def test_concurrent_sweeps_return_each_hold_once(client):
+    await add_user()
+    for _ in range(3):
+        async with SessionLocal() as db:
+            await inventory.hold(db, 1, ITEM, 2, timedelta(seconds=1))
+    assert await stock(ITEM) == (4, 4)
+
+    later = inventory.utcnow() + timedelta(minutes=1)
+    released = await asyncio.gather(*[sweep(later) for _ in range(4)])
+
+    assert sum(released) == 3
+    assert await stock(ITEM) == (10, 10)
+
+
+async def test_sweep_leaves_live_and_claimed_holds(client):
+    await add_user()
+    async with SessionLocal() as db:
+        live = await inventory.hold(db, 1, ITEM, 1, timedelta(hours=1))
+    async with SessionLocal() as db:
+        await inventory.hold(db, 1, ITEM, 3, timedelta(seconds=1))
+    async with SessionLocal() as db:
+        claimed = await inventory.claim_reservations(db, 1, [live["id"]])
+        await db.commit()
+    assert list(claimed) == [live["id"]]
+
+    assert await sweep(inventory.utcnow() + timedelta(minutes=1)) == 1
+    # The claimed hold is part of an order now; only the expired one comes back
+    assert await stock(ITEM) == (9, 9)
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+from services.tokens import token_verifier
+
+pytestmark = pytest.mark.anyio
+
+ITEM = 10_000_000
+BILLING = {"country": "IN", "first_name": "T", "last_name": "U", "address": "1 Road", "city": "Pune", "state": "MH", "pincode": 411001, "phone_no": 9999999999}
+LINE = {"img_link": "https://img.example.com/1.jpg", "name": "Helmet", "color": "red", "size": "M", "price": 2500.0}
+
+
+@pytest.fixture
+async def auth(client):
+    async with SessionLocal() as db:
+        await db.execute(insert(db_models.User), [{"id": 1, "first_name": "T", "last_name": "U", "email": "t@example.com", "hashed_password": "x"}])
+        await db.commit()
+    token = token_verifier.sign({"sub": "t@example.com", "user_id": 1}, timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    billing = await client.post("/checkout_Billing", json=BILLING, headers=headers)
+    return headers, billing.json()["id"]
+
+
+async def quantity(product_item_id):
+    async with SessionLocal() as db:
+        return await db.scalar(select(db_models.ProductItem.quantity).where(db_models.ProductItem.id == product_item_id))
+
+
+async def test_add_order_takes_stock(client, auth):
+    headers, billing_address_id = auth
+    response = await client.post("/add_order", json={**LINE, "qty": 4, "billing_address_id": billing_address_id, "product_item_id": ITEM}, headers=headers)
+
+    assert response.status_code == 200
+    assert await quantity(ITEM) == 6
+
+
+async def test_add_order_cannot_oversell(client, auth):
+    headers, billing_address_id = auth
+    response = await client.post("/add_order", json={**LINE, "qty": 11, "billing_address_id": billing_address_id, "product_item_id": ITEM}, headers=headers)
+
+    assert response.status_code == 409
+    assert await quantity(ITEM) == 10
+
+
+async def test_add_order_requires_the_product_item(client, auth):
+    headers, billing_address_id = auth
+    response = await client.post("/add_order", json={**LINE, "qty": 1, "billing_address_id": billing_address_id}, headers=headers)
+
+    assert response.status_code == 422
+    async with SessionLocal() as db:
+        assert await db.scalar(select(db_models.OrderTable.id)) is None
@@ -0,0 +1,151 @@
+from collections import Counter
+
+import pytest
+from sqlalchemy import func, insert
+from sqlalchemy.future import select
+
+from database import db_models
+from database.database import SessionLocal
+from services import facets, search
+from services.inventory import utcnow
+
+pytestmark = pytest.mark.anyio
+
+CATEGORY_1 = 10_000_000
+CATEGORY_2 = 20_000_000
+
+
+async def count(model, column, ids):
+    async with SessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(model).where(column.in_(ids)))
+
+
+async def leftovers(product_ids):
+    # Rows still hanging off the given products, per table
+    item_ids = select(db_models.ProductItem.id).where(db_models.ProductItem.product_id.in_(product_ids)).scalar_subquery()
+    async with SessionLocal() as db:
+        searchable = search.enabled(db.bind)
+        search_rows = len(await search.indexed_ids(db, product_ids))
+        colors = await db.scalar(select(func.count()).select_from(db_models.Colors).where(db_models.Colors.product_item_id.in_(item_ids)))
+        reservations = await db.scalar(
+            select(func.count()).select_from(db_models.StockReservation).where(db_models.StockReservation.product_item_id.in_(item_ids))
+        )
+    counts = {
+        "products": await count(db_models.Products, db_models.Products.id, product_ids),
+        "sizes": await count(db_models.Sizes, db_models.Sizes.products_id, product_ids),
+        "images": await count(db_models.Images, db_models.Images.product_id, product_ids),
+        "items": await count(db_models.ProductItem, db_models.ProductItem.product_id, product_ids),
+        "colors": colors,
+        "reservations": reservations,
+        "summaries": await count(db_models.ProductSummary, db_models.ProductSummary.product_id, product_ids),
+    }
+    if searchable:
+        # Only SQLite has the search index (services/search.py)
+        counts["search"] = search_rows
+    return counts
+
+
+async def facet_counts():
+    async with SessionLocal() as db:
+        rows = await db.execute(select(db_models.FacetCount.category_id, db_models.FacetCount.facet, db_models.FacetCount.value, db_models.FacetCount.count))
+        return {(row.category_id, row.facet, row.value): row.count for row in rows}
+
+
+async def recounted_facets():
+    # What facet_count should hold for the products that are left
+    async with SessionLocal() as db:
+        counts = Counter()
+        for category_id, values in await facets.stored_facets(db):
+            for facet, value in values:
+                counts[(category_id, facet, value)] += 1
+        return dict(counts)
+
+
+async def listed(client, category_id):
+    response = await client.get(f"/collection/{category_id}")
+    return [product["id"] for product in response.json()["products"]]
+
+
+async def test_delete_removes_product_and_read_models(client):
+    product_id = CATEGORY_1 + 3
+    async with SessionLocal() as db:
+        await db.execute(insert(db_models.User), [{"id": 1, "first_name": "T", "last_name": "U", "email": "t@example.com", "hashed_password": "x"}])
+        await db.execute(insert(db_models.StockReservation), [{"product_item_id": product_id, "user_id": 1, "qty": 1, "expires_at": utcnow()}])
+        await db.commit()
+    assert all((await leftovers([product_id])).values())
+
+    response = await client.delete("/dashboard/delete_product_from_category/1", params={"product_id": product_id})
+
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 1, "product_ids": [product_id]}
+    assert not any((await leftovers([product_id])).values())
+    assert await facet_counts() == await recounted_facets()
+
+
+async def test_delete_is_scoped_to_the_category(client):
+    # Cached before the delete, so the invalidation is checked too
+    assert CATEGORY_1 + 1 in await listed(client, 1)
+
+    # The same position in both categories; only category 1's goes
+    response = await client.delete("/dashboard/delete_product_from_category/1", params={"product_id": CATEGORY_1 + 1})
+
+    assert response.status_code == 200
+    assert not any((await leftovers([CATEGORY_1 + 1])).values())
+    assert CATEGORY_1 + 1 not in await listed(client, 1)
+    assert CATEGORY_2 + 1 in await listed(client, 2)
+    assert (await leftovers([CATEGORY_2 + 1]))["summaries"] == 1
+
+
+async def test_delete_outside_the_category_is_404(client):
+    before = await leftovers([CATEGORY_2 + 1])
+    response = await client.delete("/dashboard/delete_product_from_category/1", params={"product_id": CATEGORY_2 + 1})
+
+    assert response.status_code == 404
+    assert before["products"] == 1 and before["summaries"] == 1
+    assert await leftovers([CATEGORY_2 + 1]) == before
+    assert await facet_counts() == await recounted_facets()
+
+
+async def test_bulk_delete_skips_unknown_ids(client):
+    ids = [CATEGORY_1, CATEGORY_1 + 1, CATEGORY_2 + 2]
+    response = await client.post("/dashboard/bulk_delete", json={"product_ids": ids + [99]})
+
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 3, "product_ids": ids}
+    assert not any((await leftovers(ids)).values())
+    assert await facet_counts() == await recounted_facets()
+
+
+async def test_prune_removes_emptied_models_brands_and_categories(client):
+    # Every product of category 2, so its models, brands and the category go too
+    ids = [CATEGORY_2 + position for position in range(8)]
+    response = await client.post("/dashboard/bulk_delete", json={"product_ids": ids, "prune": True})
+
+    assert response.status_code == 200 and response.json()["deleted"] == 8
+    assert await count(db_models.ProductCategory, db_models.ProductCategory.id, [2]) == 0
+    assert await count(db_models.Brands, db_models.Brands.product_category_id, [2]) == 0
+    assert await count(db_models.Models, db_models.Models.id, [CATEGORY_2, CATEGORY_2 + 1, CATEGORY_2 + 100, CATEGORY_2 + 101]) == 0
+    assert await count(db_models.FacetCount, db_models.FacetCount.category_id, [2]) == 0
+    # Category 1 is untouched
+    assert await count(db_models.Brands, db_models.Brands.product_category_id, [1]) == 2
+    assert (await client.get("/dashboard/categories")).json() == [{"id": 1, "name": "category-1"}]
+
+
+async def test_prune_keeps_models_that_still_have_products(client):
+    # Products 0 and 4 are model 0 of brand 0; 1 and 5 share model 1 of brand 0
+    response = await client.post("/dashboard/bulk_delete", json={"product_ids": [CATEGORY_1, CATEGORY_1 + 4, CATEGORY_1 + 1], "prune": True})
+
+    assert response.status_code == 200
+    assert await count(db_models.Models, db_models.Models.id, [CATEGORY_1]) == 0
+    assert await count(db_models.Models, db_models.Models.id, [CATEGORY_1 + 1]) == 1
+    assert await count(db_models.Brands, db_models.Brands.id, [CATEGORY_1]) == 1
+
+
+async def test_without_prune_the_taxonomy_stays(client):
+    ids = [CATEGORY_2 + position for position in range(8)]
+    response = await client.post("/dashboard/bulk_delete", json={"product_ids": ids})
+
+    assert response.status_code == 200
+    assert await count(db_models.ProductCategory, db_models.ProductCategory.id, [2]) == 1
+    assert await count(db_models.Brands, db_models.Brands.product_category_id, [2]) == 2
+    assert await count(db_models.FacetCount, db_models.FacetCount.category_id, [2]) == 0
@@ -0,0 +1,176 @@
+import os
+import re
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+import greenlet
+import orjson
+import pytest
+from sqlalchemy import event
+
+from database.database import SessionLocal, async_engine, read_engines
+from services import inventory
+
+pytestmark = pytest.mark.anyio
+
+# Fails if any statement the application runs would full-scan a table.
+#
+# The schema comes from the migrations, as on a deployed database. Every route
+# (and the reservation sweeper) is exercised through the app while each SQL
+# statement is recorded together with the service or router function that ran
+# it. Every distinct statement goes through EXPLAIN QUERY PLAN with the
+# parameters it was run with; a "SCAN <table>" step without an index means
+# the planner would read the whole table. Reads that want the whole table by
+# design are listed in FULL_READS; an entry no statement needs any more fails
+# the test too. EXPLAIN QUERY PLAN is SQLite's, so the test is skipped on
+# other backends.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+APP_DIRS = ("services", "routers", "database", "main.py")
+
+# (function, table): why reading all of it is intended
+FULL_READS = {
+    ("services/taxonomy.py:load", "product_category"): "the taxonomy index loads every category",
+    ("services/taxonomy.py:load", "brand"): "the taxonomy index loads every brand",
+    ("services/taxonomy.py:load", "model"): "the taxonomy index loads every model",
+    ("services/sales.py:category_report", "sales_by_category"): "one row per category",
+}
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+# conftest's catalog: category 1's first brand, model and product are all 10_000_000
+FIRST = 10_000_000
+PRODUCT_ITEM = FIRST + 1
+BILLING = {"country": "IN", "first_name": "Plan", "last_name": "User", "address": "1 Road", "city": "Pune", "state": "MH", "pincode": 411001, "phone_no": 9999999999}
+LINE = {"img_link": "https://img.example.com/1.jpg", "qty": 1, "name": "Helmet", "color": "red", "size": "M", "price": 2500.0, "product_item_id": PRODUCT_ITEM}
+USER = {"first_name": "Plan", "last_name": "User", "email": "plan@example.com", "password": "secret-password"}
+
+
+@pytest.fixture
+def schema():
+    return "migrations"
+
+
+def caller():
+    # The innermost application frame. SQLAlchemy runs the DBAPI call in a
+    # child greenlet; the coroutines that issued it are on the parent's stack.
+    current = greenlet.getcurrent()
+    frame = current.parent.gr_frame if current.parent is not None else sys._getframe()
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(ROOT) and path[len(ROOT):].startswith(APP_DIRS):
+            return f"{path[len(ROOT):]}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+@contextmanager
+def record_statements():
+    statements = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        site = caller()
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if site is None or verb not in ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH"):
+            return
+        if verb == "INSERT" and " SELECT " not in statement.upper():
+            return
+        statements.setdefault((site, statement), parameters[0] if executemany else parameters)
+
+    engines = [async_engine.sync_engine] + [engine.sync_engine for engine in read_engines]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def check_status(response):
+    # A failed request would leave its statements out of the check
+    response.raise_for_status()
+
+
+async def exercise(client):
+    # Catalog reads
+    await client.get("/collection/1")
+    await client.get("/collection/1/products", params={"limit": 5})
+    page = (await client.get("/collection/1/products", params={"limit": 5, "brand_id": FIRST, "model_id": FIRST})).json()
+    await client.get("/collection/1/products", params={"cursor": page["next_cursor"] or FIRST, "limit": 5})
+    await client.get("/collection/1/products", params={"stream": True})
+    await client.get("/collection/1/browse", params={"size": "M", "color": "red", "min_price": 100, "max_price": 500})
+    await client.get(f"/collection/productItem/{PRODUCT_ITEM}")
+    await client.get("/collection/search", params={"q": "model"})
+
+    # Dashboard
+    await client.get("/dashboard/taxonomy")
+    await client.get("/dashboard/categories")
+    await client.post("/dashboard/category/category-1")
+    await client.get("/dashboard/brands", params={"category_id": 1})
+    await client.get("/dashboard/models", params={"brand_id": FIRST})
+    category = (await client.post("/dashboard/categories", json={"new_category": "plan", "category_description": "d"})).json()
+    brand = (await client.post("/dashboard/brands", json={"new_brand": "plan", "brand_description": "d", "category_id": category["id"]})).json()
+    model = (await client.post("/dashboard/models", json={"new_model": "plan", "brand_id": brand["id"]})).json()[0]
+    product = {
+        "category_id": category["id"], "name": "plan product", "price": 150, "brand_id": brand["id"], "model_id": model["id"],
+        "images": ["https://img.example.com/plan.jpg"], "colors": ["red"], "sizes": ["M"], "stock_qty": 5,
+    }
+    await client.post("/dashboard", json=product)
+    await client.post("/dashboard/bulk_import", content=orjson.dumps({**product, "name": "plan import"}) + b"\n")
+
+    # Users and orders
+    await client.post("/register", json=USER)
+    token = (await client.post("/token", json={"email": USER["email"], "password": USER["password"]})).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+    await client.post("/verify-token", headers=auth)
+    await client.get("/users/me", headers=auth)
+    await client.patch("/users/me", json={"first_name": "Planned"}, headers=auth)
+    await client.put("/users/me/password", json={"current_password": USER["password"], "new_password": "another-password"}, headers=auth)
+    billing = (await client.post("/checkout_Billing", json=BILLING, headers=auth)).json()
+    await client.post("/add_order", json={**LINE, "billing_address_id": billing["id"]}, headers=auth)
+    reservation = (await client.post("/cart/reservations", json={"product_item_id": PRODUCT_ITEM, "qty": 1}, headers=auth)).json()
+    await client.post("/checkout", json={"billing": BILLING, "lines": [{**LINE, "reservation_id": reservation["id"]}]}, headers=auth)
+    reservation = (await client.post("/cart/reservations", json={"product_item_id": PRODUCT_ITEM, "qty": 1}, headers=auth)).json()
+    await client.delete(f"/cart/reservations/{reservation['id']}", headers=auth)
+    await client.post("/cart/reservations", json={"product_item_id": PRODUCT_ITEM, "qty": 1}, headers=auth)
+    async with SessionLocal() as db:
+        await inventory.release_expired(db, inventory.utcnow().replace(year=2100))
+    history = (await client.get("/orders", params={"limit": 1}, headers=auth)).json()
+    await client.get("/orders", params={"limit": 1, "cursor": history["next_cursor"] or 1}, headers=auth)
+    await client.get("/dashboard/reports/sales_by_product")
+    await client.get("/dashboard/reports/sales_by_day")
+    await client.get("/dashboard/reports/sales_by_day", params={"start": "2026-01-01", "end": "2026-12-31"})
+    await client.get("/dashboard/reports/sales_by_category")
+
+    # Deletes last
+    await client.delete("/dashboard/delete_product_from_category/1", params={"product_id": FIRST + 2})
+    await client.post("/dashboard/bulk_delete", json={"product_ids": [FIRST + 3, FIRST + 4], "prune": True})
+
+
+def plan_of(connection, statement, parameters):
+    return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+async def test_no_statement_scans_a_whole_table(client):
+    if async_engine.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN is SQLite's")
+    client.event_hooks["response"] = [check_status]
+    with record_statements() as statements:
+        await exercise(client)
+
+    connection = sqlite3.connect(async_engine.url.database)
+    try:
+        tables = {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        unexpected, used = [], set()
+        for (site, statement), parameters in sorted(statements.items()):
+            plan = plan_of(connection, statement, parameters)
+            scans = [match.group(1) for step in plan if (match := FULL_SCAN.match(step)) and match.group(1) in tables]
+            used.update((site, table) for table in scans)
+            if any((site, table) not in FULL_READS for table in scans):
+                unexpected.append(f"{site}: {' '.join(statement.split())}\n    " + "\n    ".join(plan))
+    finally:
+        connection.close()
+
+    assert not unexpected, "full table scans:\n" + "\n".join(unexpected)
+    assert FULL_READS.keys() <= used, f"no longer read in full, drop from FULL_READS: {sorted(FULL_READS.keys() - used)}"
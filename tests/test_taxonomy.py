@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from database.database import ReadSessionLocal, async_engine
+from services.singleflight import catalog_flights
+from services.taxonomy import TaxonomyIndex, taxonomy_index
+
+pytestmark = pytest.mark.anyio
+
+
+class GatedSession:
+    # Holds every query until the gate opens, so loads can be made to overlap
+    def __init__(self, db, gate):
+        self.db = db
+        self.gate = gate
+
+    async def execute(self, *args, **kwargs):
+        await self.gate.wait()
+        return await self.db.execute(*args, **kwargs)
+
+
+async def test_overlapping_loads_each_replay_rows_added_meanwhile(client):
+    index = TaxonomyIndex(refresh_seconds=60)
+    gate = asyncio.Event()
+    async with ReadSessionLocal() as first, ReadSessionLocal() as second:
+        loads = [asyncio.create_task(index.load(GatedSession(db, gate))) for db in (first, second)]
+        await asyncio.sleep(0)
+        index.add_category(SimpleNamespace(id=99, name="added", description="meanwhile"))
+        gate.set()
+        await asyncio.gather(*loads)
+
+    assert index.loads == 2
+    assert index.category(99) == {"id": 99, "name": "added", "description": "meanwhile"}
+    assert index.category(1) is not None
+
+
+async def test_concurrent_reloads_without_single_flight(client, monkeypatch):
+    monkeypatch.setattr(catalog_flights, "enabled", False)
+    taxonomy_index.expire()
+
+    responses = await asyncio.gather(*[client.get("/dashboard/categories") for _ in range(5)])
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert responses[0].json() == [{"id": 1, "name": "category-1"}, {"id": 2, "name": "category-2"}]
+
+
+async def test_reload_after_expire_reads_the_primary(client, monkeypatch):
+    engines = []
+    load = taxonomy_index.load
+
+    async def recorded(db):
+        engines.append("primary" if db.bind is async_engine else "replica")
+        return await load(db)
+    monkeypatch.setattr(taxonomy_index, "load", recorded)
+
+    await client.get("/dashboard/categories")
+    taxonomy_index.loaded_at = None
+    await client.get("/dashboard/categories")
+    taxonomy_index.expire()
+    await client.get("/dashboard/categories")
+    taxonomy_index.loaded_at = None
+    await client.get("/dashboard/categories")
+
+    # Whichever loaded first: a refresh, the reload after a prune, a refresh
+    assert engines[1:] == ["replica", "primary", "replica"]